@@ -0,0 +1,76 @@
+"""Attendee ingestion throughput (items/sec) and peak RSS against the local DynamoDB stand-in.
+
+Usage (from the "APP - Copy" directory):
+
+    python benchmarks/bench_attendee_ingest.py --sheet Sheet1            # crowd_30000 / crowd_47000
+    python benchmarks/bench_attendee_ingest.py --writers 1 4 8 --latency-ms 20 path/to/a.xlsx
+
+Every BatchWriteItem call to the stand-in sleeps --latency-ms and returns
+--unprocessed-rate of its items as unprocessed, so the writer pool and the
+retry path are both exercised. Each run is a fresh interpreter so ru_maxrss
+is not shared between runs.
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATASET_DIR = os.path.join(ROOT, '..', 'teset dataset')
+DEFAULT_FILES = [os.path.join(DATASET_DIR, f'crowd_{n}.xlsx') for n in (30000, 47000)]
+
+
+def _rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0  # KB on Linux
+
+
+def _worker(config: dict) -> None:
+    sys.path.insert(0, ROOT)
+    from src.handlers.attendee_pipeline import ingest_attendees
+    from src.utils.aws_helper import LocalDynamoDBHelper
+
+    base_rss = _rss_mb()
+    stats = ingest_attendees(
+        config['path'], 'bench', sheet_name=config['sheet'], chunk_rows=config['chunk_rows'],
+        writers=config['writers'], queue_chunks=config['queue_chunks'],
+        ddb_factory=lambda: LocalDynamoDBHelper(config['latency_ms'], config['unprocessed_rate'], store_items=False),
+    )
+    stats['stored'] = LocalDynamoDBHelper.attendee_count('bench')
+    stats['delta_rss_mb'] = _rss_mb() - base_rss
+    print(json.dumps(stats))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('files', nargs='*')
+    parser.add_argument('--sheet', default='Attendees')
+    parser.add_argument('--writers', type=int, nargs='+', default=[1, 4, 8])
+    parser.add_argument('--chunk-rows', type=int, default=1000)
+    parser.add_argument('--queue-chunks', type=int, default=8)
+    parser.add_argument('--latency-ms', type=float, default=10.0)
+    parser.add_argument('--unprocessed-rate', type=float, default=0.02)
+    parser.add_argument('--worker', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        _worker(json.loads(args.worker))
+        return
+
+    print(f"stand-in latency {args.latency_ms:.0f} ms/request, {args.unprocessed_rate:.0%} unprocessed")
+    print(f"{'file':<20}{'writers':>8}{'items':>8}{'stored':>8}{'retries':>9}{'seconds':>9}{'items/s':>10}{'RSS MB':>8}")
+    for path in args.files or DEFAULT_FILES:
+        for writers in args.writers:
+            config = {'path': path, 'sheet': args.sheet, 'writers': writers, 'chunk_rows': args.chunk_rows,
+                      'queue_chunks': args.queue_chunks, 'latency_ms': args.latency_ms,
+                      'unprocessed_rate': args.unprocessed_rate}
+            out = subprocess.run([sys.executable, __file__, '--worker', json.dumps(config)],
+                                 capture_output=True, text=True, check=True)
+            r = json.loads(out.stdout.strip().splitlines()[-1])
+            print(f"{os.path.basename(path):<20}{writers:>8}{r['items']:>8}{r['stored']:>8}{r['retries']:>9}"
+                  f"{r['seconds']:>9.2f}{r['items_per_sec']:>10.0f}{r['delta_rss_mb']:>8.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+"""Per-request AWS overhead: a new boto3 client per request vs the shared client registry.
+
+Usage (from the "APP - Copy" directory):
+
+    python benchmarks/bench_aws_clients.py
+    python benchmarks/bench_aws_clients.py --requests 500 --threads 16
+
+S3 and DynamoDB point at a local HTTP/1.1 stand-in (AWS_ENDPOINT_URL_S3 /
+AWS_ENDPOINT_URL_DYNAMODB) that accepts PutObject and PutItem, so the numbers
+are client construction + request signing + connection setup, not AWS
+latency. The stand-in also counts TCP connections to show keep-alive reuse.
+"""
+import argparse
+import contextlib
+import io
+import os
+import socket
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    connections = 0
+    lock = threading.Lock()
+
+    def setup(self):
+        # Headers and body go out in separate writes; without this, Nagle plus
+        # delayed ACK add ~40ms to every keep-alive response
+        self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        super().setup()
+        with _StubHandler.lock:
+            _StubHandler.connections += 1
+
+    def _reply(self, body: bytes, content_type: str):
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('ETag', '"stub"')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _drain(self):
+        length = int(self.headers.get('Content-Length', 0))
+        if length:
+            self.rfile.read(length)
+
+    def do_PUT(self):  # S3 PutObject
+        self._drain()
+        self._reply(b'', 'application/xml')
+
+    def do_POST(self):  # DynamoDB JSON protocol
+        self._drain()
+        self._reply(b'{}', 'application/x-amz-json-1.0')
+
+    def log_message(self, *args):
+        pass
+
+
+def _per_request_clients(n: int, payload: bytes):
+    """What every upload used to do: build the helpers' clients inside the request."""
+    import boto3
+    for i in range(n):
+        s3 = boto3.client('s3')
+        s3.put_object(Bucket='bench', Key=f'k{i}', Body=payload, ContentType='text/plain')
+        table = boto3.resource('dynamodb').Table('EventData')
+        table.put_item(Item={'event_id': f'e{i}'})
+
+
+def _shared_clients(n: int, payload: bytes):
+    from src.utils.aws_helper import DynamoDBHelper, S3Helper
+    for i in range(n):
+        S3Helper().upload_file(payload, f'k{i}', 'text/plain')
+        DynamoDBHelper().put_event({'event_id': f'e{i}'})
+
+
+def _run(fn, requests: int, threads: int, payload: bytes) -> dict:
+    per_thread = max(1, requests // threads)
+    before = _StubHandler.connections
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(lambda _: fn(per_thread, payload), range(threads)))
+    elapsed = time.perf_counter() - t0
+    total = per_thread * threads
+    return {'ms_per_request': elapsed / total * 1000, 'connections': _StubHandler.connections - before}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=200, help='Uploads per run (S3 put + DynamoDB put each)')
+    parser.add_argument('--threads', type=int, nargs='+', default=[1, 8])
+    parser.add_argument('--payload-kb', type=int, default=64)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _StubHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    endpoint = f'http://127.0.0.1:{server.server_address[1]}'
+    os.environ.update({
+        'AWS_ENDPOINT_URL_S3': endpoint,
+        'AWS_ENDPOINT_URL_DYNAMODB': endpoint,
+        'AWS_DEFAULT_REGION': 'us-east-1',
+        'AWS_ACCESS_KEY_ID': 'bench',
+        'AWS_SECRET_ACCESS_KEY': 'bench',
+        'S3_BUCKET_NAME': 'bench',
+    })
+    sys.path.insert(0, ROOT)
+    payload = os.urandom(args.payload_kb * 1024)
+    print(f"{'mode':<14}{'threads':>8}{'ms/upload':>11}{'TCP conns':>11}")
+    for threads in args.threads:
+        for name, fn in (('per-request', _per_request_clients), ('shared', _shared_clients)):
+            runs = []
+            for _ in range(args.repeat):
+                with contextlib.redirect_stdout(io.StringIO()):  # helpers print per upload
+                    runs.append(_run(fn, args.requests, threads, payload))
+            ms = statistics.median(r['ms_per_request'] for r in runs)
+            print(f"{name:<14}{threads:>8}{ms:>11.2f}{runs[-1]['connections']:>11}")
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
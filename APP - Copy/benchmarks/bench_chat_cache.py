@@ -0,0 +1,115 @@
+"""Alert burst on the chatbot: one model call per message vs the answer cache with request coalescing.
+
+Usage (from the "APP - Copy" directory):
+
+    python benchmarks/bench_chat_cache.py
+    python benchmarks/bench_chat_cache.py --staff 100 --variants 3 --first-token-ms 800
+
+Simulates an alert: --staff operators ask about the same incident within a
+second, phrased --variants ways that differ only in case and punctuation.
+Runs the burst with the cache off (CHAT_CACHE_MAX_ENTRIES=0 behaviour) and
+on, against the offline stub model, and reports model calls and reply
+latency. Then checks that a gate status change gives a fresh answer and that
+one cancelled caller does not cancel the shared call.
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+QUESTIONS = ['Gate A is overcrowded, what do we do?', 'gate a is overcrowded what do we do',
+             'GATE A IS OVERCROWDED - WHAT DO WE DO??', 'Gate A is overcrowded... what do we do']
+
+
+def _p(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+
+async def _burst(bot, staff, variants, spread):
+    latencies = []
+
+    async def ask(i):
+        await asyncio.sleep(random.uniform(0, spread))
+        t0 = time.perf_counter()
+        await bot.areply(QUESTIONS[i % variants])
+        latencies.append((time.perf_counter() - t0) * 1000)
+
+    await asyncio.gather(*(ask(i) for i in range(staff)))
+    return latencies
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--staff', type=int, default=40)
+    parser.add_argument('--variants', type=int, default=4, choices=range(1, len(QUESTIONS) + 1))
+    parser.add_argument('--spread-ms', type=float, default=1000.0, help='Window the questions arrive in')
+    parser.add_argument('--first-token-ms', type=float, default=300.0)
+    parser.add_argument('--tokens-per-sec', type=float, default=40.0)
+    args = parser.parse_args()
+
+    os.environ.setdefault('WEATHER_API_URL', 'http://127.0.0.1:9/v1/forecast')  # keep weather offline
+    sys.path.insert(0, os.path.join(ROOT, 'src'))
+    sys.path.insert(0, ROOT)
+    from services.crowd_safety_bot import create_chatbot
+    from src.utils.llm_backends import LLMGateway, StubBackend
+    from src.utils.response_cache import ResponseCache
+
+    def bot_with(max_entries):
+        bot = create_chatbot(StubBackend(args.first_token_ms, args.tokens_per_sec))
+        bot.llm = LLMGateway(bot.llm.backend, max_concurrency=args.staff)
+        bot.response_cache = ResponseCache(max_entries=max_entries)
+        bot._update_gate_status = lambda: None  # hold the simulated gate drift still during the burst
+        return bot
+
+    print(f"{args.staff} staff, {args.variants} phrasings, arriving over {args.spread_ms:.0f} ms; "
+          f"stub first token {args.first_token_ms:.0f} ms")
+    print(f"{'cache':<8}{'model calls':>12}{'p50 ms':>9}{'p99 ms':>9}{'saved s':>9}")
+    for label, max_entries in (('off', 0), ('on', 256)):
+        bot = bot_with(max_entries)
+        lat = asyncio.run(_burst(bot, args.staff, args.variants, args.spread_ms / 1000))
+        stats = bot.response_cache.stats()
+        print(f"{label:<8}{bot.llm.stats()['completed']:>12}{_p(lat, 0.5):>9.0f}{_p(lat, 0.99):>9.0f}"
+              f"{stats['saved_seconds']:>9.1f}")
+    print({k: stats[k] for k in ('hits', 'coalesced', 'upstream_calls', 'hit_rate', 'entries')})
+
+    failures = []
+
+    def check(name, ok):
+        print(f"{'PASS' if ok else 'FAIL'}  {name}")
+        if not ok:
+            failures.append(name)
+
+    async def invalidation():
+        bot = bot_with(256)
+        await bot.areply(QUESTIONS[0])
+        await bot.areply(QUESTIONS[1])
+        calls = bot.llm.stats()['completed']
+        bot.event_data['gates']['A']['status'] = 'closed'
+        await bot.areply(QUESTIONS[0])
+        return calls, bot.llm.stats()['completed']
+
+    before, after = asyncio.run(invalidation())
+    check('same question, same state: one model call', before == 1)
+    check('gate status change: new model call', after == 2)
+
+    async def cancel_one():
+        bot = bot_with(256)
+        first = asyncio.create_task(bot.areply(QUESTIONS[0]))
+        await asyncio.sleep(0.01)
+        second = asyncio.create_task(bot.areply(QUESTIONS[1]))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        reply = await second
+        return reply, bot.llm.stats()
+
+    reply, llm = asyncio.run(cancel_one())
+    check('cancelled leader does not cancel the coalesced caller', llm['completed'] == 1 and 'STUB' in reply)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
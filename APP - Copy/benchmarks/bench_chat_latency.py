@@ -0,0 +1,141 @@
+"""Chat latency (p50/p99) while large uploads are parsed: in-process threads vs the upload process pool.
+
+Usage (from the "APP - Copy" directory):
+
+    python benchmarks/bench_chat_latency.py
+    python benchmarks/bench_chat_latency.py --uploads 6 --workers 3 path/to/big.xlsx
+
+Starts the API with uvicorn once per executor (UPLOAD_JOB_EXECUTOR=thread is
+how uploads ran before the pool), posts --uploads copies of the workbook to
+/upload/stream at the same time and keeps sending /api/chat requests until
+they finish. Bedrock, DynamoDB, SNS and the weather API point at a closed
+local port and the archive goes to local storage, so chat time is the
+server's own overhead.
+The workbook's first sheet is renamed to Attendees (see bench_excel_ingest)
+so every upload does the full attendee count.
+"""
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from bench_excel_ingest import _as_attendees  # noqa: E402
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_FILE = os.path.join(ROOT, '..', 'teset dataset', 'crowd_47000.xlsx')
+XLSX = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _start_server(executor: str, workers: int, storage_dir: str):
+    port = _free_port()
+    closed = 'http://127.0.0.1:9'
+    env = dict(os.environ,
+               PYTHONPATH=os.pathsep.join([os.path.join(ROOT, 'src'), ROOT]),
+               UPLOAD_JOB_EXECUTOR=executor, UPLOAD_JOB_WORKERS=str(workers), UPLOAD_JOB_MAX_PENDING='64',
+               STORAGE_BACKEND='local', LOCAL_STORAGE_DIR=storage_dir,
+               PARSE_CACHE_MAX_BYTES='0', PARSE_CACHE_DIR='',
+               AWS_DEFAULT_REGION='us-east-1', AWS_ACCESS_KEY_ID='bench', AWS_SECRET_ACCESS_KEY='bench',
+               AWS_MAX_ATTEMPTS='1', AWS_ENDPOINT_URL_DYNAMODB=closed, AWS_ENDPOINT_URL_SNS=closed,
+               AWS_ENDPOINT_URL_BEDROCK_RUNTIME=closed,
+               # The weather lookup is HTTPS; a dead proxy makes it fail at once instead of on DNS timeouts
+               HTTPS_PROXY=closed, NO_PROXY='127.0.0.1,localhost')
+    proc = subprocess.Popen([sys.executable, '-m', 'uvicorn', 'app:app', '--port', str(port), '--log-level', 'warning'],
+                            cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base = f'http://127.0.0.1:{port}'
+    for _ in range(300):
+        try:
+            requests.get(base + '/api/upload-jobs/stats', timeout=1)
+            return proc, base
+        except requests.ConnectionError:
+            time.sleep(0.1)
+    proc.kill()
+    raise SystemExit('server did not start')
+
+
+def _chat_latencies(base: str, stop: threading.Event, interval: float) -> list:
+    session = requests.Session()
+    latencies = []
+    while not stop.is_set():
+        t0 = time.perf_counter()
+        session.post(base + '/api/chat', json={'message': 'status of gate A?'}, timeout=60)
+        latencies.append((time.perf_counter() - t0) * 1000)
+        time.sleep(interval)
+    return latencies
+
+
+def _percentiles(values: list) -> str:
+    values = sorted(values)
+    p99 = values[min(len(values) - 1, int(len(values) * 0.99))]
+    return f"{statistics.median(values):>9.1f}{p99:>9.1f}{values[-1]:>9.1f}{len(values):>7}"
+
+
+def _run(base: str, content: bytes, uploads: int, interval: float, idle_seconds: float) -> tuple:
+    stop = threading.Event()
+    result = {}
+    probe = threading.Thread(target=lambda: result.setdefault('lat', _chat_latencies(base, stop, interval)))
+    probe.start()
+    if uploads:
+        def upload(i):
+            r = requests.post(base + '/upload/stream', params={'file_name': f'bench{i}.xlsx', 'content_type': XLSX},
+                              data=content, timeout=600)
+            r.raise_for_status()
+        t0 = time.perf_counter()
+        threads = [threading.Thread(target=upload, args=(i,)) for i in range(uploads)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - t0
+    else:
+        time.sleep(idle_seconds)
+        elapsed = idle_seconds
+    stop.set()
+    probe.join()
+    return result['lat'], elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('file', nargs='?', default=DEFAULT_FILE)
+    parser.add_argument('--uploads', type=int, default=4)
+    parser.add_argument('--workers', type=int, default=2, help='Upload workers (threads or processes)')
+    parser.add_argument('--interval-ms', type=float, default=20.0, help='Pause between chat requests')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        with open(_as_attendees(args.file, tmp_dir), 'rb') as f:
+            content = f.read()
+        print(f"{args.uploads} concurrent uploads of {os.path.basename(args.file)} ({len(content) / 1e6:.1f} MB), "
+              f"{args.workers} workers")
+        print(f"{'executor':<10}{'load':<10}{'p50 ms':>9}{'p99 ms':>9}{'max ms':>9}{'chats':>7}{'uploads s':>11}")
+        for executor in ('thread', 'process'):
+            proc, base = _start_server(executor, args.workers, tmp_dir)
+            try:
+                # Warm up: first chat, first upload (spawns the workers, imports pandas)
+                requests.post(base + '/api/chat', json={'message': 'hi'}, timeout=60)
+                _run(base, content, 1, args.interval_ms / 1000, 0)
+                idle, _ = _run(base, content, 0, args.interval_ms / 1000, 3.0)
+                busy, elapsed = _run(base, content, args.uploads, args.interval_ms / 1000, 0)
+                print(f"{executor:<10}{'idle':<10}{_percentiles(idle)}{'':>11}")
+                print(f"{executor:<10}{'uploads':<10}{_percentiles(busy)}{elapsed:>11.2f}")
+            finally:
+                proc.terminate()
+                proc.wait()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+"""Parse time and peak RSS: pd.read_excel(sheet_name=None) vs the streaming reader.
+
+Usage (from the "APP - Copy" directory):
+
+    python benchmarks/bench_excel_ingest.py                  # teset dataset/crowd_*.xlsx
+    python benchmarks/bench_excel_ingest.py path/to/a.xlsx ...
+
+The crowd workbooks hold a single crowd sheet. By default it is renamed to
+``Attendees`` in a temporary copy, which is the shape operators upload (one
+large attendee sheet plus small config sheets); pass --as-is to skip that.
+Each measurement runs in a fresh interpreter so ru_maxrss is not shared.
+"""
+import argparse
+import glob
+import io
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import zipfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_GLOB = os.path.join(ROOT, '..', 'teset dataset', 'crowd_*.xlsx')
+
+
+def _rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0  # KB on Linux
+
+
+def _as_attendees(path: str, tmp_dir: str) -> str:
+    """Copy of the workbook with its first sheet renamed to Attendees."""
+    out = os.path.join(tmp_dir, os.path.basename(path))
+    with zipfile.ZipFile(path) as src, zipfile.ZipFile(out, 'w', zipfile.ZIP_DEFLATED) as dst:
+        for item in src.infolist():
+            data = src.read(item.filename)
+            if item.filename == 'xl/workbook.xml':
+                data = data.replace(b'name="Sheet1"', b'name="Attendees"', 1)
+            dst.writestr(item, data)
+    return out
+
+
+def _worker(mode: str, path: str) -> None:
+    sys.path.insert(0, ROOT)
+    import pandas as pd
+    from src.handlers import data_parser as dp
+
+    with open(path, 'rb') as f:
+        content = f.read()
+    base_rss = _rss_mb()
+    t0 = time.perf_counter()
+    if mode == 'read_excel':
+        result = dp._normalize_schema(pd.read_excel(io.BytesIO(content), sheet_name=None))
+    else:
+        result = dp.parse_excel_file(content)
+    elapsed = time.perf_counter() - t0
+    print(json.dumps({
+        'seconds': elapsed,
+        'peak_rss_mb': _rss_mb(),
+        'delta_rss_mb': _rss_mb() - base_rss,
+        'attendance': result['expected_attendance'],
+    }))
+
+
+def _measure(mode: str, path: str) -> dict:
+    out = subprocess.run([sys.executable, __file__, '--worker', mode, path],
+                         capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('files', nargs='*')
+    parser.add_argument('--as-is', action='store_true', help='Do not rename the first sheet to Attendees')
+    parser.add_argument('--worker', nargs=2, metavar=('MODE', 'PATH'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        _worker(*args.worker)
+        return
+
+    files = args.files or sorted(glob.glob(DEFAULT_GLOB), key=os.path.getsize)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        print(f"{'file':<22}{'mode':<12}{'rows':>8}{'seconds':>10}{'peak MB':>10}{'parse MB':>10}")
+        for path in files:
+            target = path if args.as_is else _as_attendees(path, tmp_dir)
+            for mode in ('read_excel', 'streaming'):
+                r = _measure(mode, target)
+                print(f"{os.path.basename(path):<22}{mode:<12}{r['attendance']:>8}"
+                      f"{r['seconds']:>10.3f}{r['peak_rss_mb']:>10.1f}{r['delta_rss_mb']:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
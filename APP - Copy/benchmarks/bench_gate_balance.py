@@ -0,0 +1,136 @@
+"""Gate load-balancer recompute time and plan quality against fixed-percentage redirects.
+
+Usage (from the "APP - Copy" directory):
+
+    python benchmarks/bench_gate_balance.py
+    python benchmarks/bench_gate_balance.py --gates 50 200 --buckets 96 --changes 500
+
+For each --gates count, builds a random event day (per-gate capacity,
+starting queues and a peaky per-bucket inflow that overloads some gates),
+then closes/reopens one gate at a time and times gate_balance.balance for
+each change. The budget is 50 ms per recompute at 50 gates x 96 buckets.
+Compares the worst wait with no redirects, with the old fixed advice
+(gates above 75% load send 15% of arrivals to the others) and with the
+balancer, and checks the plan: every arrival placed, none at a closed gate,
+and in each bucket every receiving gate ends at the same wait with no gate
+below it left out. Exits non-zero if a check fails.
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _day(gates: int, buckets: int, seed: int = 7):
+    rng = np.random.default_rng(seed)
+    capacity = rng.choice([1000, 1500, 2000, 2500, 3000], size=gates).astype(float)
+    queue = rng.uniform(0, 0.3, gates) * capacity
+    # Arrivals peak before the start; popular gates (near transport) get several times their share
+    shape = np.exp(-0.5 * ((np.arange(buckets) - buckets * 0.6) / (buckets * 0.12)) ** 2)
+    popularity = rng.lognormal(0, 0.6, gates)
+    inflow = np.outer(popularity / popularity.mean() * capacity.mean() / 4, shape) * 0.9
+    return capacity, queue, inflow
+
+
+def _fixed_redirect_wait(capacity, queue, inflow, is_open, bucket_minutes):
+    """Worst wait under the old advice: gates above 75% of a bucket's throughput send 15% elsewhere."""
+    service = capacity * bucket_minutes / 60
+    q = np.where(is_open, queue, 0.0)
+    worst = 0.0
+    for t in range(inflow.shape[1]):
+        a = inflow[:, t].copy()
+        moved = a[~is_open].sum() + (queue[~is_open].sum() if t == 0 else 0.0)
+        a[~is_open] = 0
+        busy = is_open & (q + a > 0.75 * service)
+        moved += 0.15 * a[busy].sum()
+        a[busy] *= 0.85
+        quiet = is_open & ~busy
+        targets = quiet if quiet.any() else is_open
+        a[targets] += moved / targets.sum()
+        q = np.where(is_open, np.maximum(0.0, q + a - service), q)
+        worst = max(worst, float((q[is_open] / capacity[is_open]).max() * 60))
+    return worst
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--gates', type=int, nargs='+', default=[4, 50, 200])
+    parser.add_argument('--buckets', type=int, default=96)
+    parser.add_argument('--bucket-minutes', type=int, default=15)
+    parser.add_argument('--changes', type=int, default=200, help='Gate status changes timed per gate count')
+    args = parser.parse_args()
+
+    sys.path.insert(0, ROOT)
+    from src.utils.gate_balance import balance, redirects
+
+    failures = []
+
+    def check(name, ok):
+        print(f"{'PASS' if ok else 'FAIL'}  {name}")
+        if not ok:
+            failures.append(name)
+
+    for gates in args.gates:
+        capacity, queue, inflow = _day(gates, args.buckets)
+        is_open = np.ones(gates, dtype=bool)
+        is_open[0] = False
+        balance(capacity, inflow, queue, is_open, args.bucket_minutes)
+        times = []
+        for i in range(args.changes):
+            # Close a gate, then reopen it; the timed run ends with gate 0 closed
+            gate = (i + 1) // 2 % gates
+            is_open[gate] = not is_open[gate]
+            t0 = time.perf_counter()
+            plan = balance(capacity, inflow, queue, is_open, args.bucket_minutes)
+            times.append(time.perf_counter() - t0)
+        times = np.sort(times) * 1000
+        t0 = time.perf_counter()
+        moves = [redirects(plan, [str(g) for g in range(gates)], t) for t in range(args.buckets)]
+        advice_ms = (time.perf_counter() - t0) * 1000
+        fixed = _fixed_redirect_wait(capacity, queue, inflow, is_open, args.bucket_minutes)
+        base = plan['baseline_max_wait_minutes']
+        print(f"{gates:>4} gates x {args.buckets} buckets: recompute p50 {np.median(times):.2f} ms, "
+              f"p99 {times[int(len(times) * 0.99) - 1]:.2f} ms, max {times[-1]:.2f} ms; advice for all buckets "
+              f"{advice_ms:.1f} ms ({sum(map(len, moves))} moves) | worst wait: no redirect "
+              f"{base:.0f} min, fixed 15% {fixed:.0f} min, balanced {plan['max_wait_minutes']:.0f} min")
+        if gates == 50 and args.buckets == 96:
+            check('50 gates x 96 buckets recomputes in under 50 ms (p99)', times[int(len(times) * 0.99) - 1] < 50)
+
+        # Plan checks on the last status
+        service = capacity * args.bucket_minutes / 60
+        placed = plan['arrivals'].sum(axis=0)
+        expected = inflow.sum(axis=0)
+        expected[0] += queue[~is_open].sum()
+        check(f'{gates} gates: every arrival placed, none at a closed gate',
+              np.allclose(placed, expected) and not plan['arrivals'][~is_open].any())
+        ok = True
+        q = np.where(is_open, queue, 0.0)
+        for t in range(args.buckets):
+            level = (q + plan['arrivals'][:, t] - service) / capacity
+            receiving = is_open & (plan['arrivals'][:, t] > 1e-9)
+            if receiving.any():
+                top = level[receiving].max()
+                ok &= np.allclose(level[receiving], top) and (level[is_open & ~receiving] >= top - 1e-9).all()
+            q = np.where(is_open, np.maximum(0.0, q + plan['arrivals'][:, t] - service), 0.0)
+        check(f'{gates} gates: receiving gates share one level each bucket; the rest are above it', ok)
+        check(f'{gates} gates: balanced worst wait <= fixed 15% and no-redirect',
+              plan['max_wait_minutes'] <= fixed + 1e-9 and plan['max_wait_minutes'] <= base + 1e-9)
+
+    queue_plan = balance([1000, 3000], [[600], [600]], objective='queue', bucket_minutes=15)
+    check("objective='queue' equalises queue length", np.isclose(*queue_plan['queue'][:, 0]))
+    closed_plan = balance([1000, 1000], [[100], [100]], [500, 0], [False, True])
+    check("no-redirect baseline keeps the closed gate's queue", closed_plan['baseline_max_queue'] == 600)
+    try:
+        balance([1000, 1000], [[100], [100]], open_gates=[False, False])
+        check('all gates closed raises ValueError', False)
+    except ValueError:
+        check('all gates closed raises ValueError', True)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,158 @@
+"""Nearest-gate index throughput: batched kNN / nearest-open queries vs a per-point scan.
+
+Usage (from the "APP - Copy" directory):
+
+    python benchmarks/bench_gate_index.py
+    python benchmarks/bench_gate_index.py --points 1000000 --gates 4 50 2000 --k 3
+
+Places --gates gates on the perimeter of a stadium-sized ellipse around the
+sample event's venue and --points attendee positions inside and around it,
+then reports points/sec for GateIndex.knn (k=1 and --k), for nearest-open
+after closing a gate, and for POST /api/gates/nearest via the app. The
+baseline is the Python loop the index replaces (haversine to every gate per
+point), timed on a sample. Checks results against a brute-force haversine
+argmin. Exits non-zero if a check fails.
+"""
+import argparse
+import json
+import math
+import sys
+import time
+import os
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+VENUE = (3.0480, 101.6800)  # the sample event's gates sit around this point
+
+
+def _gates(count: int):
+    angles = np.linspace(0, 2 * math.pi, count, endpoint=False)
+    lat = VENUE[0] + 0.0012 * np.sin(angles)
+    lng = VENUE[1] + 0.0016 * np.cos(angles)
+    return [{'gate_id': f'G{i}', 'gate_name': f'Gate {i}', 'capacity_per_hour': 2000, 'gps': f'{a:.6f},{b:.6f}'}
+            for i, (a, b) in enumerate(zip(lat, lng))]
+
+
+def _points(count: int, seed: int = 7) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    return np.column_stack((VENUE[0] + rng.normal(0, 0.0015, count), VENUE[1] + rng.normal(0, 0.002, count)))
+
+
+def _haversine(lat1, lng1, lat2, lng2):
+    lat1, lng1, lat2, lng2 = map(math.radians, (lat1, lng1, lat2, lng2))
+    h = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    return 2 * 6_371_008.8 * math.asin(math.sqrt(h))
+
+
+def _scan(points, gates, closed=()):
+    """The per-point loop the index replaces."""
+    coords = [(g['gate_id'], *map(float, g['gps'].split(','))) for g in gates if g['gate_id'] not in closed]
+    return [min(coords, key=lambda c: _haversine(lat, lng, c[1], c[2]))[0] for lat, lng in points]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--points', type=int, default=100_000)
+    parser.add_argument('--gates', type=int, nargs='+', default=[4, 50, 500])
+    parser.add_argument('--k', type=int, default=3)
+    parser.add_argument('--scan-sample', type=int, default=10_000, help='Points timed with the Python loop')
+    args = parser.parse_args()
+
+    sys.path.insert(0, ROOT)
+    from src.utils.gate_index import GateIndex, haversine_m
+
+    failures = []
+
+    def check(name, ok):
+        print(f"{'PASS' if ok else 'FAIL'}  {name}")
+        if not ok:
+            failures.append(name)
+
+    points = _points(args.points)
+    print(f"{args.points} query points")
+    for count in args.gates:
+        gates = _gates(count)
+        t0 = time.perf_counter()
+        index = GateIndex(gates)
+        build_ms = (time.perf_counter() - t0) * 1000
+        index.knn(points[:1000])
+
+        t0 = time.perf_counter()
+        rows1, metres1 = index.knn(points, 1)
+        t1 = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        rowsk, metresk = index.knn(points, args.k)
+        tk = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        index.close('G0')
+        close_us = (time.perf_counter() - t0) * 1e6
+        t0 = time.perf_counter()
+        open_rows, _ = index.nearest(points)
+        t_open = time.perf_counter() - t0
+
+        sample = points[:min(args.scan_sample, len(points))]
+        t0 = time.perf_counter()
+        scanned = _scan(sample, gates, closed={'G0'})
+        t_scan = (time.perf_counter() - t0) / len(sample) * len(points)
+        print(f"{count:>5} gates: build {build_ms:.2f} ms | k=1 {args.points / t1:>12,.0f} pts/s ({t1 * 1000:.1f} ms) | "
+              f"k={args.k} {args.points / tk:>12,.0f} pts/s ({tk * 1000:.1f} ms) | close {close_us:.0f} us | "
+              f"nearest-open {args.points / t_open:>12,.0f} pts/s ({t_open * 1000:.1f} ms) | "
+              f"python scan {args.points / t_scan:>9,.0f} pts/s (x{t_scan / t_open:,.0f})")
+
+        # Exact check on a sample: nearest distances equal the brute-force minimum (ties may pick either gate)
+        coords = index.coords
+        brute = np.stack([haversine_m(sample, np.repeat(coords[i:i + 1], len(sample), axis=0))
+                          for i in range(len(coords))], axis=1)
+        m = len(sample)
+        check(f'{count} gates: k=1 distance is the brute-force minimum',
+              np.allclose(metres1[:m, 0], brute.min(axis=1), atol=1e-6))
+        check(f'{count} gates: k={args.k} distances are the {min(args.k, count)} smallest, ascending',
+              np.allclose(metresk[:m, :min(args.k, count)], np.sort(brute, axis=1)[:, :min(args.k, count)], atol=1e-6))
+        brute[:, 0] = np.inf
+        check(f'{count} gates: nearest-open skips the closed gate and matches the scan',
+              not (open_rows == 0).any() and
+              np.allclose(brute.min(axis=1), [brute[i, index.gate_ids.index(g)] for i, g in enumerate(scanned)]))
+
+    index = GateIndex(_gates(4))
+    for gate_id in index.gate_ids:
+        index.close(gate_id)
+    rows, metres = index.nearest(points[:10])
+    check('all gates closed gives -1 / inf', (rows == -1).all() and np.isinf(metres).all())
+    rows, _ = GateIndex(_gates(2)).knn(points[:10], 3)
+    check('k above the gate count pads with -1', (rows[:, 2] == -1).all() and (rows[:, :2] >= 0).all())
+
+    # Through the app: points as [lat, lng] pairs in a JSON body
+    from fastapi.testclient import TestClient
+    sys.path.insert(0, os.path.join(ROOT, 'src'))
+    from app import app
+
+    gates = _gates(50)
+    gates[0]['status'] = 'closed'
+    body = json.dumps({'gates': gates, 'points': points.round(6).tolist()})
+    with TestClient(app) as client:
+        client.post('/api/gates/nearest', content=json.dumps({'gates': gates, 'points': [list(VENUE)]}))
+        t0 = time.perf_counter()
+        response = client.post('/api/gates/nearest', content=body)
+        elapsed = time.perf_counter() - t0
+    result = response.json()
+    print(f"POST /api/gates/nearest, 50 gates: {args.points / elapsed:,.0f} pts/s ({elapsed * 1000:.0f} ms, "
+          f"mostly JSON encode/decode)")
+    check('HTTP answers every point and skips the closed gate',
+          response.status_code == 200 and len(result['gates']) == args.points and 'G0' not in result['gates'])
+    # The cached index is shared: another request's status must not leak into it
+    gates[0]['status'] = 'open'
+    with TestClient(app) as client:
+        reopened = client.post('/api/gates/nearest', content=json.dumps({'gates': gates, 'points': [gates[0]['gps']]}))
+        bad_k = client.post('/api/gates/nearest', content=json.dumps({'gates': gates, 'points': [], 'k': 'x'}))
+        big_k = client.post('/api/gates/nearest', content=json.dumps({'gates': gates, 'points': [gates[0]['gps']],
+                                                                      'k': 10 ** 9}))
+    check("each request's gate status applies to that request only", reopened.json()['gates'] == ['G0'])
+    check('non-integer k is a 400; k above the gate count returns every gate',
+          bad_k.status_code == 400 and big_k.status_code == 200 and len(big_k.json()['gates'][0]) == len(gates))
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
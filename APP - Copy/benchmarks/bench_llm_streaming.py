@@ -0,0 +1,117 @@
+"""Chat reply latency with the stub model: blocking invoke on the event loop vs the async streaming gateway.
+
+Usage (from the "APP - Copy" directory):
+
+    python benchmarks/bench_llm_streaming.py
+    python benchmarks/bench_llm_streaming.py --chats 64 --concurrency 8 32 --first-token-ms 500
+
+Fires --chats concurrent chats at one event loop and reports time to first
+token and to the full reply (p50/p99) plus replies per second:
+  - blocking:  process_message inside the async handler (the old /api/chat
+               and websocket behaviour), so chats run one after another
+  - streaming: stream_reply through LLMGateway, at each --concurrency cap
+Then cancels streaming chats right after their first token, as a client
+disconnect does, and checks the model stopped and every slot came back.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _p(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+
+def _row(name, ttft, total, elapsed, chats):
+    print(f"{name:<18}{_p(ttft, 0.5):>9.0f}{_p(ttft, 0.99):>9.0f}{_p(total, 0.5):>9.0f}{_p(total, 0.99):>9.0f}"
+          f"{chats / elapsed:>10.1f}")
+
+
+async def _blocking(bot, chats):
+    ttft, total = [], []
+    t0 = time.perf_counter()
+
+    async def chat():
+        # What the async route did: a synchronous model call on the loop thread
+        bot.process_message('status?')
+        ttft.append((time.perf_counter() - t0) * 1000)  # nothing is seen before the whole reply
+        total.append((time.perf_counter() - t0) * 1000)
+
+    await asyncio.gather(*(chat() for _ in range(chats)))
+    return ttft, total, time.perf_counter() - t0
+
+
+async def _streaming(bot, chats):
+    ttft, total = [], []
+    t0 = time.perf_counter()
+
+    async def chat():
+        first = None
+        async for _ in bot.stream_reply('status?'):
+            if first is None:
+                first = (time.perf_counter() - t0) * 1000
+        ttft.append(first)
+        total.append((time.perf_counter() - t0) * 1000)
+
+    await asyncio.gather(*(chat() for _ in range(chats)))
+    return ttft, total, time.perf_counter() - t0
+
+
+async def _cancel_after_first_token(bot, chats):
+    async def chat():
+        async for _ in bot.stream_reply('status?'):
+            await asyncio.sleep(3600)  # a reader that stalls until its socket closes
+
+    tasks = [asyncio.create_task(chat()) for _ in range(chats)]
+    while bot.llm.backend.tokens_generated < chats:
+        await asyncio.sleep(0.01)
+    for t in tasks:
+        t.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    generated = bot.llm.backend.tokens_generated
+    await asyncio.sleep(0.5)
+    return generated, bot.llm.backend.tokens_generated, bot.llm.stats()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--chats', type=int, default=32)
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[8, 32])
+    parser.add_argument('--first-token-ms', type=float, default=300.0)
+    parser.add_argument('--tokens-per-sec', type=float, default=40.0)
+    args = parser.parse_args()
+
+    os.environ.setdefault('WEATHER_API_URL', 'http://127.0.0.1:9/v1/forecast')  # keep weather offline
+    sys.path.insert(0, os.path.join(ROOT, 'src'))
+    sys.path.insert(0, ROOT)
+    from services.crowd_safety_bot import create_chatbot
+    from src.utils.llm_backends import LLMGateway, StubBackend
+
+    def bot_with(concurrency):
+        bot = create_chatbot(StubBackend(args.first_token_ms, args.tokens_per_sec))
+        bot.llm = LLMGateway(bot.llm.backend, max_concurrency=concurrency)
+        return bot
+
+    print(f"{args.chats} concurrent chats, stub first token {args.first_token_ms:.0f} ms, "
+          f"{args.tokens_per_sec:.0f} tokens/s")
+    print(f"{'mode':<18}{'TTFT p50':>9}{'p99':>9}{'full p50':>9}{'p99':>9}{'replies/s':>10}")
+    _row('blocking', *asyncio.run(_blocking(bot_with(1), args.chats)), args.chats)
+    for concurrency in args.concurrency:
+        _row(f'streaming cap={concurrency}', *asyncio.run(_streaming(bot_with(concurrency), args.chats)), args.chats)
+
+    cap = max(args.concurrency)
+    chats = min(args.chats, cap)
+    at_cancel, later, stats = asyncio.run(_cancel_after_first_token(bot_with(cap), chats))
+    ok = later - at_cancel <= chats and stats['in_flight'] == 0 and stats['cancelled'] == chats
+    print(f"cancel after first token: {chats} chats, tokens at cancel {at_cancel}, "
+          f"500 ms later {later}, in flight {stats['in_flight']} -> {'PASS' if ok else 'FAIL'}")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
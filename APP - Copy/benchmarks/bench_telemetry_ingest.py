@@ -0,0 +1,136 @@
+"""Gate telemetry ingest rate: in-process store and the HTTP endpoint, plus window checks.
+
+Usage (from the "APP - Copy" directory):
+
+    python benchmarks/bench_telemetry_ingest.py
+    python benchmarks/bench_telemetry_ingest.py --events 1000000 --batch 10000 --gates 4 400
+
+Generates turnstile events spread over the last 20 minutes and reports
+events/sec for GateTelemetryStore.ingest at each --gates count (per-event
+cost should not depend on it), then for POST /api/telemetry/events against a
+uvicorn server, and the cost of a snapshot. Checks the 1/5/15-minute totals
+against a brute-force count. Exits non-zero if a check fails.
+"""
+import argparse
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _events(count: int, gates: int, now: float, seed: int = 7):
+    rng = random.Random(seed)
+    names = [f'G{i}' for i in range(gates)]
+    return [{'gate': rng.choice(names), 'ts': round(now - rng.uniform(0, 1200), 3),
+             'in': rng.randint(0, 4), 'out': rng.randint(0, 3)} for _ in range(count)]
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _start_server():
+    port = _free_port()
+    closed = 'http://127.0.0.1:9'
+    env = dict(os.environ,
+               PYTHONPATH=os.pathsep.join([os.path.join(ROOT, 'src'), ROOT]),
+               LLM_BACKEND='stub', STORAGE_BACKEND='local', PARSE_CACHE_DIR='', WEATHER_API_URL=closed + '/x',
+               AWS_DEFAULT_REGION='us-east-1', AWS_ACCESS_KEY_ID='bench', AWS_SECRET_ACCESS_KEY='bench',
+               AWS_MAX_ATTEMPTS='1', AWS_ENDPOINT_URL_DYNAMODB=closed, AWS_ENDPOINT_URL_SNS=closed)
+    proc = subprocess.Popen([sys.executable, '-m', 'uvicorn', 'app:app', '--port', str(port), '--log-level', 'warning'],
+                            cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base = f'http://127.0.0.1:{port}'
+    for _ in range(300):
+        try:
+            requests.get(base + '/api/telemetry/stats', timeout=1)
+            return proc, base
+        except requests.ConnectionError:
+            time.sleep(0.1)
+    proc.kill()
+    raise SystemExit('server did not start')
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--events', type=int, default=500_000)
+    parser.add_argument('--batch', type=int, default=5000)
+    parser.add_argument('--gates', type=int, nargs='+', default=[4, 64, 1024])
+    args = parser.parse_args()
+
+    sys.path.insert(0, ROOT)
+    from src.utils.gate_telemetry import GateTelemetryStore
+
+    now = time.time()
+    failures = []
+
+    def check(name, ok):
+        print(f"{'PASS' if ok else 'FAIL'}  {name}")
+        if not ok:
+            failures.append(name)
+
+    print(f"{args.events} events in batches of {args.batch}")
+    for gates in args.gates:
+        events = _events(args.events, gates, now)
+        store = GateTelemetryStore()
+        t0 = time.perf_counter()
+        for i in range(0, len(events), args.batch):
+            store.ingest(events[i:i + args.batch], now=now)
+        elapsed = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        snapshot = store.snapshot(now=now)
+        snap_ms = (time.perf_counter() - t0) * 1000
+        t0 = time.perf_counter()
+        for _ in range(1000):
+            store.snapshot(now=now)
+        cached_us = (time.perf_counter() - t0) * 1000
+        print(f"store, {gates:>5} gates: {args.events / elapsed:>10,.0f} events/s "
+              f"({elapsed / args.events * 1e6:.2f} us/event); snapshot build {snap_ms:.1f} ms, "
+              f"cached read {cached_us:.2f} us")
+
+    # Window totals against a brute-force count (last run's store and events)
+    current = int(now // 60)
+    ok = True
+    for name, gate in snapshot['gates'].items():
+        mine = [e for e in events if e['gate'] == name]
+        for minutes in (1, 5, 15):
+            window = [e for e in mine if current - minutes < int(e['ts'] // 60) <= current]
+            expected = (sum(e['in'] for e in window), sum(e['out'] for e in window))
+            got = gate['windows'][f'{minutes}m']
+            ok = ok and (got['in'], got['out']) == expected
+    check('1/5/15-minute totals match a brute-force count', ok)
+    check('unchanged store returns the same snapshot object', store.snapshot(now=now) is snapshot)
+    store.ingest([{'gate': 'G0', 'ts': now, 'in': 1}], now=now)
+    check('new events give a new version', store.snapshot(now=now)['version'] == snapshot['version'] + 1)
+
+    # HTTP: same events, pre-serialised so the client side costs little
+    events = _events(min(args.events, 200_000), 16, time.time())
+    bodies = [json.dumps(events[i:i + args.batch]).encode() for i in range(0, len(events), args.batch)]
+    proc, base = _start_server()
+    try:
+        session = requests.Session()
+        session.post(base + '/api/telemetry/events', data=bodies[0], timeout=30).raise_for_status()
+        t0 = time.perf_counter()
+        for body in bodies:
+            session.post(base + '/api/telemetry/events', data=body, timeout=30).raise_for_status()
+        elapsed = time.perf_counter() - t0
+        stats = session.get(base + '/api/telemetry/stats', timeout=10).json()
+    finally:
+        proc.terminate()
+        proc.wait()
+    print(f"HTTP, batches of {args.batch}: {len(events) / elapsed:,.0f} events/s "
+          f"(client and server share the machine); server accepted {stats['events']}, rejected {stats['rejected']}")
+    check('HTTP accepted every event', stats['events'] == len(events) + len(json.loads(bodies[0])))
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
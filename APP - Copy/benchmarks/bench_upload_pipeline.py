@@ -0,0 +1,82 @@
+"""End-to-end upload latency: S3 upload->download->parse vs parsing local bytes.
+
+Usage (from the "APP - Copy" directory):
+
+    python benchmarks/bench_upload_pipeline.py                       # teset dataset/crowd_*.xlsx
+    python benchmarks/bench_upload_pipeline.py --latency-ms 80 --mbps 20 path/to/a.xlsx
+
+Runs fully offline: the archive goes to the local-filesystem storage backend
+with a simulated per-request latency and transfer rate, the parse cache is
+disabled so every run parses, and DynamoDB/SNS point at a closed local port
+so their best-effort writes fail fast instead of timing out.
+"""
+import argparse
+import glob
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_GLOB = os.path.join(ROOT, '..', 'teset dataset', 'crowd_*.xlsx')
+XLSX = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+MODES = ('roundtrip', 'concurrent', 'background')
+
+
+def _configure(latency_ms: float, mbps: float, storage_dir: str) -> None:
+    os.environ.update({
+        'STORAGE_BACKEND': 'local',
+        'LOCAL_STORAGE_DIR': storage_dir,
+        'LOCAL_STORAGE_LATENCY_MS': str(latency_ms),
+        'LOCAL_STORAGE_MBPS': str(mbps),
+        'PARSE_CACHE_MAX_BYTES': '0',
+        'PARSE_CACHE_DIR': '',
+        'AWS_DEFAULT_REGION': os.environ.get('AWS_DEFAULT_REGION', 'us-east-1'),
+        'AWS_ACCESS_KEY_ID': os.environ.get('AWS_ACCESS_KEY_ID', 'bench'),
+        'AWS_SECRET_ACCESS_KEY': os.environ.get('AWS_SECRET_ACCESS_KEY', 'bench'),
+        'AWS_MAX_ATTEMPTS': '1',
+        'AWS_ENDPOINT_URL_DYNAMODB': 'http://127.0.0.1:9',
+        'AWS_ENDPOINT_URL_SNS': 'http://127.0.0.1:9',
+    })
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('files', nargs='*')
+    parser.add_argument('--latency-ms', type=float, default=50.0, help='Simulated storage request latency')
+    parser.add_argument('--mbps', type=float, default=25.0, help='Simulated storage transfer rate (0 = unlimited)')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as storage_dir:
+        _configure(args.latency_ms, args.mbps, storage_dir)
+        sys.path.insert(0, ROOT)
+        from src.handlers.file_upload_handler import upload_and_parse
+        from src.utils.upload_archive import get_archive_tracker
+
+        files = args.files or sorted(glob.glob(DEFAULT_GLOB), key=os.path.getsize)
+        print(f"storage latency {args.latency_ms:.0f} ms, {args.mbps or 'unlimited'} MB/s")
+        print(f"{'file':<22}{'MB':>7}{'mode':>12}{'median s':>10}{'archive':>10}")
+        for path in files:
+            with open(path, 'rb') as f:
+                content = f.read()
+            if not content:
+                continue
+            for mode in MODES:
+                timings = []
+                for _ in range(args.repeat):
+                    t0 = time.perf_counter()
+                    status, body = upload_and_parse(content, os.path.basename(path), XLSX, mode=mode)
+                    timings.append(time.perf_counter() - t0)
+                    if status != 200:
+                        raise SystemExit(f"{path} [{mode}]: {body['message']}")
+                archive = body.get('archive', {}).get('status', 'stored')
+                print(f"{os.path.basename(path):<22}{len(content) / 1e6:>7.2f}{mode:>12}"
+                      f"{statistics.median(timings):>10.3f}{archive:>10}")
+        # Let background archive writes land before the storage dir is removed
+        get_archive_tracker()._executor.shutdown(wait=True)
+
+
+if __name__ == '__main__':
+    main()
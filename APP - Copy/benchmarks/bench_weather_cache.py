@@ -0,0 +1,154 @@
+"""Weather lookup latency on the chat path, plus cache behaviour checks, against a local stub API.
+
+Usage (from the "APP - Copy" directory):
+
+    python benchmarks/bench_weather_cache.py
+    python benchmarks/bench_weather_cache.py --delay-ms 800
+
+The stub speaks the Open-Meteo forecast format and can be switched to slow,
+failing (HTTP 500) or hanging responses. The script compares a direct fetch
+(what every chat message used to do) with WeatherCache.get, then checks
+cold start, TTL expiry with stale-while-revalidate, failure and timeout
+handling. Exits non-zero if a check fails.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class _Stub(BaseHTTPRequestHandler):
+    delay = 0.0
+    status = 200
+    hits = 0
+    temperature = 27.5
+
+    def do_GET(self):
+        _Stub.hits += 1
+        time.sleep(_Stub.delay)
+        body = json.dumps({
+            'current': {'temperature_2m': _Stub.temperature, 'weather_code': 61, 'wind_speed_10m': 12.0},
+            'hourly': {'time': [], 'precipitation_probability': []},
+        }).encode() if _Stub.status == 200 else b'{"error": true}'
+        try:
+            self.send_response(_Stub.status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # client gave up (timeout case)
+
+    def log_message(self, *args):
+        pass
+
+
+def _wait(predicate, timeout: float = 5.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--delay-ms', type=float, default=300.0, help='Stub response delay for the latency comparison')
+    parser.add_argument('--calls', type=int, default=20)
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _Stub)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f'http://127.0.0.1:{server.server_address[1]}/v1/forecast'
+
+    sys.path.insert(0, ROOT)
+    from functools import partial
+    from src.utils.weather_cache import WeatherCache, fetch_weather
+
+    lat, lng = 40.7829, -73.9654
+    failures = []
+
+    def check(name, ok):
+        print(f"{'PASS' if ok else 'FAIL'}  {name}")
+        if not ok:
+            failures.append(name)
+
+    # Latency: direct fetch per message vs cached lookup
+    _Stub.delay = args.delay_ms / 1000
+    direct = []
+    for _ in range(max(3, args.calls // 4)):
+        t0 = time.perf_counter()
+        fetch_weather(lat, lng, url=url, timeout=5)
+        direct.append((time.perf_counter() - t0) * 1000)
+    cache = WeatherCache(ttl=60, fetch=partial(fetch_weather, url=url, timeout=5))
+    cache.refresh(lat, lng)
+    cached = []
+    for _ in range(args.calls):
+        t0 = time.perf_counter()
+        cache.get(lat, lng)
+        cached.append((time.perf_counter() - t0) * 1000)
+    print(f"stub delay {args.delay_ms:.0f} ms: direct fetch median {statistics.median(direct):.1f} ms, "
+          f"cached get median {statistics.median(cached):.3f} ms (max {max(cached):.3f})")
+
+    # Cold start: no value yet -> immediate placeholder, background fetch fills it
+    _Stub.delay, _Stub.status = 0.2, 200
+    cache = WeatherCache(ttl=0.5, retry_after=0.5, fetch=partial(fetch_weather, url=url, timeout=1))
+    t0 = time.perf_counter()
+    first = cache.get(lat, lng)
+    check('cold get returns without waiting', (time.perf_counter() - t0) < 0.05 and first['source'] == 'weather_pending')
+    check('background refresh fills the cache', _wait(lambda: cache.get(lat, lng).get('temperature') == 27.5))
+    check('value carries its age', cache.get(lat, lng)['age_seconds'] is not None)
+    check('nearby GPS shares the entry', cache.get(lat + 0.001, lng - 0.001).get('temperature') == 27.5)
+
+    # TTL expiry: stale value served immediately while one refresh runs
+    time.sleep(0.6)
+    _Stub.temperature = 30.0
+    hits = _Stub.hits
+    t0 = time.perf_counter()
+    stale = [cache.get(lat, lng) for _ in range(5)]
+    check('expired value served without waiting', (time.perf_counter() - t0) < 0.05 and all(v['stale'] for v in stale))
+    check('stale value is the old one', stale[0]['temperature'] == 27.5)
+    check('revalidation picks up the new value', _wait(lambda: cache.get(lat, lng).get('temperature') == 30.0))
+    check('only one refresh per expiry', _Stub.hits - hits == 1)
+
+    # Failure: stub returns 500 -> keep serving the last good value, back off before retrying
+    time.sleep(0.6)
+    _Stub.status = 500
+    hits = _Stub.hits
+    cache.get(lat, lng)
+    check('failed refresh is recorded', _wait(lambda: cache.stats()['refresh_errors'] == 1))
+    value = cache.get(lat, lng)
+    check('last good value kept after failure', value['temperature'] == 30.0 and value['stale'])
+    cache.get(lat, lng)
+    check('no retry inside the back-off window', _Stub.hits - hits == 1)
+
+    # Timeout: stub hangs past the request timeout -> get still returns at once
+    _Stub.status, _Stub.delay = 200, 2.0
+    time.sleep(0.6)  # back-off over
+    t0 = time.perf_counter()
+    value = cache.get(lat, lng)
+    check('get does not wait on a hanging API', (time.perf_counter() - t0) < 0.05 and value['temperature'] == 30.0)
+    check('timed-out refresh is recorded', _wait(lambda: cache.stats()['refresh_errors'] == 2, timeout=3))
+
+    # No value and API down: explicit error marker, no fake values
+    down = WeatherCache(ttl=60, fetch=partial(fetch_weather, url=url, timeout=0.2))
+    down.get(lat, lng)
+    _wait(lambda: down.stats()['refresh_errors'] == 1, timeout=3)
+    value = down.get(lat, lng)
+    check('error marker when nothing cached', value['source'].startswith('weather_error:') and value['temperature'] is None)
+
+    print(cache.stats())
+    server.shutdown()
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,189 @@
+"""Broadcast fan-out to many local websocket clients, plus slow-consumer checks.
+
+Usage (from the "APP - Copy" directory):
+
+    python benchmarks/bench_ws_broadcast.py
+    python benchmarks/bench_ws_broadcast.py --clients 2000 --alerts 20 --batch
+
+Starts the API with uvicorn, opens --clients websocket connections from this
+process and POSTs --alerts alerts to /api/broadcast, timing each from the
+POST until the last client has received it (the server-side fan-out time is
+read from /api/broadcast/stats). Then checks in-process, with stand-in
+sockets, that a client whose sends hang neither delays the others nor grows
+without bound under each slow-consumer policy. Exits non-zero if a check fails.
+"""
+import argparse
+import asyncio
+import json
+import os
+import resource
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _start_server():
+    port = _free_port()
+    closed = 'http://127.0.0.1:9'
+    env = dict(os.environ,
+               PYTHONPATH=os.pathsep.join([os.path.join(ROOT, 'src'), ROOT]),
+               LLM_BACKEND='stub', STORAGE_BACKEND='local', PARSE_CACHE_DIR='', WEATHER_API_URL=closed + '/x',
+               AWS_DEFAULT_REGION='us-east-1', AWS_ACCESS_KEY_ID='bench', AWS_SECRET_ACCESS_KEY='bench',
+               AWS_MAX_ATTEMPTS='1', AWS_ENDPOINT_URL_DYNAMODB=closed, AWS_ENDPOINT_URL_SNS=closed)
+    proc = subprocess.Popen([sys.executable, '-m', 'uvicorn', 'app:app', '--port', str(port), '--log-level', 'warning',
+                             '--backlog', '8192', '--ws-max-queue', '1024'],
+                            cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base = f'http://127.0.0.1:{port}'
+    for _ in range(300):
+        try:
+            requests.get(base + '/api/broadcast/stats', timeout=1)
+            return proc, port
+        except requests.ConnectionError:
+            time.sleep(0.1)
+    proc.kill()
+    raise SystemExit('server did not start')
+
+
+async def _fanout(port: int, clients: int, alerts: int, batch: bool):
+    import websockets
+
+    query = '?topics=alerts' + ('&batch=1' if batch else '')
+    sockets = []
+    for start in range(0, clients, 200):
+        sockets += await asyncio.gather(*(
+            websockets.connect(f'ws://127.0.0.1:{port}/ws/bench{i}{query}', max_queue=None, ping_interval=None)
+            for i in range(start, min(clients, start + 200))
+        ))
+    print(f"{len(sockets)} clients connected")
+
+    def wait_for(alert_id):
+        async def recv(ws):
+            while True:
+                data = json.loads(await ws.recv())
+                for message in data['messages'] if data.get('type') == 'batch' else [data]:
+                    if message.get('id') == alert_id:
+                        return
+        return [recv(ws) for ws in sockets]
+
+    loop = asyncio.get_running_loop()
+    session = requests.Session()
+    totals = []
+    for n in range(alerts):
+        alert_id = f'alert-{n}'
+        waiters = asyncio.gather(*wait_for(alert_id))
+        t0 = time.perf_counter()
+        await loop.run_in_executor(None, lambda: session.post(
+            f'http://127.0.0.1:{port}/api/broadcast',
+            json={'topic': 'alerts', 'message': {'sender': 'system', 'type': 'alert', 'id': alert_id,
+                                                 'message': '🚨 Gate A at capacity. Redirect arrivals to Gate D.'}},
+            timeout=30).raise_for_status())
+        await waiters
+        totals.append((time.perf_counter() - t0) * 1000)
+    stats = session.get(f'http://127.0.0.1:{port}/api/broadcast/stats', timeout=10).json()
+    for ws in sockets:
+        await ws.close()
+    return totals, stats
+
+
+class _StandInSocket:
+    def __init__(self, hang: bool = False):
+        self.hang = hang
+        self.received = 0
+        self.last_gate = None
+        self.closed = None
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, text):
+        if self.hang:
+            await asyncio.sleep(3600)
+        message = json.loads(text)
+        if 'gate' in message:
+            self.last_gate = message['n']
+        else:
+            self.received += 1
+
+    async def close(self, code=1000, reason=''):
+        self.closed = code
+
+
+async def _slow_consumer(policy: str, hung_client: bool = True):
+    sys.path.insert(0, os.path.join(ROOT, 'src'))
+    sys.path.insert(0, ROOT)
+    from services.connection_manager import ConnectionManager
+
+    manager = ConnectionManager(queue_size=16, policy=policy, send_timeout=0.5)
+    fast = [_StandInSocket() for _ in range(100)]
+    slow = _StandInSocket(hang=True)
+    for i, ws in enumerate(fast):
+        await manager.connect(ws, f'fast{i}')
+    if hung_client:
+        await manager.connect(slow, 'slow')
+    t0 = time.perf_counter()
+    for n in range(200):
+        manager.broadcast({'n': n})
+        manager.broadcast({'gate': 'A', 'n': n}, key='gate:A')
+        await asyncio.sleep(0)
+    while any(ws.received < 200 or ws.last_gate != 199 for ws in fast) and time.perf_counter() - t0 < 5:
+        await asyncio.sleep(0.01)
+    elapsed = time.perf_counter() - t0
+    stats = manager.stats()
+    return elapsed, min(ws.received for ws in fast) if all(ws.last_gate == 199 for ws in fast) else -1, stats, slow
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--clients', type=int, default=5000)
+    parser.add_argument('--alerts', type=int, default=10)
+    parser.add_argument('--batch', action='store_true', help='Clients ask for batched frames')
+    args = parser.parse_args()
+
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (min(hard, max(soft, args.clients + 1024)), hard))
+
+    proc, port = _start_server()
+    try:
+        totals, stats = asyncio.run(_fanout(port, args.clients, args.alerts, args.batch))
+    finally:
+        proc.terminate()
+        proc.wait()
+    fanout = stats['fanout_latency']
+    print(f"POST -> last client received: median {statistics.median(totals):.0f} ms, max {max(totals):.0f} ms")
+    print(f"server fan-out (queue -> last send): p50 {fanout['p50_ms']:.0f} ms, max {fanout['max_ms']:.0f} ms; "
+          f"sent {stats['sent']}, dropped {stats['dropped']}")
+
+    failures = []
+
+    def check(name, ok):
+        print(f"{'PASS' if ok else 'FAIL'}  {name}")
+        if not ok:
+            failures.append(name)
+
+    baseline, _, _, _ = asyncio.run(_slow_consumer('drop_oldest', hung_client=False))
+    print(f"100 stand-in clients, 400 broadcasts, no hung client: {baseline * 1000:.0f} ms")
+    for policy in ('drop_oldest', 'drop_newest', 'disconnect'):
+        elapsed, fast_min, stats, slow = asyncio.run(_slow_consumer(policy))
+        print(f"{policy}: fast clients got {fast_min} alerts and the latest gate state in {elapsed * 1000:.0f} ms; "
+              f"dropped {stats['dropped']}, coalesced {stats['coalesced']}, max queued {stats['max_queued']}, clients left {stats['clients']}")
+        check(f'{policy}: a hung client does not hold up the others', fast_min == 200 and elapsed < baseline * 1.5 + 0.1)
+        check(f'{policy}: the hung client stays bounded', stats['max_queued'] <= 17)
+        if policy == 'disconnect':
+            check('disconnect: slow client closed with 1013', slow.closed == 1013 and stats['clients'] == 100)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+"""Cold-start import profile for the Lambda entry point, with a regression budget.
+
+Usage (from the "APP - Copy" directory):
+
+    python benchmarks/profile_imports.py                      # lambda_function
+    python benchmarks/profile_imports.py --module app --top 25 --threshold-ms 3000
+    python benchmarks/profile_imports.py --forbid pandas boto3 PyPDF2 numpy
+
+Runs ``python -X importtime -c "import <module>"`` in a fresh interpreter a
+few times and reports the slowest top-level imports (cumulative) and the
+median total. In a second fresh interpreter it also times import plus one
+OPTIONS invocation of ``lambda_handler``, which is what a preflight cold
+start costs. Exits non-zero when the median import time exceeds
+--threshold-ms or when a --forbid module was loaded by the import, so it can
+gate CI.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SRC = os.path.join(ROOT, 'src')
+DEFAULT_FORBID = ['pandas', 'numpy', 'PyPDF2', 'boto3', 'botocore', 'openpyxl']
+
+_COLD_START = """
+import json, sys, time
+t0 = time.perf_counter()
+import {module}
+t1 = time.perf_counter()
+if hasattr({module}, 'lambda_handler'):
+    {module}.lambda_handler({{'httpMethod': 'OPTIONS', 'path': '/upload'}}, None)
+t2 = time.perf_counter()
+print(json.dumps({{'import_ms': (t1 - t0) * 1000, 'first_call_ms': (t2 - t1) * 1000,
+                  'modules': sorted(sys.modules)}}))
+"""
+
+
+def _env() -> dict:
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join([SRC, ROOT, env.get('PYTHONPATH', '')]).rstrip(os.pathsep)
+    return env
+
+
+def _importtime(module: str) -> list:
+    """(module, self_us, cumulative_us, depth) rows from -X importtime."""
+    out = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                         capture_output=True, text=True, env=_env(), cwd=ROOT, check=True)
+    rows = []
+    for line in out.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip())) // 2
+        rows.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return rows
+
+
+def _cold_start(module: str) -> dict:
+    out = subprocess.run([sys.executable, '-c', _COLD_START.format(module=module)],
+                         capture_output=True, text=True, env=_env(), cwd=ROOT, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--module', default='lambda_function')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=15)
+    parser.add_argument('--threshold-ms', type=float, default=50.0,
+                        help='Fail when the median import time exceeds this')
+    parser.add_argument('--forbid', nargs='*', default=DEFAULT_FORBID,
+                        help='Top-level packages the import must not load')
+    args = parser.parse_args()
+
+    profiles = [_importtime(args.module) for _ in range(args.runs)]
+    # The target module is the last (outermost) entry; its cumulative time is the whole import
+    totals_ms = [rows[-1][2] / 1000 for rows in profiles]
+    median_ms = statistics.median(totals_ms)
+
+    # Depth-1 entries of the target's subtree are what it pulls in directly;
+    # interpreter startup (site, .pth hooks) is logged before it and skipped
+    direct = {}
+    for rows in profiles:
+        for name, _, cumulative_us, depth in reversed(rows[:-1]):
+            if depth == 0:
+                break
+            if depth == 1:
+                direct.setdefault(name, []).append(cumulative_us / 1000)
+    ranked = sorted(((statistics.median(v), k) for k, v in direct.items()), reverse=True)
+
+    print(f"import {args.module}: median {median_ms:.1f} ms over {args.runs} runs "
+          f"(min {min(totals_ms):.1f}, max {max(totals_ms):.1f})")
+    print(f"{'cumulative ms':>14}  module")
+    for ms, name in ranked[:args.top]:
+        print(f"{ms:>14.2f}  {name}")
+
+    cold = _cold_start(args.module)
+    print(f"cold start: import {cold['import_ms']:.1f} ms + first OPTIONS call {cold['first_call_ms']:.1f} ms")
+
+    failures = []
+    if median_ms > args.threshold_ms:
+        failures.append(f"median import {median_ms:.1f} ms exceeds budget {args.threshold_ms:.1f} ms")
+    loaded = {m.split('.')[0] for m in cold['modules']}
+    heavy = [m for m in args.forbid if m in loaded]
+    if heavy:
+        failures.append(f"import loaded forbidden modules: {', '.join(heavy)}")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,15 +1,29 @@
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException, Request, UploadFile, File, Form
+from fastapi.responses import JSONResponse
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
-from typing import Dict
+from typing import Any, Dict, Optional
+import asyncio
+import base64
 import json
+import time
+import uuid
 import uvicorn
 import os
 
-from services.crowd_safety_bot import create_chatbot
-from handlers.file_upload_handler import handle_file_upload
+from services.connection_manager import ConnectionManager
+from services.crowd_safety_bot import NO_ANSWER, create_chatbot
+from handlers.file_upload_handler import (
+    UPLOAD_CHUNK_SIZE, UploadSpool, UploadTooLarge, record_upload_result, run_upload_job
+)
 from handlers import data_parser as dp
+from src.utils.gate_balance import BALANCE_BUCKET_MINUTES, balance, forecast_inflow, redirects
+from src.utils.gate_index import get_gate_index
+from src.utils.gate_telemetry import get_telemetry_store
+from src.utils.upload_archive import get_archive_tracker
+from src.utils.upload_jobs import UploadQueueFull, get_upload_jobs
 
 app = FastAPI(title="Crowd Safety Chatbot API")
 
@@ -41,98 +55,443 @@ async def root():
 @app.post("/api/chat")
 async def chat(chat_message: ChatMessage):
     """Handle chat messages via HTTP POST"""
-    response = chatbot.process_message(chat_message.message)
+    response = await chatbot.areply(chat_message.message)
     return {"response": response}
 
+def _parse_locally(source, content_type: str, digest: Optional[str] = None):
+    """Parse without S3; falls back to sample data when the file yields nothing."""
+    try:
+        normalized, cache_hit = dp.parse_file_cached(source, content_type, digest)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Unsupported content_type: {content_type}")
+
+    if not normalized:
+        normalized = dp._build_sample_event()
+
+    return {
+        'message': 'Parsed locally (fallback).',
+        's3_key': None,
+        'data': normalized,
+        'cache_hit': cache_hit
+    }
+
 @app.post("/upload")
 async def upload(data: UploadBody):
     """Local-friendly upload endpoint: tries S3-based handler first, falls back to direct parse."""
-    # Try the Lambda-style handler (will attempt S3 + parsing)
     try:
-        event = {
-            'httpMethod': 'POST',
-            'path': '/upload',
-            'body': json.dumps(data.dict())
-        }
-        resp = handle_file_upload(event)
-        status = resp.get('statusCode', 500)
+        file_bytes = base64.b64decode(data.file_content)
+    except Exception:
+        raise HTTPException(status_code=400, detail="file_content is not valid base64")
+
+    # Try the S3 upload + parse path in the upload worker pool
+    try:
+        status, body = await get_upload_jobs().run(run_upload_job, file_bytes, data.file_name, data.content_type,
+                                                    file_name=data.file_name)
         if status == 200:
-            body = json.loads(resp.get('body', '{}'))
             return body
+    except UploadQueueFull as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={'Retry-After': '5'})
     except Exception as e:
-        print(f"handle_file_upload failed, falling back to direct parse: {e}")
+        print(f"upload_and_parse failed, falling back to direct parse: {e}")
 
     # Fallback: parse locally without S3
-    import base64
     try:
-        file_bytes = base64.b64decode(data.file_content)
-        normalized = None
-        if data.content_type in ('application/vnd.openxmlformats-officedocument.spreadsheetml.sheet','application/vnd.ms-excel'):
-            normalized = dp.parse_excel_file(file_bytes)
-        elif data.content_type == 'application/pdf':
-            normalized = dp.parse_pdf_file(file_bytes)
-        else:
-            raise HTTPException(status_code=400, detail=f"Unsupported content_type: {data.content_type}")
-
-        if not normalized:
-            normalized = dp._build_sample_event()
-
-        return {
-            'message': 'Parsed locally (fallback).',
-            's3_key': None,
-            'data': normalized
-        }
+        return await run_in_threadpool(_parse_locally, file_bytes, data.content_type)
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Local parse failed: {e}")
         # Final fallback: sample data
         return {
             'message': 'Loaded sample fallback.',
             's3_key': None,
-            'data': dp._build_sample_event()
+            'data': dp._build_sample_event(),
+            'cache_hit': False
         }
 
-# WebSocket connection manager
-class ConnectionManager:
-    def __init__(self):
-        self.active_connections: Dict[str, WebSocket] = {}
+async def _finish_spooled_upload(spool: UploadSpool, file_name: str, content_type: str):
+    source = spool.finish()
+    try:
+        status, body = await get_upload_jobs().run(run_upload_job, source, file_name, content_type, spool.digest,
+                                                    file_name=file_name)
+    except UploadQueueFull as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={'Retry-After': '5'})
+    if status != 200:
+        raise HTTPException(status_code=status, detail=body['message'])
+    return body
+
+@app.post("/upload/stream")
+async def upload_stream(request: Request, file_name: str, content_type: Optional[str] = None):
+    """Raw-body upload: the request body is the file itself, read in chunks.
 
-    async def connect(self, websocket: WebSocket, client_id: str):
-        await websocket.accept()
-        self.active_connections[client_id] = websocket
+    Avoids the base64/JSON overhead of /upload; bodies larger than
+    UPLOAD_SPOOL_THRESHOLD are spooled to a temp file rather than held in memory.
+    """
+    content_type = content_type or request.headers.get('content-type', 'application/octet-stream')
+    with UploadSpool() as spool:
+        try:
+            async for chunk in request.stream():
+                spool.write(chunk)
+        except UploadTooLarge as e:
+            raise HTTPException(status_code=413, detail=str(e))
+        return await _finish_spooled_upload(spool, file_name, content_type)
 
-    def disconnect(self, client_id: str):
-        if client_id in self.active_connections:
-            del self.active_connections[client_id]
+@app.post("/upload/multipart")
+async def upload_multipart(file: UploadFile = File(...), content_type: Optional[str] = Form(None)):
+    """multipart/form-data upload; the part's own content type is used unless overridden."""
+    content_type = content_type or file.content_type or 'application/octet-stream'
+    with UploadSpool() as spool:
+        try:
+            while True:
+                chunk = await file.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                spool.write(chunk)
+        except UploadTooLarge as e:
+            raise HTTPException(status_code=413, detail=str(e))
+        return await _finish_spooled_upload(spool, file.filename or 'upload', content_type)
 
-    async def send_message(self, message: str, client_id: str):
-        if client_id in self.active_connections:
-            await self.active_connections[client_id].send_text(message)
+@app.post("/api/upload-jobs", status_code=202)
+async def submit_upload_job(request: Request, file_name: str, content_type: Optional[str] = None):
+    """Queue a raw-body upload for parsing and return immediately with a job id.
 
+    The body is always spooled to disk; the job owns the spool file and deletes
+    it when it finishes. Poll /api/upload-jobs/{job_id} for progress.
+    """
+    content_type = content_type or request.headers.get('content-type', 'application/octet-stream')
+    spool = UploadSpool(threshold=0)
+    try:
+        async for chunk in request.stream():
+            spool.write(chunk)
+        source = spool.finish()
+        job_id = get_upload_jobs().submit(run_upload_job, source, file_name, content_type, spool.digest,
+                                          on_done=spool.cleanup, file_name=file_name, size=spool.size)
+    except UploadTooLarge as e:
+        spool.cleanup()
+        raise HTTPException(status_code=413, detail=str(e))
+    except UploadQueueFull as e:
+        spool.cleanup()
+        raise HTTPException(status_code=429, detail=str(e), headers={'Retry-After': '5'})
+    except BaseException:
+        spool.cleanup()
+        raise
+    return {
+        'job_id': job_id,
+        'status_url': f'/api/upload-jobs/{job_id}',
+        'result_url': f'/api/upload-jobs/{job_id}/result'
+    }
+
+@app.get("/api/upload-jobs/stats")
+async def upload_job_stats():
+    """Worker pool size, queue limit and job counts by state"""
+    return get_upload_jobs().stats()
+
+@app.get("/api/upload-jobs/{job_id}")
+async def upload_job_status(job_id: str):
+    status = get_upload_jobs().status(job_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail=f"Unknown upload job {job_id}")
+    return status
+
+@app.get("/api/upload-jobs/{job_id}/result")
+async def upload_job_result(job_id: str):
+    """The upload response once the job is done; 202 with the status while it is not."""
+    jobs = get_upload_jobs()
+    status = jobs.status(job_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail=f"Unknown upload job {job_id}")
+    if status['state'] in ('queued', 'running'):
+        return JSONResponse(status_code=202, content=status)
+    if status['state'] == 'cancelled':
+        raise HTTPException(status_code=410, detail=f"Upload job {job_id} was cancelled")
+    if status['state'] == 'failed':
+        raise HTTPException(status_code=500, detail=status['error'])
+    code, body = jobs.result(job_id)
+    return JSONResponse(status_code=code, content=body)
+
+@app.delete("/api/upload-jobs/{job_id}")
+async def cancel_upload_job(job_id: str):
+    """Cancel a queued job; jobs already running in a worker finish normally (409)."""
+    cancelled = get_upload_jobs().cancel(job_id)
+    if cancelled is None:
+        raise HTTPException(status_code=404, detail=f"Unknown upload job {job_id}")
+    if not cancelled:
+        raise HTTPException(status_code=409, detail=f"Upload job {job_id} is already running")
+    return get_upload_jobs().status(job_id)
+
+@app.on_event("startup")
+async def start_weather_refresh():
+    # Refresh ahead of the TTL so chat replies always find warm weather
+    if os.environ.get('WEATHER_KEEP_WARM', '1') == '1':
+        app.state.weather_task = asyncio.create_task(chatbot.weather_cache.keep_warm(chatbot._gps))
+
+@app.get("/api/weather/cache")
+async def weather_cache_stats():
+    """Weather cache hit/refresh counters and the weather chat replies currently see"""
+    return {**chatbot.weather_cache.stats(), 'current': chatbot._get_weather()}
+
+@app.on_event("startup")
+async def record_upload_job_results():
+    # Worker processes keep their own archive tracker and parse cache; mirror each job's outcome here
+    get_upload_jobs().on_result = record_upload_result
+
+@app.on_event("shutdown")
+async def shutdown_upload_jobs():
+    get_upload_jobs().shutdown()
+
+@app.get("/api/uploads/{s3_key}/archive")
+async def upload_archive_status(s3_key: str):
+    """Status of an upload's archive write (pending / stored / failed)"""
+    status = get_archive_tracker().status(s3_key)
+    if status is None:
+        raise HTTPException(status_code=404, detail=f"No archive record for {s3_key}")
+    return status
+
+@app.get("/api/parse-cache/stats")
+async def parse_cache_stats():
+    """Hit/miss/eviction counters of the upload parse cache"""
+    return dp.get_parse_cache().stats()
+
+# WebSocket connections: per-client outbound queues, broadcast to dashboards
 manager = ConnectionManager()
 
+class BroadcastBody(BaseModel):
+    message: Any
+    topic: Optional[str] = None
+    key: Optional[str] = None
+
+@app.post("/api/broadcast")
+async def broadcast(body: BroadcastBody):
+    """Push a message (e.g. an alert or gate update) to every websocket subscribed to ``topic``.
+
+    A ``key`` lets a newer message replace one still queued for a slow client.
+    """
+    clients = manager.broadcast(body.message, topic=body.topic, key=body.key)
+    return {"clients": clients}
+
+@app.get("/api/broadcast/stats")
+async def broadcast_stats():
+    """Connections, queued/dropped/coalesced messages and fan-out latency"""
+    return manager.stats()
+
+# Seconds between gate snapshot pushes to websocket clients subscribed to "gates"
+TELEMETRY_PUSH_SECONDS = float(os.environ.get("TELEMETRY_PUSH_SECONDS", 1))
+
+@app.post("/api/telemetry/events")
+async def ingest_telemetry(request: Request):
+    """Batched turnstile/counter events: [{"gate": "A", "ts": 1752602400.5, "in": 3, "out": 1}, ...]
+
+    Also accepts {"events": [...]}. The body is decoded with json.loads rather
+    than a pydantic model, which would cost more than the ingest itself.
+    """
+    try:
+        events = json.loads(await request.body())
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Body must be JSON")
+    if isinstance(events, dict):
+        events = events.get("events")
+    if not isinstance(events, list):
+        raise HTTPException(status_code=400, detail="Expected a list of events")
+    return get_telemetry_store().ingest(events)
+
+@app.get("/api/telemetry/snapshot")
+async def telemetry_snapshot(since_version: Optional[int] = None):
+    """Per-gate occupancy and 1/5/15-minute in/out totals at one version.
+
+    Pass the last version seen as ``since_version`` to get just
+    {"version", "changed": false} when nothing arrived since.
+    """
+    store = get_telemetry_store()
+    if since_version is not None and since_version == store.version:
+        return {"version": since_version, "changed": False}
+    return store.snapshot()
+
+@app.get("/api/telemetry/stats")
+async def telemetry_stats():
+    """Events accepted/rejected/late, batches and current version"""
+    return get_telemetry_store().stats()
+
+def _nearest_gates(request: Dict) -> Dict:
+    index = get_gate_index(request["gates"])
+    k = request.get("k", 1)
+    # This request's gate status goes in as a mask; the cached index is shared between requests
+    open_mask = index.open_mask(request["gates"]) if request.get("open_only", True) else None
+    rows, metres = index.knn(request["points"], max(1, min(k, len(index))), open_mask=open_mask)
+    if k == 1:
+        rows, metres = rows[:, 0], metres[:, 0]
+    distances = [[round(d, 1) if d != float("inf") else None for d in row] for row in metres.tolist()] \
+        if k > 1 else [round(d, 1) if d != float("inf") else None for d in metres.tolist()]
+    return {"gates": index.labels(rows), "distance_m": distances, "unplaced": index.unplaced}
+
+@app.post("/api/gates/nearest")
+async def nearest_gates(request: Request):
+    """Nearest gate per position: {"gates": [<parsed gates>], "points": ["3.0481,101.6799", [3.05, 101.68], ...]}
+
+    Optional "k" (default 1) and "open_only" (default true; gates with
+    "status": "closed" are skipped). The index for a set of gates is built
+    once and reused; each request's gate status is applied to its own query
+    only. k above the number of gates returns every gate.
+    """
+    try:
+        body = json.loads(await request.body())
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Body must be JSON")
+    if not isinstance(body, dict) or not isinstance(body.get("gates"), list) or not isinstance(body.get("points"), list):
+        raise HTTPException(status_code=400, detail="Expected {\"gates\": [...], \"points\": [...]}")
+    k = body.get("k", 1)
+    if not isinstance(k, int) or isinstance(k, bool) or k < 1:
+        raise HTTPException(status_code=400, detail="k must be an integer of at least 1")
+    return await run_in_threadpool(_nearest_gates, body)
+
+def _gate_balance(event: Dict) -> Dict:
+    started = time.perf_counter()
+    bucket_minutes = int(event.get("bucket_minutes") or BALANCE_BUCKET_MINUTES)
+    times, inflow = forecast_inflow(event, bucket_minutes, stop_gates=event.get("stop_gates"))
+    gates = event["gates"]
+    ids = [str(g.get("gate_id")) for g in gates]
+    # Queues default to live telemetry occupancy for gates that report it
+    live = get_telemetry_store().snapshot()["gates"]
+    queues = event.get("queues") or {}
+    queue = [queues.get(gate_id, live.get(gate_id, {}).get("occupancy", 0)) for gate_id in ids]
+    closed = set(event.get("closed") or ())
+    is_open = [gate_id not in closed and str(g.get("status", "open")).lower() != "closed" for gate_id, g in zip(ids, gates)]
+    plan = balance([g.get("capacity_per_hour") or 0 for g in gates], inflow, queue, is_open, bucket_minutes,
+                   event.get("objective", "wait"))
+    elapsed_ms = (time.perf_counter() - started) * 1000
+
+    def finite(x):
+        return round(x, 1) if x != float("inf") else None
+
+    plans = [{"bucket": when, "moves": moves} for t, when in enumerate(times) if (moves := redirects(plan, ids, t))]
+    return {
+        "buckets": times,
+        "bucket_minutes": bucket_minutes,
+        "redirects": plans,
+        "max_wait_minutes": finite(plan["max_wait_minutes"]),
+        "max_queue": finite(plan["max_queue"]),
+        "baseline_max_wait_minutes": finite(plan["baseline_max_wait_minutes"]),
+        "baseline_max_queue": finite(plan["baseline_max_queue"]),
+        "elapsed_ms": round(elapsed_ms, 2),
+    }
+
+@app.post("/api/gates/balance")
+async def gate_balance(request: Request):
+    """Redirect shares per time bucket that keep the longest gate wait as short as possible.
+
+    Body: a normalized event (gates with capacity_per_hour, transport_schedule,
+    expected_attendance, event_start_datetime), optionally with "queues"
+    ({gate_id: people waiting}; live telemetry occupancy otherwise), "closed"
+    gate ids, "bucket_minutes", "objective" ("wait" or "queue") and
+    "stop_gates" ({stop_name: [gate_id, ...]}). Cheap enough to call on every
+    telemetry update or gate status change.
+    """
+    try:
+        event = json.loads(await request.body())
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Body must be JSON")
+    if not isinstance(event, dict) or not isinstance(event.get("gates"), list) or not event["gates"]:
+        raise HTTPException(status_code=400, detail="Expected an event with a non-empty \"gates\" list")
+    try:
+        return await run_in_threadpool(_gate_balance, event)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+async def _push_gate_snapshots():
+    store = get_telemetry_store()
+    pushed = 0
+    while True:
+        await asyncio.sleep(TELEMETRY_PUSH_SECONDS)
+        if store.version != pushed and manager.active_connections:
+            snapshot = store.snapshot()
+            pushed = snapshot["version"]
+            # Keyed, so a slow dashboard only ever has the latest snapshot queued
+            manager.broadcast({"sender": "system", "type": "gates", "snapshot": snapshot}, topic="gates", key="gates")
+
+@app.on_event("startup")
+async def start_gate_push():
+    if TELEMETRY_PUSH_SECONDS > 0:
+        app.state.gate_push_task = asyncio.create_task(_push_gate_snapshots())
+
+async def _answer(client_id: str, message_data: Dict):
+    """Reply to one websocket message.
+
+    With ``"stream": true`` the reply is sent as {"type": "chunk"} messages
+    followed by {"type": "done"} carrying the full text; otherwise as the
+    single {"sender": "bot", "message": ...} the frontend already handles.
+    """
+    if not message_data.get("stream"):
+        response = await chatbot.areply(message_data["message"])
+        await manager.send_message(json.dumps({"sender": "bot", "message": response}), client_id)
+        return
+
+    reply_id = message_data.get("id") or uuid.uuid4().hex
+    parts = []
+    try:
+        async for token in chatbot.stream_reply(message_data["message"]):
+            parts.append(token)
+            await manager.send_message(
+                json.dumps({"sender": "bot", "type": "chunk", "id": reply_id, "message": token}), client_id
+            )
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        await manager.send_message(
+            json.dumps({"sender": "bot", "type": "error", "id": reply_id, "message": chatbot._error_reply(e)}),
+            client_id
+        )
+        return
+    await manager.send_message(
+        json.dumps({"sender": "bot", "type": "done", "id": reply_id,
+                    "message": ''.join(parts).strip() or NO_ANSWER}),
+        client_id
+    )
+
+@app.get("/api/llm/stats")
+async def llm_stats():
+    """Model calls in flight, completed, timed out and cancelled"""
+    return chatbot.llm.stats()
+
+@app.get("/api/chat/fast-path/stats")
+async def chat_fast_path_stats():
+    """Share of chat messages answered without the model, and reply latency of each path"""
+    return chatbot.fast_path_stats()
+
+@app.get("/api/chat/cache/stats")
+async def chat_cache_stats():
+    """Answer cache hits, coalesced requests and model time saved"""
+    return chatbot.response_cache.stats()
+
 @app.websocket("/ws/{client_id}")
 async def websocket_endpoint(websocket: WebSocket, client_id: str):
-    """Handle WebSocket connections for real-time chat"""
-    await manager.connect(websocket, client_id)
+    """Handle WebSocket connections for real-time chat
+
+    Each message is answered in its own task so the socket keeps being read;
+    a disconnect then cancels the replies still in flight, which stops their
+    model calls. ``?topics=alerts,gates`` limits which broadcasts the client
+    gets and ``?batch=1`` asks for batched frames.
+    """
+    topics = [t for t in websocket.query_params.get("topics", "").split(",") if t]
+    batch = websocket.query_params.get("batch") in ("1", "true")
+    await manager.connect(websocket, client_id, topics=topics or None, batch=batch)
+    replies = set()
     try:
         while True:
             data = await websocket.receive_text()
             message_data = json.loads(data)
-            
+
             # Process message with chatbot
-            response = chatbot.process_message(message_data["message"])
-            
-            # Send response back to client
-            await manager.send_message(
-                json.dumps({"sender": "bot", "message": response}),
-                client_id
-            )
-            
+            task = asyncio.create_task(_answer(client_id, message_data))
+            replies.add(task)
+            task.add_done_callback(replies.discard)
+
     except WebSocketDisconnect:
-        manager.disconnect(client_id)
+        manager.disconnect(client_id, websocket)
     except Exception as e:
         print(f"WebSocket error: {str(e)}")
-        manager.disconnect(client_id)
+        manager.disconnect(client_id, websocket)
+    finally:
+        for task in replies:
+            task.cancel()
 
 # Mount static files for the frontend
 app.mount("/", StaticFiles(directory="public", html=True), name="static")
@@ -0,0 +1,172 @@
+import math
+import os
+import queue
+import threading
+import time
+import zipfile
+from datetime import date, datetime, time as dt_time
+from decimal import Decimal
+from typing import Any, Callable, Dict, Iterator, List, Tuple
+
+import pandas as pd
+from openpyxl import load_workbook
+from openpyxl.utils.exceptions import InvalidFileException
+
+from src.utils.aws_helper import get_dynamodb, put_with_retry
+from src.handlers.data_parser import ATTENDEE_SHEET, FileSource, _as_file, _normalize_column_name
+
+ATTENDEE_CHUNK_ROWS = int(os.environ.get('ATTENDEE_CHUNK_ROWS', 1000))
+ATTENDEE_WRITERS = int(os.environ.get('ATTENDEE_WRITERS', 4))
+# Chunks allowed to wait for a writer; the reader blocks once this many are queued
+ATTENDEE_QUEUE_CHUNKS = int(os.environ.get('ATTENDEE_QUEUE_CHUNKS', 8))
+
+ATTENDEE_ID_COLUMNS = ('attendee_id', 'person_id', 'ticket_id', 'id')
+
+_DONE = object()
+
+
+def iter_attendee_chunks(source: FileSource, sheet_name: str = ATTENDEE_SHEET,
+                         chunk_rows: int = ATTENDEE_CHUNK_ROWS) -> Iterator[Tuple[List[str], List[tuple]]]:
+    """Yield (header, rows) with at most ``chunk_rows`` value tuples per chunk.
+
+    .xlsx is read with openpyxl in read-only mode, so only the current chunk
+    is held in memory; other workbook formats fall back to one pandas read.
+    """
+    try:
+        wb = load_workbook(_as_file(source), read_only=True, data_only=True)
+    except (InvalidFileException, zipfile.BadZipFile):
+        df = pd.read_excel(_as_file(source), sheet_name=sheet_name)
+        header = [_normalize_column_name(c) for c in df.columns]
+        rows = list(df.itertuples(index=False, name=None))
+        for start in range(0, len(rows), chunk_rows):
+            yield header, rows[start:start + chunk_rows]
+        return
+
+    try:
+        if sheet_name not in wb.sheetnames:
+            return
+        rows_iter = wb[sheet_name].iter_rows(values_only=True)
+        first = next(rows_iter, None)
+        if first is None:
+            return
+        header = [_normalize_column_name(c) if c is not None else f'column_{i}' for i, c in enumerate(first)]
+        chunk: List[tuple] = []
+        for row in rows_iter:
+            chunk.append(row)
+            if len(chunk) >= chunk_rows:
+                yield header, chunk
+                chunk = []
+        if chunk:
+            yield header, chunk
+    finally:
+        wb.close()
+
+
+def _item_value(v: Any) -> Any:
+    """DynamoDB-safe value, or None when the cell should be left out."""
+    if v is None:
+        return None
+    if isinstance(v, bool):
+        return v
+    if isinstance(v, float):
+        if math.isnan(v) or math.isinf(v):
+            return None
+        return Decimal(str(v))
+    if isinstance(v, int):
+        return v
+    if isinstance(v, (datetime, date, dt_time, pd.Timestamp)):
+        return v.isoformat()
+    if isinstance(v, str):
+        return v.strip() or None
+    return str(v)
+
+
+def attendee_items(header: List[str], rows: List[tuple], event_id: str, first_row: int) -> List[Dict[str, Any]]:
+    """Map sheet rows to items keyed on event_id / attendee_id.
+
+    attendee_id comes from the first ID-like column present; rows without one
+    are keyed by their sheet row number so they still land exactly once.
+    Fully blank rows are skipped, and the partition key is always the given
+    event_id, even if the sheet has an event_id column.
+    """
+    id_index = next((header.index(c) for c in ATTENDEE_ID_COLUMNS if c in header), None)
+    items = []
+    for offset, row in enumerate(rows):
+        item = {}
+        for name, raw in zip(header, row):
+            value = _item_value(raw)
+            if value is not None:
+                item[name] = value
+        if not item:
+            continue
+        item['event_id'] = event_id
+        attendee_id = row[id_index] if id_index is not None and id_index < len(row) else None
+        item['attendee_id'] = (str(attendee_id).strip() if attendee_id not in (None, '')
+                               else f"row-{first_row + offset}")
+        items.append(item)
+    return items
+
+
+def ingest_attendees(source: FileSource, event_id: str, sheet_name: str = ATTENDEE_SHEET,
+                     chunk_rows: int = ATTENDEE_CHUNK_ROWS, writers: int = ATTENDEE_WRITERS,
+                     queue_chunks: int = ATTENDEE_QUEUE_CHUNKS,
+                     ddb_factory: Callable[[], Any] = get_dynamodb) -> Dict[str, Any]:
+    """Stream the attendee sheet into the attendee table.
+
+    The calling thread reads and maps chunks and hands them to ``writers``
+    threads through a queue of at most ``queue_chunks`` chunks, so memory is
+    bounded by chunk size x (queue_chunks + writers) whatever the row count.
+    Each writer has its own DynamoDB helper and resends unprocessed items with
+    backoff (put_with_retry).
+    """
+    work: 'queue.Queue' = queue.Queue(maxsize=max(1, queue_chunks))
+    lock = threading.Lock()
+    stats = {'event_id': event_id, 'items': 0, 'chunks': 0, 'retries': 0, 'failed': 0, 'errors': 0}
+    started = time.perf_counter()
+
+    def writer():
+        try:
+            ddb = ddb_factory()
+        except Exception as e:
+            # Keep draining so the reader never blocks on a full queue
+            print(f"Attendee writer could not connect: {e}")
+            ddb = None
+        while True:
+            items = work.get()
+            if items is _DONE:
+                return
+            try:
+                if ddb is None:
+                    raise RuntimeError('no DynamoDB connection')
+                retries, failed = put_with_retry(ddb.write_attendee_batch, items)
+                written, errors = len(items) - len(failed), 0
+            except Exception as e:
+                print(f"Attendee batch processing error: {e}")
+                retries, failed, written, errors = 0, items, 0, 1
+            with lock:
+                stats['items'] += written
+                stats['retries'] += retries
+                stats['failed'] += len(failed)
+                stats['errors'] += errors
+
+    threads = [threading.Thread(target=writer, name=f'attendee-writer-{i}', daemon=True)
+               for i in range(max(1, writers))]
+    for t in threads:
+        t.start()
+    try:
+        row_number = 2  # first data row under the header
+        for header, rows in iter_attendee_chunks(source, sheet_name, chunk_rows):
+            work.put(attendee_items(header, rows, event_id, row_number))
+            row_number += len(rows)
+            stats['chunks'] += 1
+    finally:
+        for _ in threads:
+            work.put(_DONE)
+        for t in threads:
+            t.join()
+
+    elapsed = time.perf_counter() - started
+    stats['seconds'] = round(elapsed, 3)
+    stats['items_per_sec'] = round(stats['items'] / elapsed, 1) if elapsed > 0 else 0.0
+    return stats
+
@@ -1,18 +1,76 @@
 import io
 import json
+import os
+import posixpath
 import re
+import zipfile
+import xml.etree.ElementTree as ET
 from datetime import datetime
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional, Union
 
+import numpy as np
 import pandas as pd
-import PyPDF2
-import boto3
 
-from src.utils.aws_helper import S3Helper, DynamoDBHelper, SNSHelper
+from src.utils.aws_helper import SNSHelper, get_client, get_dynamodb, get_storage
+from src.utils.parse_cache import content_digest, get_parse_cache
+
+# Uploads reach the parsers either as bytes or, when spooled to disk, as a path
+FileSource = Union[bytes, str]
+TEXTRACT_MAX_BYTES = 10 * 1024 * 1024  # synchronous analyze_document limit
+
+def _as_file(source: FileSource):
+    """Something pandas/zipfile/PyPDF2 can open without copying a spooled upload."""
+    return source if isinstance(source, str) else io.BytesIO(source)
+
+def _source_size(source: FileSource) -> int:
+    return os.path.getsize(source) if isinstance(source, str) else len(source)
+
+# Column aliases per output field, in lookup order. Resolved once per sheet with
+# the same semantics as the old per-row `r.get(a) or r.get(b) or ... or default`.
+GATE_ALIASES = {
+    'gate_id': ('gate_id', 'id', 'gate'),
+    'gate_name': ('gate_name', 'name'),
+    'capacity_per_hour': ('capacity_per_hour', 'capacity'),
+    'gps': ('gps',),
+}
+TIMELINE_ALIASES = {
+    'start': ('start', 'start_datetime', 'start_time', 'starttime'),
+    'end': ('end', 'end_datetime', 'end_time', 'endtime'),
+    'event_name': ('event_name', 'name'),
+    'location_name': ('venue', 'location'),
+}
+TRANSPORT_ALIASES = {
+    'transport_type': ('transport', 'type', 'mode'),
+    'stop_name': ('stop_name', 'stop', 'station'),
+    'arrival_datetime': ('arrival', 'arrival_time', 'arrival_datetime'),
+    'est_capacity': ('capacity', 'est_capacity'),
+}
+FACILITY_ALIASES = {
+    'type': ('type', 'category'),
+    'name': ('name',),
+    'capacity': ('capacity',),
+    'location': ('location', 'area'),
+}
+
+def _alias_columns(aliases: Dict[str, tuple]) -> set:
+    return {c for cols in aliases.values() for c in cols}
+
+# Sheets and (normalized) columns that _normalize_schema reads. Anything else in
+# the workbook is never materialized by the streaming reader.
+ATTENDEE_SHEET = 'Attendees'
+SHEET_COLUMNS: Dict[str, set] = {
+    'Gate_Capacity': _alias_columns(GATE_ALIASES),
+    'Event_Timeline': _alias_columns(TIMELINE_ALIASES),
+    'Transport_Schedule': _alias_columns(TRANSPORT_ALIASES),
+    'Facilities': _alias_columns(FACILITY_ALIASES),
+}
+
+def _normalize_column_name(c) -> str:
+    return str(c).strip().lower().replace(' ', '_')
 
 def _normalize_columns(df: pd.DataFrame) -> pd.DataFrame:
     df = df.copy()
-    df.columns = [str(c).strip().lower().replace(' ', '_') for c in df.columns]
+    df.columns = [_normalize_column_name(c) for c in df.columns]
     return df
 
 def _parse_datetime(value) -> str:
@@ -28,6 +86,79 @@ def _parse_datetime(value) -> str:
         except Exception:
             return ''
 
+def _truthy(col: pd.Series) -> pd.Series:
+    """Element-wise Python truthiness (NaN is truthy, None/''/0 are not)."""
+    if pd.api.types.is_datetime64_any_dtype(col):
+        return pd.Series(True, index=col.index)
+    return col.astype(bool)
+
+def _column(df: pd.DataFrame, col: str) -> pd.Series:
+    return df[col] if col in df.columns else pd.Series(None, index=df.index, dtype=object)
+
+def _coalesce(df: pd.DataFrame, aliases: tuple, default: Any = '') -> pd.Series:
+    """Whole-column `r.get(aliases[0]) or r.get(aliases[1]) or ... or default`.
+
+    ``default`` may be a Series, for chains without an explicit fallback where
+    the last alias' raw value is the result.
+    """
+    out = default if isinstance(default, pd.Series) else pd.Series(default, index=df.index, dtype=object)
+    for col in reversed(aliases):
+        if col in df.columns:
+            values = df[col]
+            out = values.where(_truthy(values), out)
+    return out
+
+def _to_str(col: pd.Series) -> pd.Series:
+    return col.astype(str).str.strip()
+
+def _to_int(col: pd.Series) -> List[int]:
+    """Whole-column int(value); raises ValueError on NaN/non-numeric like int() does."""
+    if pd.api.types.is_integer_dtype(col):
+        return col.tolist()
+    try:
+        num = pd.to_numeric(col, errors='raise').astype(float)
+    except (TypeError, ValueError):
+        return [int(v) for v in col]  # same result/error as the scalar path
+    if not np.isfinite(num).all():
+        raise ValueError(f"cannot convert non-finite value to integer in column {col.name!r}")
+    return np.trunc(num).astype(np.int64).tolist()
+
+def _isoformat(parsed: pd.Series) -> pd.Series:
+    if parsed.dt.tz is None and not (parsed.dt.microsecond.any() or parsed.dt.nanosecond.any()):
+        return pd.Series(np.datetime_as_string(parsed.to_numpy(dtype='datetime64[s]'), unit='s'),
+                         index=parsed.index, dtype=object)
+    return parsed.map(lambda t: t.isoformat())
+
+def _parse_datetime_column(col: pd.Series) -> pd.Series:
+    """Whole-column _parse_datetime. Values pandas cannot parse in bulk (mixed
+    timezones, time-only cells, ...) go through the scalar path."""
+    out = pd.Series('', index=col.index, dtype=object)
+    present = col[col.notna()]
+    if present.empty:
+        return out
+    try:
+        if pd.api.types.is_datetime64_any_dtype(present):
+            parsed = present
+        else:
+            parsed = pd.to_datetime(present, errors='coerce', format='mixed')
+    except (TypeError, ValueError):
+        parsed = None
+    if parsed is None or not pd.api.types.is_datetime64_any_dtype(parsed):
+        # e.g. mixed timezones, which pandas cannot hold in one column
+        out[present.index] = present.map(_parse_datetime)
+        return out
+    ok = parsed.notna()
+    out[parsed.index[ok]] = _isoformat(parsed[ok])
+    failed = parsed.index[~ok]
+    if len(failed):
+        out[failed] = present[failed].map(_parse_datetime)
+    return out
+
+def _records(columns: Dict[str, Any]) -> List[Dict[str, Any]]:
+    keys = list(columns)
+    values = [v.tolist() if hasattr(v, 'tolist') else v for v in columns.values()]
+    return [dict(zip(keys, row)) for row in zip(*values)]
+
 def _build_sample_event() -> Dict[str, Any]:
     return {
         "event_name": "Bukit Jalil Concert",
@@ -53,8 +184,7 @@ def _build_sample_event() -> Dict[str, Any]:
         ]
     }
 
-def _normalize_schema(sheets: Dict[str, pd.DataFrame]) -> Dict[str, Any]:
-    attendees_df = _normalize_columns(sheets.get('Attendees', pd.DataFrame()))
+def _normalize_schema(sheets: Dict[str, pd.DataFrame], attendee_count: int | None = None) -> Dict[str, Any]:
     gates_df = _normalize_columns(sheets.get('Gate_Capacity', pd.DataFrame()))
     timeline_df = _normalize_columns(sheets.get('Event_Timeline', pd.DataFrame()))
     transport_df = _normalize_columns(sheets.get('Transport_Schedule', pd.DataFrame()))
@@ -66,32 +196,22 @@ def _normalize_schema(sheets: Dict[str, pd.DataFrame]) -> Dict[str, Any]:
     event_start = ''
     event_end = ''
     if not timeline_df.empty:
-        # Normalize possible column names for start/end
-        start_cols = [c for c in timeline_df.columns if c in ('start','start_datetime','start_time','starttime')]
-        end_cols = [c for c in timeline_df.columns if c in ('end','end_datetime','end_time','endtime')]
-
-        # Compute global min start and max end across all rows
-        starts: list[str] = []
-        ends: list[str] = []
-        if start_cols:
-            for _, r in timeline_df.iterrows():
-                for col in start_cols:
-                    val = _parse_datetime(r.get(col))
-                    if val:
-                        starts.append(val)
-                        break
-        if end_cols:
-            for _, r in timeline_df.iterrows():
-                for col in end_cols:
-                    val = _parse_datetime(r.get(col))
-                    if val:
-                        ends.append(val)
-                        break
-
-        if starts:
-            event_start = sorted(starts)[0]  # earliest
-        if ends:
-            event_end = sorted(ends)[-1]     # latest
+        # Global min start / max end across all rows; per row, the first
+        # start/end column (in sheet order) that parses wins.
+        for field in ('start', 'end'):
+            cols = [c for c in timeline_df.columns if c in TIMELINE_ALIASES[field]]
+            if not cols:
+                continue
+            values = pd.Series('', index=timeline_df.index, dtype=object)
+            for col in reversed(cols):
+                parsed = _parse_datetime_column(timeline_df[col])
+                values = parsed.where(parsed != '', values)
+            values = values[values != '']
+            if not values.empty:
+                if field == 'start':
+                    event_start = values.min()  # earliest
+                else:
+                    event_end = values.max()    # latest
 
         # Optional metadata (if present in this sheet)
         row0 = timeline_df.iloc[0].to_dict()
@@ -101,38 +221,42 @@ def _normalize_schema(sheets: Dict[str, pd.DataFrame]) -> Dict[str, Any]:
     # Gates
     gates: List[Dict[str, Any]] = []
     if not gates_df.empty:
-        for _, r in gates_df.iterrows():
-            gates.append({
-                'gate_id': str(r.get('gate_id') or r.get('id') or r.get('gate') or '').strip(),
-                'gate_name': str(r.get('gate_name') or r.get('name') or '').strip() or f"Gate {r.get('gate_id')}",
-                'capacity_per_hour': int(r.get('capacity_per_hour') or r.get('capacity') or 0),
-                'gps': (str(r.get('gps')) if pd.notna(r.get('gps')) else None)
-            })
+        gate_name = _to_str(_coalesce(gates_df, GATE_ALIASES['gate_name']))
+        fallback_name = 'Gate ' + (gates_df['gate_id'].astype(str) if 'gate_id' in gates_df.columns else 'None')
+        gps = _column(gates_df, 'gps')
+        gates = _records({
+            'gate_id': _to_str(_coalesce(gates_df, GATE_ALIASES['gate_id'])),
+            'gate_name': gate_name.where(gate_name != '', fallback_name),
+            'capacity_per_hour': _to_int(_coalesce(gates_df, GATE_ALIASES['capacity_per_hour'], 0)),
+            'gps': np.where(gps.notna(), gps.astype(str), None)
+        })
 
     # Transport
     transport_schedule: List[Dict[str, Any]] = []
     if not transport_df.empty:
-        for _, r in transport_df.iterrows():
-            transport_schedule.append({
-                'transport_type': str(r.get('transport') or r.get('type') or r.get('mode') or '').strip(),
-                'stop_name': str(r.get('stop_name') or r.get('stop') or r.get('station') or '').strip(),
-                'arrival_datetime': _parse_datetime(r.get('arrival') or r.get('arrival_time') or r.get('arrival_datetime')),
-                'est_capacity': int(r.get('capacity') or r.get('est_capacity') or 0)
-            })
+        transport_schedule = _records({
+            'transport_type': _to_str(_coalesce(transport_df, TRANSPORT_ALIASES['transport_type'])),
+            'stop_name': _to_str(_coalesce(transport_df, TRANSPORT_ALIASES['stop_name'])),
+            'arrival_datetime': _parse_datetime_column(_coalesce(
+                transport_df, TRANSPORT_ALIASES['arrival_datetime'][:-1],
+                _column(transport_df, TRANSPORT_ALIASES['arrival_datetime'][-1]))),
+            'est_capacity': _to_int(_coalesce(transport_df, TRANSPORT_ALIASES['est_capacity'], 0))
+        })
 
     # Facilities
     facilities: List[Dict[str, Any]] = []
     if not facilities_df.empty:
-        for _, r in facilities_df.iterrows():
-            facilities.append({
-                'type': str(r.get('type') or r.get('category') or '').strip().lower(),
-                'name': str(r.get('name') or '').strip(),
-                'capacity': int(r.get('capacity') or 0),
-                'location': str(r.get('location') or r.get('area') or '').strip()
-            })
+        facilities = _records({
+            'type': _to_str(_coalesce(facilities_df, FACILITY_ALIASES['type'])).str.lower(),
+            'name': _to_str(_coalesce(facilities_df, FACILITY_ALIASES['name'])),
+            'capacity': _to_int(_coalesce(facilities_df, FACILITY_ALIASES['capacity'], 0)),
+            'location': _to_str(_coalesce(facilities_df, FACILITY_ALIASES['location']))
+        })
 
-    # Attendees
-    expected_attendance = int(len(attendees_df)) if not attendees_df.empty else 0
+    # Attendees: only the row count is used, so the streaming reader passes it in
+    if attendee_count is None:
+        attendee_count = len(sheets.get(ATTENDEE_SHEET, pd.DataFrame()))
+    expected_attendance = int(attendee_count)
 
     normalized = {
         'event_name': event_name or 'Unnamed Event',
@@ -146,28 +270,97 @@ def _normalize_schema(sheets: Dict[str, pd.DataFrame]) -> Dict[str, Any]:
     }
     return normalized
 
-def parse_excel_file(file_content: bytes) -> Dict[str, Any]:
+_XLSX_MAIN_NS = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+_XLSX_REL_NS = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}'
+
+def _xlsx_sheet_path(zf: zipfile.ZipFile, sheet_name: str) -> str:
+    workbook = ET.fromstring(zf.read('xl/workbook.xml'))
+    rel_ids = {s.get('name'): s.get(_XLSX_REL_NS + 'id') for s in workbook.iter(_XLSX_MAIN_NS + 'sheet')}
+    rels = ET.fromstring(zf.read('xl/_rels/workbook.xml.rels'))
+    target = {r.get('Id'): r.get('Target') for r in rels}[rel_ids[sheet_name]]
+    return target.lstrip('/') if target.startswith('/') else posixpath.normpath(posixpath.join('xl', target))
+
+def _count_xlsx_data_rows(source: FileSource, sheet_name: str, archive: Optional[zipfile.ZipFile] = None) -> int:
+    """Rows under the header, counted like len(pd.read_excel(...)) without building a DataFrame.
+
+    Streams the sheet XML and keeps only the last row number (``r``) holding a
+    value, so memory stays flat for 30k-450k row attendee sheets. pandas takes
+    row 1 as the header and keeps every row up to the last non-blank one,
+    blank rows in between included. Pass ``archive`` (an already open
+    workbook zip) to avoid opening the file again.
+    """
+    if archive is None:
+        with zipfile.ZipFile(_as_file(source)) as zf:
+            return _count_xlsx_data_rows(source, sheet_name, zf)
+    row_tag, value_tags = _XLSX_MAIN_NS + 'row', (_XLSX_MAIN_NS + 'v', _XLSX_MAIN_NS + 't')
+    last = number = 0
+    with archive.open(_xlsx_sheet_path(archive, sheet_name)) as f:
+        for _, el in ET.iterparse(f):
+            if el.tag == row_tag:
+                # r is optional in the format; without it a row follows the previous one
+                number = int(el.get('r') or number + 1)
+                if any(e.text for e in el.iter() if e.tag in value_tags):
+                    last = number
+                el.clear()
+    return max(0, last - 1)
+
+def read_excel_streaming(source: FileSource) -> tuple[Dict[str, pd.DataFrame], int]:
+    """Open the workbook once (read-only) and load only what _normalize_schema needs.
+
+    Returns the small sheets restricted to their known columns, plus the
+    attendee row count, which is streamed instead of loaded into a DataFrame.
+    """
+    with pd.ExcelFile(_as_file(source)) as xl:
+        sheets: Dict[str, pd.DataFrame] = {}
+        for name, wanted in SHEET_COLUMNS.items():
+            if name in xl.sheet_names:
+                frame = xl.parse(name, usecols=lambda c, wanted=wanted: _normalize_column_name(c) in wanted)
+                if frame.columns.empty:
+                    # No known header at all: keep the rows (e.g. placeholder gates) as before
+                    frame = xl.parse(name)
+                sheets[name] = frame
+        attendee_count = 0
+        if ATTENDEE_SHEET in xl.sheet_names:
+            if xl.engine == 'openpyxl':
+                # Read-only openpyxl keeps the workbook zip open for lazy sheets; count from it (no second open)
+                attendee_count = _count_xlsx_data_rows(source, ATTENDEE_SHEET, getattr(xl.book, '_archive', None))
+            else:
+                attendee_count = len(xl.parse(ATTENDEE_SHEET))
+    return sheets, attendee_count
+
+def _parse_excel_sheets(source: FileSource) -> tuple[Dict[str, Any] | None, Dict[str, pd.DataFrame]]:
     try:
-        sheets = pd.read_excel(io.BytesIO(file_content), sheet_name=None)
-        normalized = _normalize_schema(sheets)
-        return normalized
+        sheets, attendee_count = read_excel_streaming(source)
+        normalized = _normalize_schema(sheets, attendee_count)
+        return normalized, sheets
     except Exception as e:
         print(f"Error parsing Excel file: {e}")
-        return None
+        return None, {}
+
+def parse_excel_file(source: FileSource) -> Dict[str, Any]:
+    return _parse_excel_sheets(source)[0]
 
-def parse_pdf_file(file_content: bytes) -> Dict[str, Any]:
+def parse_pdf_file(source: FileSource) -> Dict[str, Any]:
     # Try AWS Textract first
     try:
-        textract = boto3.client('textract')
+        if _source_size(source) > TEXTRACT_MAX_BYTES:
+            raise ValueError(f"document larger than {TEXTRACT_MAX_BYTES} bytes")
+        if isinstance(source, str):
+            with open(source, 'rb') as f:
+                source_bytes = f.read()
+        else:
+            source_bytes = source
+        textract = get_client('textract')
         response = textract.analyze_document(
-            Document={'Bytes': file_content},
+            Document={'Bytes': source_bytes},
             FeatureTypes=['TABLES', 'FORMS']
         )
         text = " ".join([b.get('Text', '') for b in [w for p in response.get('Blocks', []) for w in [p] if w.get('BlockType') == 'WORD']])
     except Exception as tex_e:
         print(f"Textract failed, falling back to PyPDF2: {tex_e}")
         try:
-            reader = PyPDF2.PdfReader(io.BytesIO(file_content))
+            import PyPDF2
+            reader = PyPDF2.PdfReader(_as_file(source))
             text = ""
             for page in reader.pages:
                 text += page.extract_text() or ""
@@ -197,24 +390,58 @@ def parse_pdf_file(file_content: bytes) -> Dict[str, Any]:
         print(f"Error normalizing PDF text: {e}")
         return None
 
+EXCEL_CONTENT_TYPES = ('application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', 'application/vnd.ms-excel')
+PDF_CONTENT_TYPE = 'application/pdf'
+
+def parse_file_cached(source: FileSource, file_type: str, digest: str | None = None) -> tuple[Dict[str, Any] | None, bool]:
+    """parse_excel_file / parse_pdf_file behind the content-addressed parse cache.
+
+    ``digest`` is the SHA-256 hex of the content when the caller already
+    computed it while receiving the upload. Returns (normalized or None,
+    cache_hit). Failed parses are not cached. Raises ValueError for
+    unsupported content types.
+    """
+    if file_type in EXCEL_CONTENT_TYPES:
+        kind = 'excel'
+    elif file_type == PDF_CONTENT_TYPE:
+        kind = 'pdf'
+    else:
+        raise ValueError(f"Unsupported file type: {file_type}")
+
+    cache = get_parse_cache()
+    key = cache.key_for(kind, digest or content_digest(source))
+    cached = cache.get(key)
+    if cached is not None:
+        return cached, True
+
+    sheets: Dict[str, pd.DataFrame] = {}
+    if kind == 'excel':
+        parsed, sheets = _parse_excel_sheets(source)
+    else:
+        parsed = parse_pdf_file(source)
+    if parsed:
+        cache.put(key, parsed, sheets)
+    return parsed, False
+
 def parse_file_data(s3_key: str, file_type: str):
-    s3_helper = S3Helper()
-    ddb = DynamoDBHelper()
-    sns = SNSHelper()
-    file_content = s3_helper.download_file(s3_key)
+    storage = get_storage()
+    file_content = storage.download_file(s3_key)
 
     if not file_content:
         # Fallback to sample on download failure as well
         sample = _build_sample_event()
-        return {"status": "success", "data": sample, "message": "S3 download failed; loaded sample."}
+        return {"status": "success", "data": sample, "cache_hit": False, "message": "S3 download failed; loaded sample."}
 
-    parsed_data: Dict[str, Any] | None = None
-    if file_type in ('application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', 'application/vnd.ms-excel'):
-        parsed_data = parse_excel_file(file_content)
-    elif file_type == 'application/pdf':
-        parsed_data = parse_pdf_file(file_content)
-    else:
-        return {"status": "error", "message": f"Unsupported file type: {file_type}"}
+    return process_file_content(file_content, file_type)
+
+def process_file_content(source: FileSource, file_type: str, digest: str | None = None):
+    """Parse an upload already available locally, then persist the event and notify."""
+    ddb = get_dynamodb()
+    sns = SNSHelper()
+    try:
+        parsed_data, cache_hit = parse_file_cached(source, file_type, digest)
+    except ValueError as e:
+        return {"status": "error", "message": str(e)}
 
     if not parsed_data:
         # Always fallback to sample
@@ -242,13 +469,13 @@ def parse_file_data(s3_key: str, file_type: str):
         }
         ddb.put_event(event_item)
 
-        # Stream attendees in batches if available
-        try:
-            # If we had attendees dataframe, we could store it. For now, look for S3 key convention to re-read with pandas.
-            # Skipping due to memory; real pipeline would chunk 30k-450k rows using pandas read_excel with chunksize (CSV) or pyarrow.
-            pass
-        except Exception as e:
-            print(f"Attendee batch processing error: {e}")
+        # Stream attendees in chunks (opt-in: one item per attendee row)
+        if file_type in EXCEL_CONTENT_TYPES and os.environ.get('ATTENDEE_INGEST', '0') == '1':
+            try:
+                from src.handlers.attendee_pipeline import ingest_attendees
+                print(f"Attendee ingestion: {ingest_attendees(source, event_id)}")
+            except Exception as e:
+                print(f"Attendee batch processing error: {e}")
 
         # Send SNS info alert
         sns.publish_alert(
@@ -262,4 +489,4 @@ def parse_file_data(s3_key: str, file_type: str):
     except Exception as e:
         print(f"Error during AWS integrations: {e}")
 
-    return {"status": "success", "data": parsed_data}
+    return {"status": "success", "data": parsed_data, "cache_hit": cache_hit}
@@ -1,12 +1,188 @@
 import json
 import base64
+import hashlib
+import os
+import tempfile
 from datetime import datetime
-from src.utils.aws_helper import S3Helper
-from src.handlers.data_parser import parse_file_data
+from typing import Any, Dict, Tuple, Union
+from src.utils.aws_helper import get_storage
+from src.utils.upload_archive import get_archive_tracker
+
+# data_parser (pandas, numpy) is imported inside the functions that parse, so
+# importing this module - as lambda_function does on cold start - stays cheap.
+FileSource = Union[bytes, str]
+
+# Uploads above this many bytes are spooled to a temp file instead of memory
+UPLOAD_SPOOL_THRESHOLD = int(os.environ.get('UPLOAD_SPOOL_THRESHOLD', 8 * 1024 * 1024))
+UPLOAD_MAX_BYTES = int(os.environ.get('UPLOAD_MAX_BYTES', 512 * 1024 * 1024))
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+# How the archive write relates to parsing:
+#   roundtrip  - upload, download the same object back, then parse (original flow)
+#   concurrent - parse the local bytes while the archive write runs; respond after both
+#   background - parse the local bytes and respond; the archive write finishes later
+#                (not for Lambda, which freezes the process once the handler returns)
+UPLOAD_PIPELINE = os.environ.get('UPLOAD_PIPELINE', 'concurrent')
+
+
+class UploadTooLarge(ValueError):
+    pass
+
+
+class UploadSpool:
+    """Receives an upload in chunks and hashes it on the way in.
+
+    Bytes stay in memory up to ``threshold``; past that they move to a named
+    temp file, so large workbooks are parsed and archived from disk with
+    bounded memory. Use as a context manager to delete the temp file.
+    """
+
+    def __init__(self, threshold: int = UPLOAD_SPOOL_THRESHOLD, max_bytes: int = UPLOAD_MAX_BYTES):
+        self.threshold = threshold
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.path = None
+        self._buffer = bytearray()
+        self._file = None
+        self._sha256 = hashlib.sha256()
+
+    def write(self, chunk: bytes):
+        self.size += len(chunk)
+        if self.size > self.max_bytes:
+            raise UploadTooLarge(f'Upload exceeds {self.max_bytes} bytes.')
+        self._sha256.update(chunk)
+        if self._file is None and len(self._buffer) + len(chunk) > self.threshold:
+            fd, self.path = tempfile.mkstemp(prefix='upload-', suffix='.spool')
+            self._file = os.fdopen(fd, 'wb')
+            self._file.write(self._buffer)
+            self._buffer = bytearray()
+        if self._file is not None:
+            self._file.write(chunk)
+        else:
+            self._buffer += chunk
+
+    def finish(self) -> FileSource:
+        """The complete upload: bytes if it stayed in memory, else the spool file path."""
+        if self._file is not None:
+            self._file.close()
+            return self.path
+        return bytes(self._buffer)
+
+    @property
+    def digest(self) -> str:
+        return self._sha256.hexdigest()
+
+    def cleanup(self):
+        if self._file is not None:
+            self._file.close()
+        if self.path and os.path.exists(self.path):
+            os.unlink(self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cleanup()
+        return False
+
+
+def _unique_file_name(file_name: str) -> str:
+    # Add a timestamp to the filename to avoid overwrites and ensure uniqueness
+    timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
+    return f"{timestamp}_{file_name}"
+
+
+def upload_and_parse(file_content: bytes, file_name: str, content_type: str,
+                     mode: str | None = None) -> Tuple[int, Dict[str, Any]]:
+    """Archive decoded bytes and parse them. Returns (status code, response body)."""
+    mode = mode or UPLOAD_PIPELINE
+    if mode == 'roundtrip':
+        return _upload_then_parse(file_content, file_name, content_type)
+    return _archive_and_parse(file_content, file_name, content_type, None, mode)
+
+
+def upload_and_parse_spooled(source: FileSource, file_name: str, content_type: str,
+                             digest: str | None = None) -> Tuple[int, Dict[str, Any]]:
+    """Archive a spooled upload and parse it straight from the spool.
+
+    Always waits for the archive write, since the spool file is deleted once
+    the request finishes.
+    """
+    return _archive_and_parse(source, file_name, content_type, digest, 'concurrent')
+
+
+def run_upload_job(source: FileSource, file_name: str, content_type: str,
+                   digest: str | None = None) -> Tuple[int, Dict[str, Any]]:
+    """Upload job entry point for the worker pool (see utils/upload_jobs.py).
+
+    The archive write always finishes inside the job: a worker process keeps
+    its own archive tracker, so a 'background' write could not be polled.
+    """
+    if isinstance(source, str):
+        return upload_and_parse_spooled(source, file_name, content_type, digest)
+    mode = 'concurrent' if UPLOAD_PIPELINE == 'background' else UPLOAD_PIPELINE
+    return upload_and_parse(source, file_name, content_type, mode=mode)
+
+
+def record_upload_result(result: Tuple[int, Dict[str, Any]]):
+    """Mirror a worker-process job's archive status and cache lookup into this process,
+    so the archive status and parse cache stats endpoints see them."""
+    _, body = result
+    if body.get('archive'):
+        get_archive_tracker().record(body['archive'])
+    if 'cache_hit' in body:
+        from src.utils.parse_cache import get_parse_cache
+        get_parse_cache().record_lookup(bool(body['cache_hit']))
+
+
+def _upload_then_parse(file_content: bytes, file_name: str, content_type: str) -> Tuple[int, Dict[str, Any]]:
+    storage = get_storage()
+    unique_file_name = _unique_file_name(file_name)
+
+    if storage.upload_file(file_content, unique_file_name, content_type):
+        # After successful upload, parse the file
+        from src.handlers.data_parser import parse_file_data
+        parsed_result = parse_file_data(unique_file_name, content_type)
+
+        if parsed_result['status'] == 'success':
+            return 200, {
+                'message': f'File {file_name} uploaded and parsed successfully as {unique_file_name}.',
+                's3_key': unique_file_name,
+                # Return normalized JSON as provided by the parser
+                'data': parsed_result['data'],
+                'cache_hit': parsed_result.get('cache_hit', False)
+            }
+        return 500, {
+            'message': f"File uploaded but failed to parse: {parsed_result['message']}",
+            's3_key': unique_file_name
+        }
+    return 500, {'message': 'Failed to upload file to S3.'}
+
+
+def _archive_and_parse(source: FileSource, file_name: str, content_type: str,
+                       digest: str | None, mode: str) -> Tuple[int, Dict[str, Any]]:
+    tracker = get_archive_tracker()
+    unique_file_name = _unique_file_name(file_name)
+    archive = tracker.submit(get_storage(), source, unique_file_name, content_type)
+
+    from src.handlers.data_parser import process_file_content
+    parsed_result = process_file_content(source, content_type, digest)
+    if mode != 'background':
+        archive.result()
+    archive_status = tracker.status(unique_file_name)
+
+    if parsed_result['status'] != 'success':
+        return 400, {'message': f"Failed to parse: {parsed_result['message']}", 'archive': archive_status}
+
+    return 200, {
+        'message': f"File {file_name} parsed successfully; archive {archive_status['status']} as {unique_file_name}.",
+        's3_key': unique_file_name if archive_status['status'] != 'failed' else None,
+        'data': parsed_result['data'],
+        'cache_hit': parsed_result.get('cache_hit', False),
+        'archive': archive_status
+    }
+
 
 def handle_file_upload(event):
-    s3_helper = S3Helper()
-    
     try:
         # Assuming file content is sent as base64 encoded string in the event body
         body = json.loads(event['body'])
@@ -15,38 +191,11 @@ def handle_file_upload(event):
         content_type = body.get('content_type', 'application/octet-stream')
 
         file_content = base64.b64decode(file_content_base64)
-        
-        # Add a timestamp to the filename to avoid overwrites and ensure uniqueness
-        timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
-        unique_file_name = f"{timestamp}_{file_name}"
-
-        if s3_helper.upload_file(file_content, unique_file_name, content_type):
-            # After successful upload, parse the file
-            parsed_result = parse_file_data(unique_file_name, content_type)
-            
-            if parsed_result['status'] == 'success':
-                return {
-                    'statusCode': 200,
-                    'body': json.dumps({
-                        'message': f'File {file_name} uploaded and parsed successfully as {unique_file_name}.',
-                        's3_key': unique_file_name,
-                        # Return normalized JSON as provided by the parser
-                        'data': parsed_result['data']
-                    })
-                }
-            else:
-                return {
-                    'statusCode': 500,
-                    'body': json.dumps({
-                        'message': f"File uploaded but failed to parse: {parsed_result['message']}",
-                        's3_key': unique_file_name
-                    })
-                }
-        else:
-            return {
-                'statusCode': 500,
-                'body': json.dumps({'message': 'Failed to upload file to S3.'})
-            }
+        status, response_body = upload_and_parse(file_content, file_name, content_type)
+        return {
+            'statusCode': status,
+            'body': json.dumps(response_body)
+        }
     except KeyError as e:
         return {
             'statusCode': 400,
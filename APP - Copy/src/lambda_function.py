@@ -1,5 +1,8 @@
 import json
-from src.handlers.file_upload_handler import handle_file_upload
+import os
+
+# Events can carry a multi-megabyte base64 body; log a bounded summary instead
+LOG_EVENT_MAX_CHARS = int(os.environ.get('LOG_EVENT_MAX_CHARS', 1024))
 
 def _cors_headers():
     return {
@@ -8,8 +11,19 @@ def _cors_headers():
         'Access-Control-Allow-Methods': 'OPTIONS,POST,GET'
     }
 
+def _event_summary(event) -> str:
+    body = event.get('body') or ''
+    summary = {
+        'httpMethod': event.get('httpMethod'),
+        'path': event.get('path'),
+        'body_length': len(body),
+        'body_preview': body[:min(200, LOG_EVENT_MAX_CHARS)],
+    }
+    text = json.dumps(summary, default=str)
+    return text if len(text) <= LOG_EVENT_MAX_CHARS else text[:LOG_EVENT_MAX_CHARS] + '...'
+
 def lambda_handler(event, context):
-    print("Received event:", json.dumps(event))
+    print("Received event:", _event_summary(event))
 
     # CORS preflight
     if event.get('httpMethod') == 'OPTIONS':
@@ -20,6 +34,8 @@ def lambda_handler(event, context):
         }
 
     if event.get('httpMethod') == 'POST' and event.get('path') == '/upload':
+        # Imported on first upload only, so preflights and 404s skip the parser stack
+        from src.handlers.file_upload_handler import handle_file_upload
         resp = handle_file_upload(event)
         # Ensure CORS headers present
         resp['headers'] = {**_cors_headers(), **resp.get('headers', {})}
@@ -0,0 +1,240 @@
+import asyncio
+import itertools
+import json
+import os
+import time
+from collections import deque
+from typing import Any, Dict, Iterable, Optional
+
+from fastapi import WebSocket
+
+from src.utils.latency_stats import LatencyWindow
+
+# Broadcast messages queued per connection before the slow-consumer policy applies
+WS_QUEUE_SIZE = int(os.environ.get('WS_QUEUE_SIZE', 256))
+# Most messages a writer takes off its queue per flush
+WS_FLUSH_MAX = int(os.environ.get('WS_FLUSH_MAX', 64))
+# What a full queue does with a new broadcast: drop_oldest, drop_newest or disconnect
+WS_SLOW_POLICY = os.environ.get('WS_SLOW_POLICY', 'drop_oldest')
+# A flush that takes longer than this closes the connection
+WS_SEND_TIMEOUT_SECONDS = float(os.environ.get('WS_SEND_TIMEOUT_SECONDS', 10))
+
+SLOW_POLICIES = ('drop_oldest', 'drop_newest', 'disconnect')
+
+
+class _Outgoing:
+    __slots__ = ('text', 'key', 'broadcast_id', 'queued_at')
+
+    def __init__(self, text: str, key: Optional[str], broadcast_id: Optional[int]):
+        self.text = text
+        self.key = key
+        self.broadcast_id = broadcast_id
+        self.queued_at = time.perf_counter()
+
+
+class _Client:
+    __slots__ = ('websocket', 'client_id', 'topics', 'batch', 'queue', 'broadcasts_queued', 'wake', 'task',
+                 'sent', 'dropped')
+
+    def __init__(self, websocket: WebSocket, client_id: str, topics: Optional[set], batch: bool):
+        self.websocket = websocket
+        self.client_id = client_id
+        self.topics = topics
+        self.batch = batch
+        self.queue = deque()
+        self.broadcasts_queued = 0  # queue entries that came from broadcast (bounded); the rest are direct
+        self.wake = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+        self.sent = 0
+        self.dropped = 0
+
+
+class ConnectionManager:
+    """WebSocket connections with per-client outbound queues and writer tasks.
+
+    ``send_message`` and ``broadcast`` only queue; each connection's writer
+    task drains up to ``flush_max`` messages per wake-up, so a slow socket
+    holds up nobody but itself. Direct messages (chat replies) are never
+    dropped. Broadcasts that carry a ``key`` replace a queued broadcast with
+    the same key (latest gate state wins); when a queue holds ``queue_size``
+    broadcasts, ``policy`` drops the oldest, drops the new one or disconnects
+    the client. Clients connected with ``batch`` get each flush as a single
+    {"type": "batch", "messages": [...]} frame.
+    """
+
+    def __init__(self, queue_size: int = WS_QUEUE_SIZE, flush_max: int = WS_FLUSH_MAX,
+                 policy: str = WS_SLOW_POLICY, send_timeout: float = WS_SEND_TIMEOUT_SECONDS):
+        if policy not in SLOW_POLICIES:
+            raise ValueError(f"Unknown slow-consumer policy '{policy}', expected one of {SLOW_POLICIES}")
+        if queue_size < 1:
+            raise ValueError(f"queue_size must be at least 1, got {queue_size}")
+        self.queue_size = queue_size
+        self.flush_max = flush_max
+        self.policy = policy
+        self.send_timeout = send_timeout
+        self.active_connections: Dict[str, _Client] = {}
+        self._broadcast_ids = itertools.count(1)
+        # broadcast id -> [started, deliveries outstanding]
+        self._pending: Dict[int, list] = {}
+        self._fanout = LatencyWindow(size=512)
+        self._delivery = LatencyWindow()
+        self._stats = {'broadcasts': 0, 'sent': 0, 'frames': 0, 'dropped': 0, 'coalesced': 0,
+                       'slow_disconnects': 0, 'send_errors': 0}
+
+    async def connect(self, websocket: WebSocket, client_id: str,
+                      topics: Optional[Iterable[str]] = None, batch: bool = False):
+        """Accept the socket; ``topics`` limits which broadcasts it gets (None = all)."""
+        await websocket.accept()
+        self.disconnect(client_id)  # a reconnect with the same id replaces the old socket
+        client = _Client(websocket, client_id, set(topics) if topics else None, batch)
+        client.task = asyncio.create_task(self._writer(client))
+        self.active_connections[client_id] = client
+
+    def disconnect(self, client_id: str, websocket: Optional[WebSocket] = None):
+        """Drop the connection; with ``websocket``, only if that socket is still the current one."""
+        client = self.active_connections.get(client_id)
+        if client is None or (websocket is not None and client.websocket is not websocket):
+            return
+        del self.active_connections[client_id]
+        if client.task is not None and client.task is not asyncio.current_task():
+            client.task.cancel()
+        while client.queue:
+            self._settle(client.queue.popleft())
+
+    async def send_message(self, message: str, client_id: str):
+        """Queue ``message``, already JSON text, for one client; never dropped."""
+        client = self.active_connections.get(client_id)
+        if client is not None:
+            client.queue.append(_Outgoing(message, None, None))
+            client.wake.set()
+
+    def broadcast(self, message: Any, topic: Optional[str] = None, key: Optional[str] = None) -> int:
+        """Queue ``message`` for every client subscribed to ``topic`` (all clients when None).
+
+        ``message`` is JSON-encoded, a plain string included, so every frame and
+        every entry of a batch frame is valid JSON. Must be called on the event
+        loop thread. Returns how many clients it was queued for.
+        """
+        text = json.dumps(message)
+        broadcast_id = next(self._broadcast_ids)
+        pending = self._pending[broadcast_id] = [time.perf_counter(), 0]
+        item = _Outgoing(text, key, broadcast_id)  # shared by every queue; nothing per client is copied
+        queued = 0
+        for client in list(self.active_connections.values()):
+            if topic is not None and client.topics is not None and topic not in client.topics:
+                continue
+            if self._enqueue(client, item):
+                pending[1] += 1
+                queued += 1
+        self._stats['broadcasts'] += 1
+        if pending[1] == 0:
+            del self._pending[broadcast_id]
+        return queued
+
+    def _enqueue(self, client: _Client, item: _Outgoing) -> bool:
+        queue = client.queue
+        if item.key is not None:
+            for i, queued in enumerate(queue):
+                if queued.key == item.key:
+                    queue[i] = item
+                    self._stats['coalesced'] += 1
+                    self._settle(queued)
+                    return True
+        if client.broadcasts_queued >= self.queue_size:
+            if self.policy == 'drop_newest':
+                self._dropped(client)
+                return False
+            if self.policy == 'disconnect':
+                self._stats['slow_disconnects'] += 1
+                self._dropped(client)
+                self.disconnect(client.client_id)
+                asyncio.ensure_future(self._close(client.websocket, 1013, 'Too slow'))
+                return False
+            oldest = next(queued for queued in queue if queued.broadcast_id is not None)
+            queue.remove(oldest)
+            client.broadcasts_queued -= 1
+            self._dropped(client)
+            self._settle(oldest)
+        queue.append(item)
+        client.broadcasts_queued += 1
+        client.wake.set()
+        return True
+
+    def _dropped(self, client: _Client):
+        client.dropped += 1
+        self._stats['dropped'] += 1
+
+    def _settle(self, item: _Outgoing, delivered_at: Optional[float] = None):
+        """One fewer delivery outstanding for the item's broadcast; record fan-out when it was the last."""
+        if item.broadcast_id is None:
+            return
+        if delivered_at is not None:
+            self._delivery.add(delivered_at - item.queued_at)
+        pending = self._pending.get(item.broadcast_id)
+        if pending is None:
+            return
+        pending[1] -= 1
+        if pending[1] <= 0:
+            del self._pending[item.broadcast_id]
+            self._fanout.add(time.perf_counter() - pending[0])
+
+    async def _writer(self, client: _Client):
+        queue = client.queue
+        try:
+            while True:
+                if not queue:
+                    client.wake.clear()
+                    await client.wake.wait()
+                    continue
+                batch = [queue.popleft() for _ in range(min(len(queue), self.flush_max))]
+                client.broadcasts_queued -= sum(1 for item in batch if item.broadcast_id is not None)
+                delivered_at = None
+                try:
+                    # One deadline per flush; asyncio.timeout avoids a task per send
+                    async with asyncio.timeout(self.send_timeout):
+                        if client.batch and len(batch) > 1:
+                            await client.websocket.send_text(
+                                '{"type": "batch", "messages": [' + ', '.join(item.text for item in batch) + ']}'
+                            )
+                            self._stats['frames'] += 1
+                        else:
+                            for item in batch:
+                                await client.websocket.send_text(item.text)
+                            self._stats['frames'] += len(batch)
+                    delivered_at = time.perf_counter()
+                finally:
+                    # Failed or cancelled sends still settle, so fan-out bookkeeping never leaks
+                    for item in batch:
+                        self._settle(item, delivered_at)
+                client.sent += len(batch)
+                self._stats['sent'] += len(batch)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # Closed or stuck socket: the receive loop sees the disconnect; stop queueing for it now
+            self._stats['send_errors'] += 1
+            print(f"WebSocket send to {client.client_id} failed: {type(e).__name__} {e}")
+            self.disconnect(client.client_id, client.websocket)
+            await self._close(client.websocket, 1011, 'Send failed')
+
+    @staticmethod
+    async def _close(websocket: WebSocket, code: int, reason: str):
+        try:
+            await websocket.close(code=code, reason=reason)
+        except Exception:
+            pass  # already closed
+
+    def stats(self) -> Dict[str, Any]:
+        clients = list(self.active_connections.values())
+        return {
+            **self._stats,
+            'clients': len(clients),
+            'queued': sum(len(c.queue) for c in clients),
+            'max_queued': max((len(c.queue) for c in clients), default=0),
+            'broadcasts_in_flight': len(self._pending),
+            'fanout_latency': self._fanout.summary(),
+            'delivery_latency': self._delivery.summary(),
+            'queue_size': self.queue_size,
+            'flush_max': self.flush_max,
+            'policy': self.policy,
+        }
@@ -1,10 +1,81 @@
-import boto3
 import os
-from typing import List, Dict, Any
+import random
+import shutil
+import tempfile
+import threading
+import time
+from typing import Callable, List, Dict, Any, Tuple
+
+# BatchWriteItem accepts at most 25 put requests
+DDB_BATCH_LIMIT = 25
+
+# Keep-alive connections per client; size it to the FastAPI threadpool (40 by default)
+AWS_MAX_POOL_CONNECTIONS = int(os.environ.get('AWS_MAX_POOL_CONNECTIONS', 50))
+
+# Process-wide boto3 session and clients. Building a client resolves credentials,
+# loads the service model and opens a new connection pool, so each one is built
+# once on first use and shared across requests and warm Lambda invocations.
+# Clients are thread-safe; resources are not, so those are cached per thread.
+# Endpoint overrides come from boto3's own AWS_ENDPOINT_URL[_<SERVICE>] variables.
+_session = None
+_clients: Dict[Tuple[str, Any], Any] = {}
+_registry_lock = threading.Lock()
+_thread_resources = threading.local()
+
+
+def _client_config():
+    from botocore.config import Config
+    return Config(max_pool_connections=AWS_MAX_POOL_CONNECTIONS, tcp_keepalive=True)
+
+
+def _get_session():
+    # Caller holds the registry lock
+    global _session
+    if _session is None:
+        # Imported here so that modules which only reference the helpers stay cheap to load
+        import boto3
+        _session = boto3.session.Session()
+    return _session
+
+
+def get_client(service: str, region_name: str = None):
+    """Shared boto3 client for ``service``, created on first use."""
+    key = (service, region_name)
+    client = _clients.get(key)
+    if client is None:
+        with _registry_lock:
+            client = _clients.get(key)
+            if client is None:
+                client = _get_session().client(service, region_name=region_name, config=_client_config())
+                _clients[key] = client
+    return client
+
+
+def get_resource(service: str, region_name: str = None):
+    """boto3 resource for ``service``, created once per thread."""
+    cache = getattr(_thread_resources, 'resources', None)
+    if cache is None:
+        cache = _thread_resources.resources = {}
+    key = (service, region_name)
+    resource = cache.get(key)
+    if resource is None:
+        with _registry_lock:
+            resource = _get_session().resource(service, region_name=region_name, config=_client_config())
+        cache[key] = resource
+    return resource
+
+
+def reset_clients():
+    """Drop cached clients, e.g. after changing credentials or endpoints in tests."""
+    global _session
+    with _registry_lock:
+        _clients.clear()
+        _session = None
+        _thread_resources.__dict__.clear()
 
 class S3Helper:
     def __init__(self):
-        self.s3_client = boto3.client('s3')
+        self.s3_client = get_client('s3')
         self.bucket_name = os.environ.get('S3_BUCKET_NAME', 'crowd-safety-input-files') # Default bucket name
 
     def upload_file(self, file_content: bytes, file_name: str, content_type: str):
@@ -16,6 +87,16 @@ class S3Helper:
             print(f"Error uploading file to S3: {e}")
             return False
 
+    def upload_path(self, path: str, file_name: str, content_type: str):
+        """Upload a file from disk; boto3 streams it in parts instead of reading it into memory."""
+        try:
+            self.s3_client.upload_file(path, self.bucket_name, file_name, ExtraArgs={'ContentType': content_type})
+            print(f"File {file_name} uploaded to S3 bucket {self.bucket_name}")
+            return True
+        except Exception as e:
+            print(f"Error uploading file to S3: {e}")
+            return False
+
     def download_file(self, s3_key: str):
         try:
             response = self.s3_client.get_object(Bucket=self.bucket_name, Key=s3_key)
@@ -27,9 +108,74 @@ class S3Helper:
             return None
 
 
+class LocalStorageHelper:
+    """Filesystem stand-in for S3Helper with the same upload/download methods.
+
+    Objects are files under LOCAL_STORAGE_DIR. LOCAL_STORAGE_LATENCY_MS and
+    LOCAL_STORAGE_MBPS add a simulated per-request delay and transfer rate so
+    the upload path can be benchmarked offline with S3-like costs.
+    """
+
+    def __init__(self, root: str = None, latency_ms: float = None, mbps: float = None):
+        self.bucket_name = root or os.environ.get(
+            'LOCAL_STORAGE_DIR', os.path.join(tempfile.gettempdir(), 'crowd-local-storage'))
+        self.latency_ms = float(os.environ.get('LOCAL_STORAGE_LATENCY_MS', 0)) if latency_ms is None else latency_ms
+        self.mbps = float(os.environ.get('LOCAL_STORAGE_MBPS', 0)) if mbps is None else mbps
+        os.makedirs(self.bucket_name, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.bucket_name, key.replace('/', '_'))
+
+    def _simulate_transfer(self, size: int):
+        delay = self.latency_ms / 1000.0
+        if self.mbps > 0:
+            delay += size / (self.mbps * 1024 * 1024)
+        if delay > 0:
+            time.sleep(delay)
+
+    def upload_file(self, file_content: bytes, file_name: str, content_type: str):
+        try:
+            self._simulate_transfer(len(file_content))
+            with open(self._path(file_name), 'wb') as f:
+                f.write(file_content)
+            return True
+        except Exception as e:
+            print(f"Error writing file to local storage: {e}")
+            return False
+
+    def upload_path(self, path: str, file_name: str, content_type: str):
+        try:
+            self._simulate_transfer(os.path.getsize(path))
+            shutil.copyfile(path, self._path(file_name))
+            return True
+        except Exception as e:
+            print(f"Error writing file to local storage: {e}")
+            return False
+
+    def download_file(self, s3_key: str):
+        try:
+            with open(self._path(s3_key), 'rb') as f:
+                file_content = f.read()
+            self._simulate_transfer(len(file_content))
+            return file_content
+        except Exception as e:
+            print(f"Error reading file from local storage: {e}")
+            return None
+
+
+def get_storage():
+    """Upload archive backend chosen by STORAGE_BACKEND: 's3' (default) or 'local'."""
+    backend = os.environ.get('STORAGE_BACKEND', 's3').lower()
+    if backend == 'local':
+        return LocalStorageHelper()
+    if backend != 's3':
+        print(f"Unknown STORAGE_BACKEND '{backend}'; using s3.")
+    return S3Helper()
+
+
 class DynamoDBHelper:
     def __init__(self):
-        self.dynamodb = boto3.resource('dynamodb')
+        self.dynamodb = get_resource('dynamodb')
         self.event_table_name = os.environ.get('DDB_EVENT_TABLE', 'EventData')
         self.attendee_table_name = os.environ.get('DDB_ATTENDEE_TABLE', 'Attendees')
 
@@ -42,21 +188,116 @@ class DynamoDBHelper:
             print(f"Error writing event to DynamoDB: {e}")
             return False
 
+    def write_attendee_batch(self, items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """One BatchWriteItem call (at most 25 items); returns the items DynamoDB left unprocessed."""
+        table = self.attendee_table_name
+        response = self.dynamodb.meta.client.batch_write_item(
+            RequestItems={table: [{'PutRequest': {'Item': it}} for it in _dedupe_attendees(items)]}
+        )
+        return [r['PutRequest']['Item'] for r in response.get('UnprocessedItems', {}).get(table, [])]
+
     def batch_put_attendees(self, items: List[Dict[str, Any]]):
         try:
-            table = self.dynamodb.Table(self.attendee_table_name)
-            with table.batch_writer(overwrite_by_pkeys=['event_id', 'attendee_id']) as batch:
-                for it in items:
-                    batch.put_item(Item=it)
-            return True
+            _, failed = put_with_retry(self.write_attendee_batch, items)
+            return not failed
         except Exception as e:
             print(f"Error batch writing attendees to DynamoDB: {e}")
             return False
 
 
+class LocalDynamoDBHelper:
+    """In-process stand-in for DynamoDBHelper, for offline runs and benchmarks.
+
+    Items are kept in dicts keyed like the real tables. LOCAL_DDB_LATENCY_MS
+    delays every request and LOCAL_DDB_UNPROCESSED_RATE returns that fraction
+    of each batch as unprocessed, the way a throttled table does. With
+    ``store_items`` off only the keys are kept, so benchmarks measure the
+    writer's memory rather than the stand-in's.
+    """
+
+    _events: Dict[str, Dict[str, Any]] = {}
+    _attendees: Dict[Tuple[str, str], Dict[str, Any]] = {}
+    _lock = threading.Lock()
+
+    def __init__(self, latency_ms: float = None, unprocessed_rate: float = None, store_items: bool = True):
+        self.store_items = store_items
+        self.latency_ms = float(os.environ.get('LOCAL_DDB_LATENCY_MS', 0)) if latency_ms is None else latency_ms
+        self.unprocessed_rate = (float(os.environ.get('LOCAL_DDB_UNPROCESSED_RATE', 0))
+                                 if unprocessed_rate is None else unprocessed_rate)
+
+    def _request(self):
+        if self.latency_ms > 0:
+            time.sleep(self.latency_ms / 1000.0)
+
+    def put_event(self, item: Dict[str, Any]):
+        self._request()
+        with self._lock:
+            self._events[item['event_id']] = item
+        return True
+
+    def write_attendee_batch(self, items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        self._request()
+        unprocessed = []
+        with self._lock:
+            for it in _dedupe_attendees(items):
+                if self.unprocessed_rate and random.random() < self.unprocessed_rate:
+                    unprocessed.append(it)
+                else:
+                    self._attendees[(it['event_id'], it['attendee_id'])] = it if self.store_items else None
+        return unprocessed
+
+    def batch_put_attendees(self, items: List[Dict[str, Any]]):
+        _, failed = put_with_retry(self.write_attendee_batch, items)
+        return not failed
+
+    @classmethod
+    def attendee_count(cls, event_id: str = None) -> int:
+        with cls._lock:
+            if event_id is None:
+                return len(cls._attendees)
+            return sum(1 for e, _ in cls._attendees if e == event_id)
+
+
+def _dedupe_attendees(items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    # BatchWriteItem rejects duplicate keys in one request; keep the last one like batch_writer does
+    by_key = {(it['event_id'], it['attendee_id']): it for it in items}
+    return list(by_key.values())
+
+
+def put_with_retry(write_batch: Callable[[List[Dict[str, Any]]], List[Dict[str, Any]]],
+                   items: List[Dict[str, Any]], max_retries: int = 8,
+                   base_delay: float = 0.05, max_delay: float = 2.0) -> Tuple[int, List[Dict[str, Any]]]:
+    """Write items in 25-item batches, resending unprocessed items with jittered exponential backoff.
+
+    Returns (retry count, items still unprocessed after max_retries).
+    """
+    retries = 0
+    failed: List[Dict[str, Any]] = []
+    for start in range(0, len(items), DDB_BATCH_LIMIT):
+        pending = write_batch(items[start:start + DDB_BATCH_LIMIT])
+        attempt = 0
+        while pending and attempt < max_retries:
+            time.sleep(random.uniform(0, min(max_delay, base_delay * (2 ** attempt))))
+            attempt += 1
+            retries += 1
+            pending = write_batch(pending)
+        failed.extend(pending)
+    return retries, failed
+
+
+def get_dynamodb():
+    """Event/attendee store chosen by DDB_BACKEND: 'dynamodb' (default) or 'local'."""
+    backend = os.environ.get('DDB_BACKEND', 'dynamodb').lower()
+    if backend == 'local':
+        return LocalDynamoDBHelper()
+    if backend != 'dynamodb':
+        print(f"Unknown DDB_BACKEND '{backend}'; using dynamodb.")
+    return DynamoDBHelper()
+
+
 class SNSHelper:
     def __init__(self):
-        self.sns = boto3.client('sns')
+        self.sns = get_client('sns')
         self.topic_arn = os.environ.get('SNS_ALERTS_TOPIC_ARN', '')
 
     def publish_alert(self, message: str, subject: str = 'Event Safety Alert'):
@@ -0,0 +1,207 @@
+import os
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Width of one forecast bucket, and how long before the start the gates open to walk-ins
+BALANCE_BUCKET_MINUTES = int(os.environ.get('BALANCE_BUCKET_MINUTES', 15))
+GATES_OPEN_MINUTES = int(os.environ.get('GATES_OPEN_MINUTES', 120))
+# Redirects below this share of a gate's arrivals are not worth announcing
+BALANCE_MIN_SHARE = float(os.environ.get('BALANCE_MIN_SHARE', 0.05))
+
+
+def balance(capacity_per_hour: Sequence[float], inflow: Any, queue: Optional[Sequence[float]] = None,
+            open_gates: Optional[Sequence[bool]] = None, bucket_minutes: int = BALANCE_BUCKET_MINUTES,
+            objective: str = 'wait') -> Dict[str, Any]:
+    """Where each bucket's arrivals should go so the worst queue stays as short as possible.
+
+    ``inflow`` is (gates, buckets): the people forecast to turn up at each
+    gate per bucket. ``queue`` is who is waiting now. Arrivals at closed
+    gates, and anyone queued there, have to go elsewhere.
+
+    Bucket by bucket, the arrivals are water-filled across the open gates:
+    every gate that receives anyone ends the bucket at the same level - the
+    same wait in minutes (``objective='wait'``) or the same queue length
+    (``'queue'``) - and gates already above it receive no one. Since
+    attendees can be sent to any open gate, this is work-conserving: no gate
+    idles while another has a queue. Each bucket is one sort and a prefix sum
+    over the gates.
+
+    Returns arrays shaped (gates, buckets): ``arrivals`` after redirection,
+    ``redirect`` (share of a gate's own arrivals to send elsewhere),
+    ``queue`` and ``wait_minutes`` at the end of each bucket. Also returns the
+    worst wait and queue with and without redirection. Raises ValueError when
+    no gate is open, since there is nowhere to place anyone.
+    """
+    capacity = np.asarray(capacity_per_hour, dtype=np.float64)
+    inflow = np.asarray(inflow, dtype=np.float64).reshape(len(capacity), -1)
+    n_gates, n_buckets = inflow.shape
+    queue = np.zeros(n_gates) if queue is None else np.asarray(queue, dtype=np.float64)
+    is_open = np.ones(n_gates, dtype=bool) if open_gates is None else np.array(open_gates, dtype=bool)
+    is_open &= capacity > 0
+    service = capacity * bucket_minutes / 60
+    rows = np.flatnonzero(is_open)
+    weight = capacity[rows] if objective == 'wait' else np.ones(len(rows))
+    if objective not in ('wait', 'queue'):
+        raise ValueError(f"objective must be 'wait' or 'queue', not {objective!r}")
+    if not len(rows):
+        raise ValueError('No open gate with capacity to send arrivals to')
+
+    arrivals = np.zeros_like(inflow)
+    queues = np.zeros_like(inflow)
+    totals = inflow.sum(axis=0)
+    # People already queued at closed gates are moved with the first bucket's arrivals
+    totals[0] += queue[~is_open].sum()
+    q, s = queue[rows], service[rows]
+    for t in range(n_buckets):
+        # Gate i starts receiving once the level passes its current level (after this bucket's service)
+        start = (q - s) / weight
+        order = np.argsort(start, kind='stable')
+        starts, w = start[order], weight[order]
+        cum_w = np.cumsum(w)
+        cum_ws = np.cumsum(w * starts)
+        # Arrivals needed to lift every gate below breakpoint j up to it
+        needed = cum_w * starts - cum_ws
+        active = np.searchsorted(needed, totals[t], side='right')
+        level = (totals[t] + cum_ws[active - 1]) / cum_w[active - 1]
+        take = np.maximum(0.0, level - start) * weight
+        arrivals[rows, t] = take
+        q = np.maximum(0.0, q + take - s)
+        queues[rows, t] = q
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        redirect = np.where(inflow > 0, np.clip((inflow - arrivals) / inflow, 0.0, 1.0), 0.0)
+        minutes = np.where(capacity[:, None] > 0, queues / capacity[:, None] * 60, 0.0)
+    base_queue, base_minutes = _no_redirect(capacity, inflow, queue, service, is_open)
+    return {
+        'arrivals': arrivals,
+        'redirect': redirect,
+        'queue': queues,
+        'wait_minutes': minutes,
+        'max_wait_minutes': float(minutes.max(initial=0.0)),
+        'max_queue': float(queues.max(initial=0.0)),
+        'baseline_max_wait_minutes': base_minutes,
+        'baseline_max_queue': base_queue,
+        'inflow': inflow,
+        'bucket_minutes': bucket_minutes,
+    }
+
+
+def _no_redirect(capacity, inflow, queue, service, is_open) -> Tuple[float, float]:
+    """Worst queue and wait if everyone stays at their own gate (a closed gate's queue never clears)."""
+    q = queue.copy()
+    worst_q = worst_minutes = 0.0
+    for t in range(inflow.shape[1]):
+        q = np.where(is_open, np.maximum(0.0, q + inflow[:, t] - service), q + inflow[:, t])
+        worst_q = max(worst_q, float(q.max(initial=0.0)))
+        if (~is_open & (q > 0)).any():
+            worst_minutes = float('inf')
+        elif is_open.any():
+            worst_minutes = max(worst_minutes, float((q[is_open] / capacity[is_open]).max() * 60))
+    return worst_q, worst_minutes
+
+
+def redirects(plan: Dict[str, Any], gate_ids: Sequence[str], bucket: int = 0,
+              min_share: float = BALANCE_MIN_SHARE) -> List[Dict[str, Any]]:
+    """Moves for one bucket: for each gate sending at least ``min_share`` of its arrivals away,
+    the share and how it splits over the receiving gates (largest first). Parts under 0.5% are
+    left out of ``to``, which is empty when the share is spread that thinly."""
+    inflow = plan['inflow'][:, bucket]
+    arrivals = plan['arrivals'][:, bucket]
+    share = plan['redirect'][:, bucket]
+    surplus = np.maximum(0.0, inflow - arrivals)
+    deficit = np.maximum(0.0, arrivals - inflow)
+    total_deficit = deficit.sum()
+    senders = np.flatnonzero(share >= min_share)
+    if not total_deficit or not senders.size:
+        return []
+    # Every sender splits in proportion to the receivers' deficits, so one order serves all
+    receivers = np.flatnonzero(deficit > 0)
+    receivers = receivers[np.argsort(-deficit[receivers], kind='stable')]
+    weights = deficit[receivers] / total_deficit
+    names = [gate_ids[h] for h in receivers]
+    moves = []
+    for g in senders[np.argsort(-share[senders], kind='stable')].tolist():
+        split = (weights * (surplus[g] / inflow[g])).round(3).tolist()
+        to = {name: part for name, part in zip(names, split) if part >= 0.005}
+        moves.append({'gate': gate_ids[g], 'share': round(float(share[g]), 3), 'people': int(round(surplus[g])),
+                      'to': to})
+    return moves
+
+
+def describe(move: Dict[str, Any]) -> str:
+    """ "Redirect 35% of arrivals to Gate C (20%) and Gate D (15%)." """
+    targets = [f"Gate {gate} ({share:.0%})" for gate, share in move['to'].items()]
+    # Receivers too small to list still take part of the share
+    spread = move['share'] - sum(move['to'].values()) >= 0.005
+    if not targets:
+        where = 'the other open gates'
+    elif len(targets) == 1 and not spread:
+        where = f"Gate {next(iter(move['to']))}"
+    elif spread:
+        where = ', '.join(targets) + ' and the other open gates'
+    else:
+        where = ', '.join(targets[:-1]) + ' and ' + targets[-1]
+    if move['share'] >= 0.995:
+        return f"Send all arrivals to {where}."
+    return f"Redirect {move['share']:.0%} of arrivals to {where}."
+
+
+def _parse_time(value: Any) -> Optional[datetime]:
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(str(value).replace('Z', '+00:00')).replace(tzinfo=None)
+    except ValueError:
+        return None
+
+
+def forecast_inflow(event: Dict[str, Any], bucket_minutes: int = BALANCE_BUCKET_MINUTES,
+                    buckets: Optional[int] = None, start: Optional[datetime] = None,
+                    stop_gates: Optional[Dict[str, Sequence[str]]] = None) -> Tuple[List[str], np.ndarray]:
+    """(bucket start times, (gates, buckets) arrivals) from a normalized event.
+
+    Each ``transport_schedule`` entry lands its ``est_capacity`` in the bucket
+    of its arrival time, at the gates listed for its stop in ``stop_gates``
+    (all gates otherwise, split evenly). The rest of ``expected_attendance``
+    walks in evenly over the GATES_OPEN_MINUTES before the event starts.
+    """
+    gates = event.get('gates') or []
+    n_gates = len(gates)
+    gate_row = {str(g.get('gate_id')): i for i, g in enumerate(gates)}
+    event_start = _parse_time(event.get('event_start_datetime'))
+    trips = [(_parse_time(t.get('arrival_datetime')), t) for t in event.get('transport_schedule') or []]
+    trips = [(at, t) for at, t in trips if at is not None]
+    walk_in_from = event_start - timedelta(minutes=GATES_OPEN_MINUTES) if event_start else None
+    if start is None:
+        candidates = [at for at, _ in trips] + ([walk_in_from] if walk_in_from else [])
+        if not candidates:
+            raise ValueError('Event has no start time or transport arrivals to forecast from')
+        start = min(candidates)
+        start = start.replace(minute=start.minute - start.minute % bucket_minutes, second=0, microsecond=0)
+    step = timedelta(minutes=bucket_minutes)
+    if buckets is None:
+        last = max([at for at, _ in trips] + ([event_start] if event_start else []))
+        buckets = max(1, int((last - start) / step) + 1)
+    inflow = np.zeros((n_gates, buckets))
+    if not n_gates:
+        return [], inflow
+
+    transported = 0
+    for at, trip in trips:
+        t = int((at - start) / step)
+        people = max(0, int(trip.get('est_capacity') or 0))
+        transported += people
+        if 0 <= t < buckets:
+            targets = [gate_row[g] for g in (stop_gates or {}).get(trip.get('stop_name'), ()) if g in gate_row]
+            targets = targets or list(range(n_gates))
+            inflow[targets, t] += people / len(targets)
+    walk_ins = max(0, int(event.get('expected_attendance') or 0) - transported)
+    if walk_ins and walk_in_from is not None:
+        first = max(0, int((walk_in_from - start) / step))
+        end = min(buckets, max(first + 1, int(np.ceil((event_start - start) / step))))
+        if first < end:
+            inflow[:, first:end] += walk_ins / n_gates / (end - first)
+    times = [(start + i * step).isoformat() for i in range(buckets)]
+    return times, inflow
@@ -0,0 +1,244 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Query points scored per block; bounds the (points x gates) score matrix to about 32 MB
+GATE_INDEX_BLOCK = int(os.environ.get('GATE_INDEX_BLOCK', 4_000_000))
+# Events whose gate index is kept by get_gate_index
+GATE_INDEX_CACHE = int(os.environ.get('GATE_INDEX_CACHE', 8))
+
+EARTH_RADIUS_M = 6_371_008.8
+
+
+def parse_gps(value: Any) -> Optional[Tuple[float, float]]:
+    """(lat, lng) from "3.0485,101.6795" / "3.0485, 101.6795", a pair or {"lat", "lng"}; None if unusable."""
+    if value is None:
+        return None
+    try:
+        if isinstance(value, str):
+            lat, lng = value.split(',')
+        elif isinstance(value, dict):
+            lat, lng = value['lat'], value['lng']
+        else:
+            lat, lng = value
+        lat, lng = float(lat), float(lng)
+    except (KeyError, TypeError, ValueError):
+        return None
+    if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+        return None
+    return lat, lng
+
+
+def as_points(points: Any) -> np.ndarray:
+    """(N, 2) float64 lat/lng degrees from an array or a list of gps values; unusable rows are NaN."""
+    if isinstance(points, np.ndarray) and points.ndim == 2 and points.shape[1] == 2:
+        return points.astype(np.float64, copy=False)
+    parsed = [parse_gps(p) for p in points]
+    return np.array([p if p is not None else (np.nan, np.nan) for p in parsed], dtype=np.float64).reshape(-1, 2)
+
+
+def _unit_vectors(latlng: np.ndarray) -> np.ndarray:
+    lat = np.radians(latlng[:, 0])
+    lng = np.radians(latlng[:, 1])
+    cos_lat = np.cos(lat)
+    return np.column_stack((cos_lat * np.cos(lng), cos_lat * np.sin(lng), np.sin(lat)))
+
+
+def haversine_m(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Great-circle metres between matching rows of two (N, 2) lat/lng arrays."""
+    lat1, lng1 = np.radians(a[:, 0]), np.radians(a[:, 1])
+    lat2, lng2 = np.radians(b[:, 0]), np.radians(b[:, 1])
+    h = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.minimum(1.0, h)))
+
+
+class GateIndex:
+    """Nearest-gate lookups for batches of positions over one event's GPS-tagged gates.
+
+    Built once from the parsed gates: each gate's "lat,lng" becomes a point on
+    the unit sphere, taken relative to the gates' centroid (so gates metres
+    apart still differ well above float64 rounding). Chord length orders the
+    same way as great-circle distance, and |p - g|^2 = |p|^2 - 2 p.g + |g|^2,
+    so a block of query points is ranked against every gate with one matrix
+    product instead of a haversine per (point, gate) pair. Exact haversine
+    distances are computed only for the gates returned.
+
+    Gates without usable ``gps`` are listed in ``unplaced``. Closing or
+    reopening a gate flips its flag and rebuilds only the small matrix of open
+    gates, so nearest-open queries reflect it immediately. An index shared
+    between callers with their own view of which gates are open (one per
+    request) is left as built: each passes ``open_mask`` to ``knn`` instead.
+    """
+
+    def __init__(self, gates: Iterable[Dict[str, Any]]):
+        ids, coords, closed = [], [], []
+        self.unplaced: List[str] = []
+        for gate in gates:
+            gate_id = str(gate.get('gate_id') or gate.get('gate_name') or '')
+            pos = parse_gps(gate.get('gps'))
+            if pos is None:
+                self.unplaced.append(gate_id)
+                continue
+            ids.append(gate_id)
+            coords.append(pos)
+            closed.append(str(gate.get('status', 'open')).lower() == 'closed')
+        self.gate_ids = ids
+        self._row = {gate_id: i for i, gate_id in enumerate(ids)}
+        self.coords = np.array(coords, dtype=np.float64).reshape(-1, 2)
+        vectors = _unit_vectors(self.coords)
+        self._origin = vectors.mean(axis=0) if len(vectors) else np.zeros(3)
+        self._vectors = vectors - self._origin
+        self._norms = (self._vectors ** 2).sum(axis=1)
+        self._open_mask = ~np.array(closed, dtype=bool)
+        self._lock = threading.Lock()
+        self._refresh_open()
+        self._stats = {'queries': 0, 'points': 0, 'query_seconds': 0.0, 'status_changes': 0}
+
+    def _refresh_open(self):
+        self._open_rows = np.flatnonzero(self._open_mask)
+        self._open_vectors = np.ascontiguousarray(self._vectors[self._open_rows])
+        self._open_norms = self._norms[self._open_rows]
+
+    def __len__(self) -> int:
+        return len(self.gate_ids)
+
+    def is_open(self, gate_id: str) -> bool:
+        row = self._row.get(gate_id)
+        return row is not None and bool(self._open_mask[row])
+
+    def set_open(self, gate_id: str, is_open: bool = True) -> bool:
+        """Open or close one gate; returns whether anything changed."""
+        row = self._row.get(gate_id)
+        if row is None:
+            return False
+        with self._lock:
+            if self._open_mask[row] == is_open:
+                return False
+            self._open_mask[row] = is_open
+            self._refresh_open()
+            self._stats['status_changes'] += 1
+        return True
+
+    def close(self, gate_id: str) -> bool:
+        return self.set_open(gate_id, False)
+
+    def reopen(self, gate_id: str) -> bool:
+        return self.set_open(gate_id, True)
+
+    def sync_status(self, gates: Iterable[Dict[str, Any]]) -> int:
+        """Apply the ``status`` of each gate dict (closed or not); returns how many changed."""
+        changed = 0
+        for gate in gates:
+            gate_id = str(gate.get('gate_id') or gate.get('gate_name') or '')
+            changed += self.set_open(gate_id, str(gate.get('status', 'open')).lower() != 'closed')
+        return changed
+
+    def open_mask(self, gates: Iterable[Dict[str, Any]]) -> np.ndarray:
+        """Open flag per indexed gate from gate dicts' ``status``, without changing the index."""
+        mask = np.ones(len(self.gate_ids), dtype=bool)
+        for gate in gates:
+            row = self._row.get(str(gate.get('gate_id') or gate.get('gate_name') or ''))
+            if row is not None:
+                mask[row] = str(gate.get('status', 'open')).lower() != 'closed'
+        return mask
+
+    def knn(self, points: Any, k: int = 1, open_only: bool = False,
+            open_mask: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """The ``k`` nearest gates to each point, nearest first.
+
+        Returns (rows, metres), both shaped (N, k): rows index ``gate_ids``.
+        Slots with no gate (fewer than ``k`` candidates, or a point without a
+        usable position) are -1 with distance inf. ``open_mask`` (one flag per
+        gate) restricts this query to those gates instead of the index's own
+        open/closed state.
+        """
+        started = time.perf_counter()
+        latlng = as_points(points)
+        n = len(latlng)
+        if open_mask is not None:
+            rows_map = np.flatnonzero(open_mask)
+            vectors, norms = self._vectors[rows_map], self._norms[rows_map]
+        else:
+            with self._lock:
+                rows_map = self._open_rows if open_only else None
+                vectors = self._open_vectors if open_only else self._vectors
+                norms = self._open_norms if open_only else self._norms
+        g = len(vectors)
+        rows = np.full((n, k), -1, dtype=np.int64)
+        metres = np.full((n, k), np.inf)
+        valid = ~np.isnan(latlng).any(axis=1)
+        take = min(k, g)
+        if take and n:
+            query = _unit_vectors(np.where(valid[:, None], latlng, 0.0)) - self._origin
+            query *= -2
+            block = max(1, GATE_INDEX_BLOCK // g)
+            for start in range(0, n, block):
+                # Squared chord to each gate, less the point's own |p|^2 (the same for every gate)
+                scores = query[start:start + block] @ vectors.T
+                scores += norms
+                if take == 1:
+                    best = scores.argmin(axis=1)[:, None]
+                else:
+                    best = np.argpartition(scores, take - 1, axis=1)[:, :take] if take < g else \
+                        np.broadcast_to(np.arange(g), (len(scores), g))
+                    order = np.argsort(np.take_along_axis(scores, best, axis=1), axis=1, kind='stable')
+                    best = np.take_along_axis(best, order, axis=1)
+                rows[start:start + block, :take] = best if rows_map is None else rows_map[best]
+            chosen = rows[:, :take]
+            dist = haversine_m(np.repeat(latlng, take, axis=0), self.coords[chosen.ravel()]).reshape(n, take)
+            metres[:, :take] = dist
+            rows[~valid] = -1
+            metres[~valid] = np.inf
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self._stats['queries'] += 1
+            self._stats['points'] += n
+            self._stats['query_seconds'] += elapsed
+        return rows, metres
+
+    def nearest(self, points: Any, open_only: bool = True,
+                open_mask: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """(rows, metres) of the single nearest (open, by default) gate per point, shaped (N,)."""
+        rows, metres = self.knn(points, 1, open_only, open_mask)
+        return rows[:, 0], metres[:, 0]
+
+    def labels(self, rows: np.ndarray) -> List:
+        """Gate ids for an array of rows, with None for -1; nested like ``rows``."""
+        lookup = np.array(self.gate_ids + [None], dtype=object)
+        return lookup[np.where(rows < 0, len(self.gate_ids), rows)].tolist()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            open_gates = len(self._open_rows)
+        seconds = stats.pop('query_seconds')
+        return {**stats, 'gates': len(self.gate_ids), 'open': open_gates, 'unplaced': len(self.unplaced),
+                'points_per_sec': round(stats['points'] / seconds) if seconds else None}
+
+
+def _signature(gates: Sequence[Dict[str, Any]]) -> Tuple:
+    return tuple((str(g.get('gate_id') or g.get('gate_name') or ''), str(g.get('gps'))) for g in gates)
+
+
+_indexes: 'OrderedDict[Tuple, GateIndex]' = OrderedDict()
+_indexes_lock = threading.Lock()
+
+
+def get_gate_index(gates: Sequence[Dict[str, Any]]) -> GateIndex:
+    """The index for an event's parsed gates, built on first use and reused while the ids and
+    positions stay the same. It is shared, so its open/closed state is not updated from later
+    calls' gates; pass ``index.open_mask(gates)`` to ``knn`` for the current status."""
+    key = _signature(gates)
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is None:
+            index = _indexes[key] = GateIndex(gates)
+            while len(_indexes) > GATE_INDEX_CACHE:
+                _indexes.popitem(last=False)
+        else:
+            _indexes.move_to_end(key)
+    return index
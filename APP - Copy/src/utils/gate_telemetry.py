@@ -0,0 +1,172 @@
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+# Width of one ring-buffer slot, and the rolling windows reported (README: 1, 5, 15 minute buckets)
+TELEMETRY_BUCKET_SECONDS = int(os.environ.get('TELEMETRY_BUCKET_SECONDS', 60))
+TELEMETRY_WINDOWS_MINUTES = tuple(int(m) for m in os.environ.get('TELEMETRY_WINDOWS_MINUTES', '1,5,15').split(','))
+
+
+class _GateSeries:
+    """Per-gate ring buffer: one in/out counter pair per bucket, indexed by bucket number modulo size."""
+
+    __slots__ = ('buckets', 'ins', 'outs', 'occupancy', 'events', 'last_ts')
+
+    def __init__(self, size: int):
+        self.buckets = [-1] * size
+        self.ins = [0] * size
+        self.outs = [0] * size
+        self.occupancy = 0
+        self.events = 0
+        self.last_ts = None
+
+
+class GateTelemetryStore:
+    """Live gate counts from turnstile/counter events.
+
+    ``ingest`` applies a batch of (gate, timestamp, in, out) events in O(1)
+    each: the gate's running occupancy moves by in - out and the counters of
+    the event's bucket in a ring sized for the longest window are bumped (a
+    slot from an older bucket is reset on reuse). Events older than the ring,
+    or stamped more than a bucket ahead of the clock, only move occupancy.
+
+    Every batch bumps ``version``. ``snapshot`` returns an immutable view of
+    all gates at one version - built once per version and shared by every
+    reader - with occupancy and in/out totals over each rolling window.
+    """
+
+    def __init__(self, bucket_seconds: int = TELEMETRY_BUCKET_SECONDS,
+                 windows_minutes: Tuple[int, ...] = TELEMETRY_WINDOWS_MINUTES):
+        self.bucket_seconds = bucket_seconds
+        self.windows = tuple(sorted(windows_minutes))
+        self._window_buckets = {m: max(1, m * 60 // bucket_seconds) for m in self.windows}
+        # One spare slot for events stamped in the next bucket (counter clocks run slightly ahead)
+        self.size = max(self._window_buckets.values()) + 1
+        self._gates: Dict[str, _GateSeries] = {}
+        self._lock = threading.Lock()
+        self.version = 0
+        self._snapshot: Optional[Tuple[int, int, Dict[str, Any]]] = None  # (version, bucket, view)
+        self._stats = {'events': 0, 'batches': 0, 'rejected': 0, 'late': 0, 'future': 0}
+
+    def ingest(self, events: Iterable[Dict[str, Any]], now: Optional[float] = None) -> Dict[str, int]:
+        """Apply events shaped {"gate": "A", "ts": <epoch seconds>, "in": 3, "out": 1}.
+
+        ``ts`` defaults to arrival time; ``in``/``out`` default to 0. Returns
+        accepted/rejected/late/future counts and the new version.
+        """
+        now = time.time() if now is None else now
+        bucket_seconds, size = self.bucket_seconds, self.size
+        newest = int(now // bucket_seconds) + 1
+        oldest = newest - size + 1
+        accepted = rejected = late = future = 0
+        with self._lock:
+            gates = self._gates
+            for event in events:
+                try:
+                    gate = event['gate']
+                    if not isinstance(gate, str) or not gate:
+                        raise ValueError('gate must be a non-empty string')
+                    ts = event.get('ts') or now
+                    d_in = int(event.get('in', 0))
+                    d_out = int(event.get('out', 0))
+                    bucket = int(ts // bucket_seconds)
+                except (KeyError, TypeError, ValueError, OverflowError, AttributeError):
+                    rejected += 1
+                    continue
+                series = gates.get(gate)
+                if series is None:
+                    series = gates[gate] = _GateSeries(size)
+                series.occupancy = max(0, series.occupancy + d_in - d_out)
+                series.events += 1
+                if series.last_ts is None or ts > series.last_ts:
+                    series.last_ts = ts
+                accepted += 1
+                if bucket < oldest:
+                    late += 1
+                    continue
+                if bucket > newest:
+                    future += 1
+                    continue
+                slot = bucket % size
+                if series.buckets[slot] != bucket:
+                    series.buckets[slot] = bucket
+                    series.ins[slot] = 0
+                    series.outs[slot] = 0
+                series.ins[slot] += d_in
+                series.outs[slot] += d_out
+            if accepted:
+                self.version += 1
+            self._stats['events'] += accepted
+            self._stats['rejected'] += rejected
+            self._stats['late'] += late
+            self._stats['future'] += future
+            self._stats['batches'] += 1
+            version = self.version
+        return {'accepted': accepted, 'rejected': rejected, 'late': late, 'future': future, 'version': version}
+
+    def set_occupancy(self, gate: str, occupancy: int):
+        """Reset a gate's running count (e.g. from a manual headcount)."""
+        with self._lock:
+            series = self._gates.get(gate)
+            if series is None:
+                series = self._gates[gate] = _GateSeries(self.size)
+            series.occupancy = max(0, int(occupancy))
+            self.version += 1
+
+    def snapshot(self, now: Optional[float] = None) -> Dict[str, Any]:
+        """All gates at one version. Do not mutate the result; it is shared.
+
+        Window totals are as of the snapshot's build time, which is also when
+        the version last changed or the cached view was more than a bucket old.
+        """
+        now = time.time() if now is None else now
+        current = int(now // self.bucket_seconds)
+        with self._lock:
+            if self._snapshot is not None and self._snapshot[:2] == (self.version, current):
+                return self._snapshot[2]
+            gates = {}
+            for name, series in self._gates.items():
+                windows = {}
+                for minutes in self.windows:
+                    first = current - self._window_buckets[minutes] + 1
+                    ins = outs = 0
+                    for slot, bucket in enumerate(series.buckets):
+                        if first <= bucket <= current:
+                            ins += series.ins[slot]
+                            outs += series.outs[slot]
+                    windows[f'{minutes}m'] = {'in': ins, 'out': outs, 'net': ins - outs}
+                gates[name] = {
+                    'occupancy': series.occupancy,
+                    'events': series.events,
+                    'last_event': datetime.utcfromtimestamp(series.last_ts).isoformat() if series.last_ts else None,
+                    'windows': windows,
+                }
+            view = {
+                'version': self.version,
+                'generated_at': datetime.utcfromtimestamp(now).isoformat(),
+                'bucket_seconds': self.bucket_seconds,
+                'gates': gates,
+            }
+            self._snapshot = (self.version, current, view)
+            return view
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self._stats, 'version': self.version, 'gates': len(self._gates),
+                    'bucket_seconds': self.bucket_seconds, 'windows_minutes': list(self.windows)}
+
+
+_store: Optional[GateTelemetryStore] = None
+_store_lock = threading.Lock()
+
+
+def get_telemetry_store() -> GateTelemetryStore:
+    """Process-wide store shared by the ingestion API, the chatbot and dashboards."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = GateTelemetryStore()
+    return _store
@@ -0,0 +1,30 @@
+import threading
+from collections import deque
+from typing import Dict
+
+
+class LatencyWindow:
+    """Latency percentiles over the most recent ``size`` samples, plus a lifetime count."""
+
+    def __init__(self, size: int = 2048):
+        self._samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+        self.count = 0
+
+    def add(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+            self.count += 1
+
+    def summary(self) -> Dict[str, float]:
+        with self._lock:
+            samples = sorted(self._samples)
+            count = self.count
+        if not samples:
+            return {'count': count, 'p50_ms': None, 'p90_ms': None, 'p99_ms': None, 'max_ms': None}
+
+        def pct(q):
+            return round(samples[min(len(samples) - 1, int(len(samples) * q))] * 1000, 3)
+
+        return {'count': count, 'p50_ms': pct(0.5), 'p90_ms': pct(0.9), 'p99_ms': pct(0.99),
+                'max_ms': round(samples[-1] * 1000, 3)}
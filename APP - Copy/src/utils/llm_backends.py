@@ -0,0 +1,189 @@
+import asyncio
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Dict, Iterator, Optional
+
+from src.utils.aws_helper import get_client
+
+# Model calls in flight per process, across HTTP and websocket chats
+LLM_MAX_CONCURRENCY = int(os.environ.get('LLM_MAX_CONCURRENCY', 8))
+# Whole-reply deadline, first token included
+LLM_TIMEOUT_SECONDS = float(os.environ.get('LLM_TIMEOUT_SECONDS', 30))
+# 'bedrock' (default) or 'stub' for offline latency/throughput runs
+LLM_BACKEND = os.environ.get('LLM_BACKEND', 'bedrock')
+
+BEDROCK_MODEL_ID = os.environ.get('BEDROCK_MODEL_ID', 'anthropic.claude-v2')
+
+
+class BedrockBackend:
+    """Claude text completions on Bedrock, whole or as a token stream."""
+
+    def __init__(self, model_id: str = BEDROCK_MODEL_ID):
+        self.model_id = model_id
+        self.client = get_client('bedrock-runtime', region_name='us-west-2')
+
+    def complete(self, body: Dict) -> str:
+        response = self.client.invoke_model(
+            modelId=self.model_id,
+            body=json.dumps(body),
+            accept='application/json',
+            contentType='application/json'
+        )
+        response_body = json.loads(response.get('body').read())
+        return response_body.get('completion', '')
+
+    def stream(self, body: Dict, stop: threading.Event) -> Iterator[str]:
+        response = self.client.invoke_model_with_response_stream(
+            modelId=self.model_id,
+            body=json.dumps(body),
+            accept='application/json',
+            contentType='application/json'
+        )
+        events = response['body']
+        try:
+            for event in events:
+                if stop.is_set():
+                    break
+                chunk = event.get('chunk')
+                if chunk:
+                    text = json.loads(chunk['bytes']).get('completion', '')
+                    if text:
+                        yield text
+        finally:
+            # Closing the event stream drops the HTTP connection, so Bedrock stops generating
+            events.close()
+
+
+class StubBackend:
+    """Offline model: replies with canned text at a set first-token delay and token rate."""
+
+    def __init__(self, first_token_ms: Optional[float] = None, tokens_per_sec: Optional[float] = None,
+                 reply: str = "🚨 Gate A near capacity (3.5k). Action: Redirect 20% of arrivals to Gate C. [STUB]"):
+        self.first_token_ms = float(os.environ.get('STUB_LLM_FIRST_TOKEN_MS', 300)) if first_token_ms is None else first_token_ms
+        self.tokens_per_sec = float(os.environ.get('STUB_LLM_TOKENS_PER_SEC', 40)) if tokens_per_sec is None else tokens_per_sec
+        self.reply = reply
+        self.tokens_generated = 0
+
+    def _tokens(self):
+        words = self.reply.split(' ')
+        return [w + (' ' if i < len(words) - 1 else '') for i, w in enumerate(words)]
+
+    def complete(self, body: Dict) -> str:
+        return ''.join(self.stream(body, threading.Event()))
+
+    def stream(self, body: Dict, stop: threading.Event) -> Iterator[str]:
+        # stop.wait doubles as the sleep, so a cancelled reply ends at once
+        if stop.wait(self.first_token_ms / 1000):
+            return
+        for i, token in enumerate(self._tokens()):
+            if i and self.tokens_per_sec > 0 and stop.wait(1 / self.tokens_per_sec):
+                return
+            if stop.is_set():
+                return
+            self.tokens_generated += 1
+            yield token
+
+
+def create_backend(kind: str = LLM_BACKEND):
+    if kind == 'stub':
+        return StubBackend()
+    if kind != 'bedrock':
+        print(f"Unknown LLM_BACKEND '{kind}'; using bedrock.")
+    return BedrockBackend()
+
+
+class LLMGateway:
+    """Async access to a blocking model backend with a concurrency cap.
+
+    Backend calls run on a dedicated thread pool the size of the cap, so a
+    burst of chats cannot starve the event loop's default executor. Tokens are
+    handed to the awaiting coroutine through an asyncio.Queue as they arrive.
+    The slot is held until the backend call has actually stopped: when the
+    consumer is cancelled (client gone) or misses the deadline, the worker
+    sees the stop flag at its next token and closes the stream.
+    """
+
+    def __init__(self, backend, max_concurrency: int = LLM_MAX_CONCURRENCY, timeout: float = LLM_TIMEOUT_SECONDS):
+        self.backend = backend
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix='llm')
+        self._semaphores: Dict[int, asyncio.Semaphore] = {}
+        self._stats = {'requests': 0, 'completed': 0, 'timeouts': 0, 'cancelled': 0, 'errors': 0, 'in_flight': 0}
+
+    def _semaphore(self) -> asyncio.Semaphore:
+        # One per event loop: a semaphore is bound to the loop that first waits on it
+        loop = asyncio.get_running_loop()
+        sem = self._semaphores.get(id(loop))
+        if sem is None:
+            sem = self._semaphores[id(loop)] = asyncio.Semaphore(self.max_concurrency)
+        return sem
+
+    async def stream(self, body: Dict, timeout: Optional[float] = None) -> AsyncIterator[str]:
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + (timeout or self.timeout)
+        sem = self._semaphore()
+        self._stats['requests'] += 1
+        remaining = deadline - loop.time()
+        try:
+            await asyncio.wait_for(sem.acquire(), remaining)
+        except asyncio.TimeoutError:
+            self._stats['timeouts'] += 1
+            raise
+
+        queue: asyncio.Queue = asyncio.Queue()
+        stop = threading.Event()
+        done = object()
+
+        def release():
+            self._stats['in_flight'] -= 1
+            sem.release()
+
+        def produce():
+            try:
+                for token in self.backend.stream(body, stop):
+                    loop.call_soon_threadsafe(queue.put_nowait, token)
+                loop.call_soon_threadsafe(queue.put_nowait, done)
+            except BaseException as e:
+                loop.call_soon_threadsafe(queue.put_nowait, e)
+            finally:
+                try:
+                    loop.call_soon_threadsafe(release)
+                except RuntimeError:
+                    pass  # loop already closed (shutdown)
+
+        self._stats['in_flight'] += 1
+        loop.run_in_executor(self._executor, produce)
+        finished = False
+        try:
+            while True:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    raise asyncio.TimeoutError()
+                item = await asyncio.wait_for(queue.get(), remaining)
+                if item is done:
+                    finished = True
+                    self._stats['completed'] += 1
+                    return
+                if isinstance(item, BaseException):
+                    finished = True
+                    self._stats['errors'] += 1
+                    raise item
+                yield item
+        except asyncio.TimeoutError:
+            self._stats['timeouts'] += 1
+            raise
+        except (asyncio.CancelledError, GeneratorExit):
+            self._stats['cancelled'] += 1
+            raise
+        finally:
+            if not finished:
+                stop.set()
+
+    async def complete(self, body: Dict, timeout: Optional[float] = None) -> str:
+        return ''.join([token async for token in self.stream(body, timeout)])
+
+    def stats(self) -> Dict[str, int]:
+        return {**self._stats, 'max_concurrency': self.max_concurrency, 'timeout': self.timeout}
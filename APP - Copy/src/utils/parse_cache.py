@@ -0,0 +1,161 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Any, Dict, Optional, Union
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+# Bump when the normalized schema changes so old entries are not served.
+CACHE_FORMAT = 1
+
+
+class ParseCache:
+    """Content-addressed cache of normalized upload results.
+
+    Keys are the SHA-256 of the uploaded bytes (see ``content_digest``) plus
+    the parser kind. Values are kept as encoded JSON so every hit returns a
+    fresh dict that callers may mutate. Two tiers:
+      - memory: LRU bounded by ``max_bytes`` of encoded JSON
+      - disk:   one JSON file per key under ``disk_dir``; survives restarts
+    When ``columnar`` is on, the parsed sheets are also written as Parquet next
+    to the JSON entry (requires pyarrow; skipped otherwise).
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, disk_dir: Optional[str] = None, columnar: bool = False):
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self.columnar = columnar
+        self._memory: 'OrderedDict[str, bytes]' = OrderedDict()
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {'hits_memory': 0, 'hits_disk': 0, 'hits_worker': 0, 'misses': 0, 'evictions': 0, 'puts': 0,
+                       'disk_errors': 0}
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    @staticmethod
+    def key_for(kind: str, digest: str) -> str:
+        return f"{kind}-v{CACHE_FORMAT}-{digest}"
+
+    def _disk_path(self, key: str, suffix: str = '.json') -> str:
+        return os.path.join(self.disk_dir, key[-2:], key + suffix)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            encoded = self._memory.get(key)
+            if encoded is not None:
+                self._memory.move_to_end(key)
+                self._stats['hits_memory'] += 1
+                return json.loads(encoded)
+
+        encoded = self._read_disk(key)
+        with self._lock:
+            if encoded is None:
+                self._stats['misses'] += 1
+                return None
+            self._stats['hits_disk'] += 1
+            self._remember(key, encoded)
+        return json.loads(encoded)
+
+    def record_lookup(self, hit: bool):
+        """Count a lookup made by an upload worker process against its own copy of the cache."""
+        with self._lock:
+            self._stats['hits_worker' if hit else 'misses'] += 1
+
+    def put(self, key: str, value: Dict[str, Any], sheets: Optional[Dict[str, 'pd.DataFrame']] = None):
+        encoded = json.dumps(value, default=str).encode('utf-8')
+        with self._lock:
+            self._stats['puts'] += 1
+            self._remember(key, encoded)
+        self._write_disk(key, encoded, sheets)
+
+    def _remember(self, key: str, encoded: bytes):
+        # Caller holds the lock
+        if len(encoded) > self.max_bytes:
+            return
+        old = self._memory.pop(key, None)
+        if old is not None:
+            self._memory_bytes -= len(old)
+        self._memory[key] = encoded
+        self._memory_bytes += len(encoded)
+        while self._memory_bytes > self.max_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= len(evicted)
+            self._stats['evictions'] += 1
+
+    def _read_disk(self, key: str) -> Optional[bytes]:
+        if not self.disk_dir:
+            return None
+        try:
+            with open(self._disk_path(key), 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print(f"Parse cache disk read failed for {key}: {e}")
+            with self._lock:
+                self._stats['disk_errors'] += 1
+            return None
+
+    def _write_disk(self, key: str, encoded: bytes, sheets: Optional[Dict[str, 'pd.DataFrame']]):
+        if not self.disk_dir:
+            return
+        path = self._disk_path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Write-then-rename so a crash never leaves a truncated entry
+            fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(encoded)
+            os.replace(tmp, path)
+            if self.columnar and sheets:
+                sheet_dir = self._disk_path(key, suffix='')
+                os.makedirs(sheet_dir, exist_ok=True)
+                for name, df in sheets.items():
+                    df.to_parquet(os.path.join(sheet_dir, f"{name}.parquet"), index=False)
+        except Exception as e:
+            print(f"Parse cache disk write failed for {key}: {e}")
+            with self._lock:
+                self._stats['disk_errors'] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                **self._stats,
+                'memory_items': len(self._memory),
+                'memory_bytes': self._memory_bytes,
+                'max_bytes': self.max_bytes,
+                'disk_dir': self.disk_dir,
+            }
+
+
+def content_digest(source: Union[bytes, str], chunk_size: int = 1024 * 1024) -> str:
+    """SHA-256 hex of upload bytes, or of a spooled upload file read in chunks."""
+    if not isinstance(source, str):
+        return hashlib.sha256(source).hexdigest()
+    h = hashlib.sha256()
+    with open(source, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+_cache: Optional[ParseCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_parse_cache() -> ParseCache:
+    """Process-wide cache configured from the environment on first use."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ParseCache(
+                max_bytes=int(os.environ.get('PARSE_CACHE_MAX_BYTES', 64 * 1024 * 1024)),
+                disk_dir=os.environ.get('PARSE_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'crowd-parse-cache')) or None,
+                columnar=os.environ.get('PARSE_CACHE_COLUMNAR', '0') == '1',
+            )
+        return _cache
@@ -0,0 +1,149 @@
+import asyncio
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+# Cached chat answers kept (LRU) and how long each stays valid; 0 turns off caching and coalescing
+CHAT_CACHE_MAX_ENTRIES = int(os.environ.get('CHAT_CACHE_MAX_ENTRIES', 256))
+CHAT_CACHE_TTL_SECONDS = float(os.environ.get('CHAT_CACHE_TTL_SECONDS', 60))
+
+
+def normalize_message(message: str) -> str:
+    """Case, punctuation and spacing do not change the question."""
+    return ' '.join(re.findall(r'\w+', message.lower()))
+
+
+class ResponseCache:
+    """Answers keyed on (normalized message, state version), with in-flight coalescing.
+
+    ``get_or_compute`` returns a fresh cached answer, joins an identical
+    request that is already running, or runs ``compute`` itself. The upstream
+    call runs as its own task so one caller going away does not fail the
+    others; it is cancelled only when every caller waiting on it is gone.
+    Failures are passed to all waiters and never cached.
+    """
+
+    def __init__(self, max_entries: int = CHAT_CACHE_MAX_ENTRIES, ttl: float = CHAT_CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: 'OrderedDict[Hashable, Dict[str, Any]]' = OrderedDict()
+        self._inflight: Dict[Hashable, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'coalesced': 0, 'upstream_calls': 0, 'upstream_errors': 0,
+                       'expired': 0, 'evictions': 0, 'saved_seconds': 0.0}
+
+    def lookup(self, key: Hashable) -> Optional[str]:
+        """Fresh cached answer (counted as a hit) or None."""
+        if self.max_entries <= 0:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if now - entry['stored'] >= self.ttl:
+                del self._entries[key]
+                self._stats['expired'] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats['hits'] += 1
+            self._stats['saved_seconds'] += entry['cost']
+            return entry['value']
+
+    def put(self, key: Hashable, value: str, cost: float = 0.0):
+        """Store an answer that took ``cost`` seconds upstream."""
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = {'value': value, 'stored': time.monotonic(), 'cost': cost}
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats['evictions'] += 1
+
+    def record(self, key: Hashable, value: str, cost: float):
+        """Store an answer the caller fetched upstream itself (e.g. a streamed reply)."""
+        self._stats['upstream_calls'] += 1
+        self.put(key, value, cost)
+
+    async def join(self, key: Hashable) -> Optional[str]:
+        """Wait for an identical request already in flight; None when there is none."""
+        flight = self._inflight.get(key)
+        if flight is None:
+            return None
+        self._stats['coalesced'] += 1
+        return await self._wait(flight, leader=False)
+
+    async def get_or_compute(self, key: Hashable, compute: Callable[[], Awaitable[str]]) -> str:
+        if self.max_entries <= 0:
+            self._stats['upstream_calls'] += 1
+            return await compute()
+        value = self.lookup(key)
+        if value is not None:
+            return value
+        if key in self._inflight:
+            return await self.join(key)
+        flight = self._inflight[key] = {'key': key, 'waiters': 0, 'cost': 0.0}
+        flight['task'] = asyncio.ensure_future(self._run(key, flight, compute))
+        return await self._wait(flight, leader=True)
+
+    async def _wait(self, flight: Dict[str, Any], leader: bool) -> str:
+        flight['waiters'] += 1
+        try:
+            value = await asyncio.shield(flight['task'])
+        except asyncio.CancelledError:
+            if flight['task'].cancelled():
+                raise
+            # This caller went away; stop the upstream call only if nobody else waits on it
+            flight['waiters'] -= 1
+            if flight['waiters'] == 0:
+                # Unlisted now, so a request arriving before the task unwinds starts a fresh call
+                self._forget(flight)
+                flight['task'].cancel()
+            raise
+        if not leader:
+            self._stats['saved_seconds'] += flight['cost']
+        return value
+
+    async def _run(self, key: Hashable, flight: Dict[str, Any], compute: Callable[[], Awaitable[str]]) -> str:
+        started = time.perf_counter()
+        self._stats['upstream_calls'] += 1
+        try:
+            value = await compute()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            self._stats['upstream_errors'] += 1
+            raise
+        finally:
+            self._forget(flight)
+        flight['cost'] = time.perf_counter() - started
+        self.put(key, value, flight['cost'])
+        return value
+
+    def _forget(self, flight: Dict[str, Any]):
+        # Only this flight: a newer one for the same key may have replaced it
+        if self._inflight.get(flight['key']) is flight:
+            del self._inflight[flight['key']]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            entries = len(self._entries)
+        answered = stats['hits'] + stats['coalesced'] + stats['upstream_calls']
+        stats['saved_seconds'] = round(stats['saved_seconds'], 3)
+        return {
+            **stats,
+            'hit_rate': round((stats['hits'] + stats['coalesced']) / answered, 4) if answered else None,
+            'entries': entries,
+            'inflight': len(self._inflight),
+            'max_entries': self.max_entries,
+            'ttl': self.ttl,
+        }
@@ -0,0 +1,69 @@
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, Optional, Union
+
+
+class ArchiveTracker:
+    """Runs upload archive writes on a small thread pool and remembers their outcome.
+
+    Parsing no longer waits on (or re-downloads) the archived object, so the
+    write runs next to it; callers either wait on the returned future or let it
+    finish in the background and poll ``status(key)``. Only the most recent
+    ``max_entries`` statuses are kept.
+    """
+
+    def __init__(self, workers: int = 4, max_entries: int = 1000):
+        self.max_entries = max_entries
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='upload-archive')
+        self._status: 'OrderedDict[str, Dict[str, Any]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, storage, source: Union[bytes, str], key: str, content_type: str) -> Future:
+        self._set(key, {'key': key, 'status': 'pending', 'backend': type(storage).__name__,
+                        'submitted_at': datetime.utcnow().isoformat()})
+        return self._executor.submit(self._archive, storage, source, key, content_type)
+
+    def _archive(self, storage, source, key: str, content_type: str) -> bool:
+        try:
+            if isinstance(source, str):
+                ok = storage.upload_path(source, key, content_type)
+            else:
+                ok = storage.upload_file(source, key, content_type)
+        except Exception as e:
+            print(f"Archive of {key} failed: {e}")
+            ok = False
+        self._set(key, {'status': 'stored' if ok else 'failed', 'finished_at': datetime.utcnow().isoformat()})
+        return ok
+
+    def record(self, status: Dict[str, Any]):
+        """Keep a status produced elsewhere (e.g. by an upload worker process's own tracker)."""
+        self._set(status['key'], dict(status))
+
+    def _set(self, key: str, fields: Dict[str, Any]):
+        with self._lock:
+            entry = self._status.pop(key, {})
+            entry.update(fields)
+            self._status[key] = entry
+            while len(self._status) > self.max_entries:
+                self._status.popitem(last=False)
+
+    def status(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._status.get(key)
+            return dict(entry) if entry is not None else None
+
+
+_tracker: Optional[ArchiveTracker] = None
+_tracker_lock = threading.Lock()
+
+
+def get_archive_tracker() -> ArchiveTracker:
+    """Process-wide tracker; pool size from UPLOAD_ARCHIVE_WORKERS."""
+    global _tracker
+    with _tracker_lock:
+        if _tracker is None:
+            _tracker = ArchiveTracker(workers=int(os.environ.get('UPLOAD_ARCHIVE_WORKERS', 4)))
+        return _tracker
@@ -0,0 +1,173 @@
+import asyncio
+import multiprocessing
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional
+
+# Parsing in the server process holds the GIL for seconds per large workbook and
+# stalls the event loop's chat traffic, so uploads run in worker processes.
+UPLOAD_JOB_WORKERS = int(os.environ.get('UPLOAD_JOB_WORKERS', max(1, min(4, (os.cpu_count() or 2) - 1))))
+# Jobs queued or running at once; further submissions are refused (HTTP 429)
+UPLOAD_JOB_MAX_PENDING = int(os.environ.get('UPLOAD_JOB_MAX_PENDING', 8))
+UPLOAD_JOB_RETAIN = int(os.environ.get('UPLOAD_JOB_RETAIN', 100))
+# 'process' (default) or 'thread' - the latter is the old in-process behaviour
+UPLOAD_JOB_EXECUTOR = os.environ.get('UPLOAD_JOB_EXECUTOR', 'process')
+
+
+class UploadQueueFull(RuntimeError):
+    pass
+
+
+class UploadJobManager:
+    """Bounded pool for upload parsing with job bookkeeping.
+
+    ``submit`` returns a job id for the polling API; ``run`` awaits the same
+    pool for callers that still answer synchronously. Both count towards
+    ``max_pending``. Workers use the 'spawn' start method because forking a
+    server that already runs threads can deadlock the child. Only the last
+    ``retain`` finished jobs are kept.
+
+    State a job leaves behind in a worker process (its own singletons) is not
+    visible here; ``on_result`` is called with each successful job's return
+    value in this process so it can be recorded (process pool only - thread
+    jobs already update this process's state).
+    """
+
+    def __init__(self, workers: int = UPLOAD_JOB_WORKERS, max_pending: int = UPLOAD_JOB_MAX_PENDING,
+                 retain: int = UPLOAD_JOB_RETAIN, executor: str = UPLOAD_JOB_EXECUTOR):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.retain = retain
+        self.executor_kind = executor
+        self._executor = None
+        self._jobs: 'OrderedDict[str, Dict[str, Any]]' = OrderedDict()
+        self._pending = 0
+        self._lock = threading.Lock()
+        self.on_result: Optional[Callable[[Any], None]] = None
+
+    def _get_executor(self):
+        # Caller holds the lock; the pool is started on first use, not at import
+        if self._executor is None:
+            if self.executor_kind == 'thread':
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='upload-job')
+            else:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                     mp_context=multiprocessing.get_context('spawn'))
+        return self._executor
+
+    def _start(self, fn: Callable, args: tuple, meta: Dict[str, Any],
+               on_done: Optional[Callable[[], None]]) -> Dict[str, Any]:
+        with self._lock:
+            if self._pending >= self.max_pending:
+                raise UploadQueueFull(f'{self._pending} uploads already queued (limit {self.max_pending}).')
+            try:
+                future = self._get_executor().submit(fn, *args)
+            except BrokenProcessPool:
+                # A worker died (e.g. OOM on a huge workbook); start a fresh pool
+                print("Upload worker pool broke; restarting it.")
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+                future = self._get_executor().submit(fn, *args)
+            self._pending += 1
+            job = {'id': uuid.uuid4().hex, 'future': future, 'submitted_at': datetime.utcnow().isoformat(),
+                   'finished_at': None, **meta}
+            self._jobs[job['id']] = job
+            self._trim()
+
+        def done(f: Future):
+            with self._lock:
+                self._pending -= 1
+                job['finished_at'] = datetime.utcnow().isoformat()
+            if self.on_result is not None and self.executor_kind != 'thread' and not f.cancelled() \
+                    and f.exception() is None:
+                try:
+                    self.on_result(f.result())
+                except Exception as e:
+                    print(f"Recording upload job result failed: {e}")
+            if on_done is not None:
+                on_done()
+
+        future.add_done_callback(done)
+        return job
+
+    def _trim(self):
+        # Caller holds the lock; drop the oldest finished jobs beyond the retention limit
+        finished = [k for k, j in self._jobs.items() if j['future'].done()]
+        for key in finished[:max(0, len(self._jobs) - self.retain)]:
+            del self._jobs[key]
+
+    def submit(self, fn: Callable, *args, on_done: Optional[Callable[[], None]] = None, **meta) -> str:
+        return self._start(fn, args, meta, on_done)['id']
+
+    async def run(self, fn: Callable, *args, on_done: Optional[Callable[[], None]] = None, **meta):
+        job = self._start(fn, args, meta, on_done)
+        return await asyncio.wrap_future(job['future'])
+
+    @staticmethod
+    def _state(future: Future) -> str:
+        if future.cancelled():
+            return 'cancelled'
+        if future.done():
+            return 'failed' if future.exception() is not None else 'done'
+        return 'running' if future.running() else 'queued'
+
+    def status(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None:
+            return None
+        status = {k: v for k, v in job.items() if k != 'future'}
+        status['state'] = self._state(job['future'])
+        if status['state'] == 'failed':
+            status['error'] = str(job['future'].exception())
+        return status
+
+    def result(self, job_id: str) -> Any:
+        """The job's return value; only call once status() reports 'done'."""
+        with self._lock:
+            job = self._jobs[job_id]
+        return job['future'].result(timeout=0)
+
+    def cancel(self, job_id: str) -> Optional[bool]:
+        """True if the job was still queued and is now cancelled, False if it already
+        started (a worker process cannot be interrupted safely), None if unknown."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None:
+            return None
+        return job['future'].cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            states = [self._state(j['future']) for j in self._jobs.values()]
+            return {
+                'executor': self.executor_kind,
+                'workers': self.workers,
+                'max_pending': self.max_pending,
+                'pending': self._pending,
+                **{s: states.count(s) for s in ('queued', 'running', 'done', 'failed', 'cancelled')},
+            }
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+_manager: Optional[UploadJobManager] = None
+_manager_lock = threading.Lock()
+
+
+def get_upload_jobs() -> UploadJobManager:
+    """Process-wide upload job manager configured from the environment."""
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = UploadJobManager()
+        return _manager
@@ -0,0 +1,180 @@
+import asyncio
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import requests
+
+WEATHER_API_URL = os.environ.get('WEATHER_API_URL', 'https://api.open-meteo.com/v1/forecast')
+WEATHER_TIMEOUT_SECONDS = float(os.environ.get('WEATHER_TIMEOUT_SECONDS', 5))
+# Fresh for TTL; after that the cached value is still served while a refresh runs
+WEATHER_TTL_SECONDS = float(os.environ.get('WEATHER_TTL_SECONDS', 600))
+# Minimum wait before retrying a location whose last refresh failed
+WEATHER_RETRY_SECONDS = float(os.environ.get('WEATHER_RETRY_SECONDS', 30))
+# Decimal places kept from GPS coordinates; 2 places is roughly 1 km
+WEATHER_GPS_PRECISION = int(os.environ.get('WEATHER_GPS_PRECISION', 2))
+
+RAIN_CODES = [51, 53, 55, 56, 57, 61, 63, 65, 66, 67, 80, 81, 82]
+STORM_CODES = [95, 96, 99]
+CLOUDY_CODES = [1, 2, 3]
+
+
+def fetch_weather(lat: float, lng: float, url: str = WEATHER_API_URL,
+                  timeout: float = WEATHER_TIMEOUT_SECONDS) -> Dict[str, Any]:
+    """Current conditions from Open-Meteo (or a compatible stub at ``url``). Raises on failure."""
+    r = requests.get(url, params={
+        'latitude': lat,
+        'longitude': lng,
+        'current': 'temperature_2m,weather_code,wind_speed_10m',
+        'hourly': 'precipitation_probability',
+        'forecast_days': 1,
+        'timezone': 'auto',
+    }, timeout=timeout)
+    r.raise_for_status()
+    data = r.json()
+
+    current = data.get('current', {})
+    hourly = data.get('hourly', {})
+    times = hourly.get('time', [])
+    probs = hourly.get('precipitation_probability', [])
+    now_hour = datetime.utcnow().isoformat()[:13]
+    idx = next((i for i, t in enumerate(times) if t[:13] == now_hour), 0)
+    rain_prob = probs[idx] if isinstance(probs, list) and len(probs) > idx else None
+
+    code = current.get('weather_code')
+    condition = 'unknown'
+    if code in RAIN_CODES:
+        condition = 'rain'
+    elif code in STORM_CODES:
+        condition = 'storm'
+    elif code in CLOUDY_CODES:
+        condition = 'cloudy'
+    elif code == 0:
+        condition = 'clear'
+
+    return {
+        'condition': condition,
+        'temperature': round(current.get('temperature_2m', 0), 1) if current.get('temperature_2m') is not None else None,
+        'wind_speed': round(current.get('wind_speed_10m', 0), 1) if current.get('wind_speed_10m') is not None else None,
+        'rain_probability': rain_prob,
+        'last_updated': datetime.utcnow().isoformat(),
+        'source': 'open-meteo'
+    }
+
+
+class WeatherCache:
+    """Weather per rounded GPS location with stale-while-revalidate.
+
+    ``get`` never touches the network: it returns the cached value (with its
+    age) and, when that is older than ``ttl`` or missing, schedules a refresh
+    on the running event loop - or on a thread when called outside one. Only
+    one refresh per location is in flight; after a failure the old value keeps
+    being served and the next attempt waits ``retry_after`` seconds.
+    """
+
+    def __init__(self, ttl: float = WEATHER_TTL_SECONDS, retry_after: float = WEATHER_RETRY_SECONDS,
+                 precision: int = WEATHER_GPS_PRECISION,
+                 fetch: Callable[[float, float], Dict[str, Any]] = fetch_weather):
+        self.ttl = ttl
+        self.retry_after = retry_after
+        self.precision = precision
+        self.fetch = fetch
+        self._entries: Dict[Tuple[float, float], Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._tasks = set()
+        self._stats = {'hits': 0, 'stale_hits': 0, 'misses': 0, 'refreshes': 0, 'refresh_errors': 0}
+
+    def _key(self, lat: float, lng: float) -> Tuple[float, float]:
+        return round(lat, self.precision), round(lng, self.precision)
+
+    def get(self, lat: Optional[float], lng: Optional[float]) -> Dict[str, Any]:
+        if lat is None or lng is None:
+            return {
+                'condition': 'unknown',
+                'temperature': None,
+                'wind_speed': None,
+                'last_updated': datetime.utcnow().isoformat(),
+                'source': 'missing_gps'
+            }
+        key = self._key(lat, lng)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.setdefault(key, {'value': None, 'fetched': None, 'refreshing': False,
+                                                  'failed_at': None, 'error': None})
+            value, fetched = entry['value'], entry['fetched']
+            expired = fetched is None or now - fetched >= self.ttl
+            backing_off = entry['failed_at'] is not None and now - entry['failed_at'] < self.retry_after
+            schedule = expired and not entry['refreshing'] and not backing_off
+            if schedule:
+                entry['refreshing'] = True
+            self._stats['misses' if value is None else 'stale_hits' if expired else 'hits'] += 1
+            error = entry['error']
+
+        if schedule:
+            self._schedule_refresh(key)
+
+        if value is None:
+            # Nothing cached yet: same explicit failure marker as before, no fake values
+            return {
+                'condition': 'unknown',
+                'temperature': None,
+                'wind_speed': None,
+                'rain_probability': None,
+                'last_updated': datetime.utcnow().isoformat(),
+                'source': f'weather_error:{error[:60]}' if error else 'weather_pending',
+                'age_seconds': None,
+                'stale': True
+            }
+        return {**value, 'age_seconds': round(now - fetched, 1), 'stale': expired}
+
+    def _schedule_refresh(self, key: Tuple[float, float]):
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+        if loop is not None:
+            task = loop.create_task(asyncio.to_thread(self._refresh, key))
+            # Keep a reference so the task is not garbage-collected mid-flight
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        else:
+            threading.Thread(target=self._refresh, args=(key,), name='weather-refresh', daemon=True).start()
+
+    def _refresh(self, key: Tuple[float, float]):
+        try:
+            value = self.fetch(*key)
+        except Exception as e:
+            with self._lock:
+                entry = self._entries[key]
+                entry.update(refreshing=False, failed_at=time.monotonic(), error=str(e))
+                self._stats['refresh_errors'] += 1
+            print(f"Weather refresh for {key} failed: {e}")
+            return
+        with self._lock:
+            self._entries[key].update(value=value, fetched=time.monotonic(), refreshing=False,
+                                      failed_at=None, error=None)
+            self._stats['refreshes'] += 1
+
+    def refresh(self, lat: float, lng: float):
+        """Fetch now on the calling thread (blocking); for warm-up and tests."""
+        key = self._key(lat, lng)
+        with self._lock:
+            self._entries.setdefault(key, {'value': None, 'fetched': None, 'refreshing': False,
+                                           'failed_at': None, 'error': None})['refreshing'] = True
+        self._refresh(key)
+
+    async def keep_warm(self, location: Callable[[], Tuple[Optional[float], Optional[float]]],
+                        interval: Optional[float] = None):
+        """Background task: re-read ``location()`` and refresh ahead of expiry so chat never sees a miss."""
+        interval = interval or max(1.0, self.ttl / 2)
+        while True:
+            lat, lng = location()
+            if lat is not None and lng is not None:
+                await asyncio.to_thread(self.refresh, lat, lng)
+            await asyncio.sleep(interval)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self._stats, 'locations': len(self._entries), 'ttl': self.ttl}
@@ -0,0 +1,326 @@
+# Batch engine for the Bukit Jalil crowd dataset (see "LRT DATASET.py").
+#
+# The original generator draws one row at a time in a Python loop. This module
+# draws every column of a scenario as a NumPy array: zone-dependent capacity,
+# area and hotspot/evacuation logic go through per-zone lookup tables and masks,
+# so the marginal distributions match the loop for the same parameters.
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+# --- Parameters ---
+rows_per_scenario = 90000
+scenarios = ["Entry", "MidEvent", "Exit", "Emergency", "Disruption"]
+n_persons = 30000
+start_date = datetime(2025, 9, 20, 14, 0)
+minutes_span = 6 * 60  # 6-hour window
+venue = "Bukit Jalil Stadium"
+block_rows = 50000  # rows per independently seeded block
+
+gates_zones = [
+    "Gate A", "Gate B", "Gate C", "Gate D", "Gate E",
+    "FoodCourt1", "FoodCourt2", "Restroom1", "Restroom2",
+    "Entrance Plaza", "UpperDeckZone1", "LowerDeckZone1", "VIP Lounge",
+    "Exit A", "Exit B"
+]
+
+seat_zones = ["VIP", "LowerDeck", "UpperDeck", "Zone1", "Zone2", "Zone3"]
+seat_zone_p = [0.05, 0.3, 0.25, 0.15, 0.15, 0.1]
+transport_modes = ["Car", "Train", "Bus", "Walk"]
+transport_mode_p = [0.35, 0.25, 0.15, 0.25]
+weather_states = ["Clear", "Rain", "Storm"]
+recommended_actions = [
+    "OpenExtraGate", "DelayStart", "RedirectCrowd",
+    "DeployStaff", "AdviseShelter", "CloseGate"
+]
+
+# Minute window [low, high) per scenario
+scenario_minutes = {
+    "Entry": (0, 120),
+    "MidEvent": (120, 240),
+    "Exit": (240, 360),
+    "Emergency": (180, 360),
+    "Disruption": (0, minutes_span),
+}
+
+# Zone mix per scenario; None means uniform over all gates_zones
+scenario_zones = {
+    "Entry": (["Gate A", "Gate B", "Gate C", "Gate D", "Entrance Plaza"], [0.25, 0.25, 0.2, 0.15, 0.15]),
+    "Exit": (["Exit A", "Exit B", "Gate A", "Gate B", "LowerDeckZone1"], [0.3, 0.25, 0.2, 0.15, 0.1]),
+    "MidEvent": (["FoodCourt1", "FoodCourt2", "Restroom1", "Restroom2", "UpperDeckZone1"], [0.25, 0.25, 0.2, 0.15, 0.15]),
+    "Emergency": None,
+    "Disruption": None,
+}
+
+lam_factors = {
+    "Entry": 0.9, "Exit": 0.8, "MidEvent": 0.6,
+    "Emergency": 1.2, "Disruption": 0.7
+}
+
+# Hotspot thresholds: level 2 above the first value, level 1 above the second
+HOTSPOT_DENSITY = (3.0, 1.5)
+HOTSPOT_QUEUE_FACTOR = (4, 2)
+
+columns = [
+    "Person_ID", "Time", "Scenario_Type", "Gate/Zone_ID", "Seat_Zone",
+    "Transport_Mode", "Transport_Arrival", "Weather", "Gate_Capacity",
+    "Expected_Arrivals", "Actual_Arrivals", "Queue_Length", "Density",
+    "Hotspot_Label", "Evacuation_Time", "Recommended_Action", "Venue"
+]
+
+
+def _cap_params(zone):
+    """Mean/std of the gate or zone capacity draw (same rules as the loop)."""
+    if "Gate" in zone or "Entrance" in zone or "Exit" in zone:
+        return 300, 40
+    elif "FoodCourt" in zone or "Restroom" in zone:
+        return 60, 10
+    elif "UpperDeck" in zone or "LowerDeck" in zone:
+        return 120, 20
+    return 80, 15
+
+
+def _area_params(zone):
+    """Uniform bounds of the zone area used for density."""
+    if "Gate" in zone or "Entrance" in zone:
+        return 80, 180
+    elif "FoodCourt" in zone:
+        return 150, 500
+    elif "Restroom" in zone:
+        return 20, 60
+    elif "UpperDeck" in zone or "LowerDeck" in zone:
+        return 500, 3000
+    elif "VIP" in zone or "Lounge" in zone:
+        return 50, 200
+    return 100.0, 100.0
+
+
+# --- Lookup tables (indexed by position in gates_zones / transport_modes) ---
+_ZONES = np.array(gates_zones, dtype=object)
+_ZONE_INDEX = {z: i for i, z in enumerate(gates_zones)}
+_CAP_MEAN, _CAP_SD = (np.array(v, dtype=float) for v in zip(*map(_cap_params, gates_zones)))
+_AREA_LO, _AREA_HI = (np.array(v, dtype=float) for v in zip(*map(_area_params, gates_zones)))
+
+_SEATS = np.array(seat_zones, dtype=object)
+_MODES = np.array(transport_modes, dtype=object)
+# Train/Bus 35% in [1, 50), Car 30% in [1, 30), Walk 20% in [0, 10)
+_TRANSPORT_P = np.array([0.3, 0.35, 0.35, 0.2])
+_TRANSPORT_LO = np.array([1, 1, 1, 0])
+_TRANSPORT_HI = np.array([30, 50, 50, 10])
+
+_WEATHER = np.array(weather_states, dtype=object)
+_ACTIONS = np.array(recommended_actions, dtype=object)
+_ACTION_GROUPS = {
+    2: np.array([recommended_actions.index(a) for a in ("OpenExtraGate", "DeployStaff", "RedirectCrowd")]),
+    1: np.array([recommended_actions.index(a) for a in ("DeployStaff", "RedirectCrowd", "DelayStart")]),
+    "weather": np.array([recommended_actions.index(a) for a in ("DelayStart", "AdviseShelter", "CloseGate")]),
+}
+_TIME_LABELS = np.array(
+    [(start_date + timedelta(minutes=m)).strftime("%Y-%m-%d %H:%M") for m in range(minutes_span)],
+    dtype=object
+)
+
+
+def classify_hotspots(density, queue_len, capacity):
+    """Vectorized hotspot label: 2 if density > 3.0 or queue > 4x capacity,
+    1 if density > 1.5 or queue > 2x capacity, else 0."""
+    density = np.asarray(density, dtype=float)
+    queue_len = np.asarray(queue_len)
+    capacity = np.asarray(capacity)
+    level2 = (density > HOTSPOT_DENSITY[0]) | (queue_len > capacity * HOTSPOT_QUEUE_FACTOR[0])
+    level1 = (density > HOTSPOT_DENSITY[1]) | (queue_len > capacity * HOTSPOT_QUEUE_FACTOR[1])
+    return np.where(level2, 2, np.where(level1, 1, 0)).astype(np.int64)
+
+
+def draw_persons(rng):
+    """Seat zone and transport mode codes for every person (index = Person_ID - 1)."""
+    seat_codes = rng.choice(len(seat_zones), size=n_persons, p=seat_zone_p)
+    mode_codes = rng.choice(len(transport_modes), size=n_persons, p=transport_mode_p)
+    return seat_codes, mode_codes
+
+
+def generate_scenario_batch(scenario, n_rows, rng, persons):
+    """Draw ``n_rows`` rows of one scenario as a dict of column arrays."""
+    seat_codes, mode_codes = persons
+    n = int(n_rows)
+
+    pid = rng.integers(1, n_persons + 1, size=n)
+    tm = mode_codes[pid - 1]
+
+    # --- Time distribution ---
+    lo, hi = scenario_minutes[scenario]
+    minute_offset = rng.integers(lo, hi, size=n)
+
+    # --- Zone selection ---
+    mix = scenario_zones[scenario]
+    if mix is None:
+        z = rng.integers(0, len(gates_zones), size=n)
+    else:
+        names, p = mix
+        z = np.array([_ZONE_INDEX[name] for name in names])[rng.choice(len(names), size=n, p=p)]
+
+    # --- Gate/zone capacity ---
+    cap = np.maximum(5, rng.normal(_CAP_MEAN[z], _CAP_SD[z])).astype(np.int64)
+
+    # --- Expected arrivals by scenario ---
+    expected = rng.poisson(np.maximum(1, cap * lam_factors[scenario]))
+
+    # --- Actual arrivals with spikes ---
+    variability = rng.normal(0, np.maximum(1, cap * 0.2))
+    actual = np.maximum(0, np.trunc(expected + variability)).astype(np.int64)
+    spike = rng.random(n) < 0.01  # rare spike
+    if spike.any():
+        actual[spike] = expected[spike] + rng.integers((0.5 * cap[spike]).astype(np.int64), 4 * cap[spike])
+
+    # --- Transport arrivals ---
+    transport_arrival = np.zeros(n, dtype=np.int64)
+    hit = (actual > 0) & (rng.random(n) < _TRANSPORT_P[tm])
+    if hit.any():
+        t_hi = np.minimum(_TRANSPORT_HI[tm[hit]], actual[hit] + 1)
+        transport_arrival[hit] = rng.integers(_TRANSPORT_LO[tm[hit]], t_hi)
+
+    # --- Queue length ---
+    queue_len = np.maximum(0, actual - cap) + rng.poisson(cap * 0.1)
+
+    # --- Zone area for density ---
+    zone_area = rng.uniform(_AREA_LO[z], _AREA_HI[z])
+
+    people_present = actual + queue_len + rng.poisson(cap * 0.2)
+    density = people_present / zone_area
+    density = np.maximum(0.0, np.round(rng.normal(density, 0.15 * np.maximum(0.1, density)), 3))
+
+    # --- Hotspot label ---
+    hotspot = classify_hotspots(density, queue_len, cap)
+
+    # --- Evacuation time ---
+    evac_time = np.full(n, np.nan)
+    if scenario == "Emergency":
+        gates_open = rng.integers(1, 6, size=n)
+        evac_time[:] = np.maximum(
+            1, np.round((people_present / (gates_open * cap + 1)) * rng.uniform(0.8, 1.8, size=n))
+        )
+
+    # --- Weather ---
+    if scenario == "Disruption":
+        weather = rng.choice(len(weather_states), size=n, p=[0.4, 0.45, 0.15])
+    else:
+        weather = rng.choice(len(weather_states), size=n, p=[0.75, 0.2, 0.05])
+
+    # --- Recommended action ---
+    pick3 = rng.integers(0, 3, size=n)
+    action = rng.integers(0, len(recommended_actions), size=n)
+    bad_weather = (scenario == "Disruption") & (weather > 0)
+    action = np.select(
+        [hotspot == 2, hotspot == 1, bad_weather],
+        [_ACTION_GROUPS[2][pick3], _ACTION_GROUPS[1][pick3], _ACTION_GROUPS["weather"][pick3]],
+        default=action
+    )
+
+    return {
+        "Person_ID": pid,
+        "Time": _TIME_LABELS[minute_offset],
+        "Scenario_Type": np.full(n, scenario, dtype=object),
+        "Gate/Zone_ID": _ZONES[z],
+        "Seat_Zone": _SEATS[seat_codes[pid - 1]],
+        "Transport_Mode": _MODES[tm],
+        "Transport_Arrival": transport_arrival,
+        "Weather": _WEATHER[weather],
+        "Gate_Capacity": cap,
+        "Expected_Arrivals": expected,
+        "Actual_Arrivals": actual,
+        "Queue_Length": queue_len,
+        "Density": density,
+        "Hotspot_Label": hotspot,
+        "Evacuation_Time": evac_time,
+        "Recommended_Action": _ACTIONS[action],
+        "Venue": np.full(n, venue, dtype=object),
+    }
+
+
+def _block_plan(rows_per_scenario, block_rows):
+    """Fixed (scenario_idx, block_idx, n_rows) blocks covering the whole dataset.
+
+    Every block has its own seed, so the rows only depend on ``seed`` and
+    ``block_rows`` -- never on how the blocks are spread across shards.
+    """
+    plan = []
+    for s_idx in range(len(scenarios)):
+        for b_idx, offset in enumerate(range(0, rows_per_scenario, block_rows)):
+            plan.append((s_idx, b_idx, min(block_rows, rows_per_scenario - offset)))
+    return plan
+
+
+def _block_rng(seed, s_idx, b_idx):
+    return np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(s_idx + 1, b_idx)))
+
+
+def _persons(seed):
+    return draw_persons(np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(0,))))
+
+
+def generate_block(seed, s_idx, b_idx, n_rows, persons):
+    """One block of rows as a DataFrame."""
+    rng = _block_rng(seed, s_idx, b_idx)
+    return pd.DataFrame(generate_scenario_batch(scenarios[s_idx], n_rows, rng, persons), columns=columns)
+
+
+def generate_batch(rows_per_scenario=rows_per_scenario, seed=42, block_rows=block_rows):
+    """Generate the full dataset (all scenarios) as one DataFrame."""
+    persons = _persons(seed)
+    frames = [generate_block(seed, s_idx, b_idx, n, persons)
+              for s_idx, b_idx, n in _block_plan(rows_per_scenario, block_rows)]
+    return pd.concat(frames, ignore_index=True)
+
+
+def _write_shard(shard_idx, blocks, seed, out_dir, fmt):
+    # Runs in a worker process: generate one block at a time and stream it to
+    # the sink, so peak memory is one block regardless of shard size.
+    from crowd_sinks import open_sink
+
+    persons = _persons(seed)
+    path = os.path.join(out_dir, f"part-{shard_idx:05d}.{fmt}")
+    rows = 0
+    with open_sink(path, fmt) as sink:
+        for s_idx, b_idx, n in blocks:
+            df = generate_block(seed, s_idx, b_idx, n, persons)
+            sink.write(df)
+            rows += len(df)
+    return path, rows
+
+
+def generate_sharded(out_dir, rows_per_scenario=rows_per_scenario, seed=42, shards=None,
+                     workers=None, fmt="parquet", block_rows=block_rows):
+    """Generate the dataset across a process pool, one part file per shard.
+
+    Reading the part files in name order yields the same rows as
+    ``generate_batch`` for the same ``seed`` and ``block_rows``.
+    """
+    workers = workers or os.cpu_count() or 1
+    plan = _block_plan(rows_per_scenario, block_rows)
+    shards = max(1, min(shards or workers, len(plan)))
+    # Contiguous, near-equal runs of blocks per shard
+    bounds = np.linspace(0, len(plan), shards + 1).astype(int)
+    os.makedirs(out_dir, exist_ok=True)
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            pool.submit(_write_shard, i, plan[bounds[i]:bounds[i + 1]], seed, out_dir, fmt)
+            for i in range(shards)
+        ]
+        parts = [f.result() for f in futures]
+
+    manifest = {
+        "seed": seed,
+        "rows_per_scenario": rows_per_scenario,
+        "block_rows": block_rows,
+        "format": fmt,
+        "parts": [{"path": os.path.basename(path), "rows": rows} for path, rows in parts],
+        "total_rows": sum(rows for _, rows in parts),
+    }
+    with open(os.path.join(out_dir, "_manifest.json"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
@@ -0,0 +1,235 @@
+# Time-ordered replay of a crowd dataset through the hotspot rules.
+#
+# Rows are released in timestamp order, either paced against the wall clock
+# at --speed times real time or as fast as possible. Each release is a
+# micro-batch: hotspot levels come from classify_hotspots (the generator's
+# thresholds) over whole arrays, and every zone at or above --min-level in the
+# batch produces one alert event carrying its worst level, row count and peak
+# density/queue. Latency is measured from the moment a triggering row was due
+# until its alert was emitted.
+#
+#   python crowd_replay.py "../teset dataset/crowd_47000.xlsx" --max-speed
+#   python crowd_replay.py "../teset dataset/crowd_1000.xlsx" --speed 120 --alerts-out alerts.jsonl
+#   python crowd_replay.py crowd_simulation_shards --max-speed --post-url http://localhost:8000/api/broadcast
+import argparse
+import glob
+import json
+import os
+import time
+import urllib.request
+
+import numpy as np
+import pandas as pd
+
+from crowd_generator import classify_hotspots
+
+REPLAY_COLUMNS = ["Time", "Gate/Zone_ID", "Density", "Queue_Length", "Gate_Capacity", "Hotspot_Label"]
+
+# Source labels seen in the workbooks, mapped onto classify_hotspots levels
+_LABEL_LEVELS = {"0": 0, "none": 0, "low": 0, "1": 1, "mild": 1, "moderate": 1, "2": 2, "severe": 2, "high": 2}
+
+
+def load_rows(path, sheet_name=0):
+    """Replay columns of a workbook, CSV, Parquet file or sharded output directory, sorted by time."""
+    if os.path.isdir(path):
+        parts = sorted(glob.glob(os.path.join(path, "part-*.*")))
+        if not parts:
+            raise ValueError(f"{path}: no part-* files")
+        frames = [load_rows(part, sheet_name) for part in parts]
+        df = pd.concat(frames, ignore_index=True)
+    elif path.endswith(".parquet"):
+        df = pd.read_parquet(path, columns=REPLAY_COLUMNS)
+    elif path.endswith(".csv"):
+        df = pd.read_csv(path, usecols=REPLAY_COLUMNS)
+    else:
+        df = pd.read_excel(path, sheet_name=sheet_name, usecols=REPLAY_COLUMNS)
+    df["Time"] = pd.to_datetime(df["Time"])
+    # Stable, so rows sharing a timestamp keep their file order
+    return df.sort_values("Time", kind="stable", ignore_index=True)
+
+
+def source_levels(labels):
+    """Source Hotspot_Label as levels, or None when the labels are not recognised."""
+    mapped = pd.Series(labels).astype(str).str.strip().str.lower().map(_LABEL_LEVELS)
+    missing = pd.Series(labels).isna()
+    mapped[missing] = 0
+    if mapped.isna().any():
+        return None
+    return mapped.to_numpy(dtype=np.int64)
+
+
+class ReplayStats:
+    def __init__(self):
+        self.rows = 0
+        self.batches = 0
+        self.alerts = 0
+        self.alerts_by_level = {}
+        self.latencies = []
+        self.elapsed = 0.0
+
+    def report(self):
+        lat = np.array(self.latencies) * 1000 if self.latencies else np.array([np.nan])
+        return {
+            "rows": self.rows,
+            "batches": self.batches,
+            "elapsed_s": round(self.elapsed, 3),
+            "rows_per_sec": round(self.rows / self.elapsed) if self.elapsed else None,
+            "alerts": self.alerts,
+            "alerts_by_level": {str(k): v for k, v in sorted(self.alerts_by_level.items())},
+            "alert_latency_ms": {
+                "p50": round(float(np.nanpercentile(lat, 50)), 3),
+                "p99": round(float(np.nanpercentile(lat, 99)), 3),
+                "max": round(float(np.nanmax(lat)), 3),
+            },
+        }
+
+
+def replay(df, speed=None, batch_rows=4096, min_level=2, emit=None):
+    """Release ``df`` rows in time order and emit hotspot alerts per micro-batch.
+
+    ``speed`` is the replay rate relative to real time (60 = one dataset
+    minute per second); None replays as fast as possible in batches of
+    ``batch_rows``. ``emit`` receives each batch's list of alert dicts.
+    Returns (ReplayStats, levels) with the level computed for every row.
+    """
+    n = len(df)
+    times = df["Time"].to_numpy(dtype="datetime64[ns]").astype(np.int64)
+    zone_codes, zone_names = pd.factorize(df["Gate/Zone_ID"])
+    # Rows without a zone get their own slot; a -1 code would index the last zone's totals
+    zone_names = list(zone_names) + ["Unknown"]
+    zone_codes[zone_codes < 0] = len(zone_names) - 1
+    density = df["Density"].to_numpy(dtype=float)
+    queue = df["Queue_Length"].to_numpy()
+    capacity = df["Gate_Capacity"].to_numpy()
+    levels = np.zeros(n, dtype=np.int64)
+    # Seconds after start at which each row is due
+    offsets = (times - times[0]) / 1e9 / speed if speed and n else None
+
+    stats = ReplayStats()
+    start = time.perf_counter()
+    i = 0
+    while i < n:
+        if offsets is not None:
+            now = time.perf_counter() - start
+            due = int(np.searchsorted(offsets, now, side="right"))
+            if due <= i:
+                time.sleep(min(offsets[i] - now, 0.05))
+                continue
+            j = min(due, i + batch_rows)
+            due_at = start + offsets[i:j]
+        else:
+            j = min(n, i + batch_rows)
+            due_at = np.full(j - i, time.perf_counter())
+
+        batch_levels = classify_hotspots(density[i:j], queue[i:j], capacity[i:j])
+        levels[i:j] = batch_levels
+        hit = np.flatnonzero(batch_levels >= min_level)
+        alerts = []
+        if hit.size:
+            zones = zone_codes[i:j][hit]
+            # Rows are in time order, so the first index per zone is its earliest trigger
+            uniq, first, counts = np.unique(zones, return_index=True, return_counts=True)
+            order = np.argsort(first)
+            uniq, first, counts = uniq[order], first[order], counts[order]
+            worst = np.zeros(len(zone_names), dtype=np.int64)
+            peak_density = np.zeros(len(zone_names))
+            peak_queue = np.zeros(len(zone_names), dtype=np.int64)
+            np.maximum.at(worst, zones, batch_levels[hit])
+            np.maximum.at(peak_density, zones, density[i:j][hit])
+            np.maximum.at(peak_queue, zones, queue[i:j][hit])
+            for code, first_idx, count in zip(uniq, first, counts):
+                row = i + hit[first_idx]
+                alerts.append({
+                    "time": pd.Timestamp(times[row]).isoformat(),
+                    "zone": zone_names[code],
+                    "level": int(worst[code]),
+                    "rows": int(count),
+                    "peak_density": float(peak_density[code]),
+                    "peak_queue": int(peak_queue[code]),
+                    "capacity": int(capacity[row]),
+                })
+            if emit is not None:
+                emit(alerts)
+            emitted = time.perf_counter()
+            stats.latencies.extend(emitted - due_at[hit[first]])
+            for alert in alerts:
+                stats.alerts_by_level[alert["level"]] = stats.alerts_by_level.get(alert["level"], 0) + 1
+            stats.alerts += len(alerts)
+        stats.rows += j - i
+        stats.batches += 1
+        i = j
+    stats.elapsed = time.perf_counter() - start
+    return stats, levels
+
+
+def jsonl_emitter(path):
+    f = open(path, "w", encoding="utf-8")
+
+    def emit(alerts):
+        for alert in alerts:
+            f.write(json.dumps(alert) + "\n")
+
+    emit.close = f.close
+    return emit
+
+
+def broadcast_emitter(url, topic="alerts", timeout=5):
+    """POST each batch of alerts as one message to the API's /api/broadcast."""
+    def emit(alerts):
+        body = json.dumps({"topic": topic, "message": {"sender": "system", "type": "hotspots", "alerts": alerts}})
+        req = urllib.request.Request(url, data=body.encode("utf-8"), headers={"Content-Type": "application/json"})
+        try:
+            urllib.request.urlopen(req, timeout=timeout).read()
+        except OSError as e:
+            print(f"⚠️ Alert POST failed: {e}")
+
+    emit.close = lambda: None
+    return emit
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a crowd dataset in time order and emit hotspot alerts.")
+    parser.add_argument("input", help="Workbook, CSV, Parquet file or sharded output directory")
+    parser.add_argument("--sheet", default=0, help="Sheet name or index for workbooks")
+    pace = parser.add_mutually_exclusive_group()
+    pace.add_argument("--speed", type=float, default=60.0, help="Replay rate relative to real time (default 60x)")
+    pace.add_argument("--max-speed", action="store_true", help="Replay as fast as possible")
+    parser.add_argument("--batch-rows", type=int, default=4096, help="Most rows classified per micro-batch")
+    parser.add_argument("--min-level", type=int, choices=[1, 2], default=2, help="Lowest hotspot level that alerts")
+    parser.add_argument("--limit", type=int, default=None, help="Replay only the first N rows (by time)")
+    parser.add_argument("--alerts-out", default=None, help="Write alert events as JSON lines")
+    parser.add_argument("--post-url", default=None, help="POST each batch of alerts to this /api/broadcast URL")
+    args = parser.parse_args()
+
+    sheet = int(args.sheet) if str(args.sheet).isdigit() else args.sheet
+    t0 = time.perf_counter()
+    df = load_rows(args.input, sheet)
+    if args.limit:
+        df = df.iloc[:args.limit]
+    print(f"Loaded {len(df):,} rows in {time.perf_counter() - t0:.2f}s "
+          f"({df['Time'].iloc[0]} -> {df['Time'].iloc[-1]})")
+
+    emitters = []
+    if args.alerts_out:
+        emitters.append(jsonl_emitter(args.alerts_out))
+    if args.post_url:
+        emitters.append(broadcast_emitter(args.post_url))
+
+    def emit(alerts):
+        for e in emitters:
+            e(alerts)
+
+    stats, levels = replay(df, None if args.max_speed else args.speed, args.batch_rows, args.min_level,
+                           emit if emitters else None)
+    for e in emitters:
+        e.close()
+
+    report = stats.report()
+    source = source_levels(df["Hotspot_Label"])
+    if source is not None:
+        report["source_label_agreement"] = round(float((source == levels).mean()), 4)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
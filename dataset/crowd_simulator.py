@@ -0,0 +1,334 @@
+# Grid crowd simulator behind scenario_summary.txt.
+#
+# The venue is a walkable grid with gates on the perimeter. A flow field is
+# computed once per set of open gates: a breadth-first wave from every open
+# gate gives each cell its distance, the next cell towards the nearest gate
+# and that gate's id. Agents are flat arrays (cell, release step, exit step),
+# so a step is a handful of array operations whatever the head count: every
+# walking agent asks for its cell's next cell, at most --cell-flow agents may
+# enter a cell per step and each gate lets out its capacity per step (ranks
+# within a destination come from one stable sort of small integer keys, which
+# NumPy does as a radix sort). Those held back queue where they stand, which
+# is where the hotspots in the summary come from. Occupancy is one bincount per
+# step and the per-cell peak a running maximum. The redirect shares recommended
+# for a hotspot's gate balance each gate's starting crowd against its capacity.
+#
+#   python crowd_simulator.py
+#   python crowd_simulator.py --agents 87000 --summary-out scenario_summary_87k.txt
+#   python crowd_simulator.py --benchmark --agents 2000 87000
+import argparse
+import time
+from datetime import datetime
+
+import numpy as np
+
+# --- Parameters ---
+grid_shape = (60, 40)  # rows x cols
+n_agents = 2000
+gate_capacity = 6  # agents through one gate per step
+cell_flow = 20  # agents that can enter one cell per step
+max_steps = 10000
+hotspots_reported = 5
+
+# Perimeter gates, numbered in this order (south gates 7, 8, 9 face the plaza)
+gate_positions = [
+    (0, 10), (0, 20), (0, 30),  # 0-2 north
+    (20, 0), (40, 0),  # 3-4 west
+    (20, 39), (40, 39),  # 5-6 east
+    (59, 10), (59, 20), (59, 30),  # 7-9 south
+]
+
+# Where agents start, how quickly they are released, and what changes per scenario
+SCENARIOS = {
+    "entry_rush": {"spawn": "plaza", "release_steps": 60},
+    "mid_event_congestion": {"spawn": "seats", "release_steps": 600, "closed_gates": (0, 1, 2)},
+    "emergency_evacuation": {"spawn": "seats", "release_steps": 1, "gate_capacity_scale": 1.5},
+}
+
+
+class VenueLayout:
+    """Walkable grid, gate cells and spawn regions as plain arrays (read-only once built)."""
+
+    def __init__(self, walkable, gate_cells, gate_capacity, seats, plaza):
+        self.walkable = walkable
+        self.shape = walkable.shape
+        self.gate_cells = gate_cells
+        self.gate_capacity = gate_capacity
+        self.seats = seats
+        self.plaza = plaza
+
+    @property
+    def n_cells(self):
+        return self.shape[0] * self.shape[1]
+
+    def cell(self, flat):
+        return tuple(int(v) for v in np.unravel_index(flat, self.shape))
+
+
+def default_layout(shape=grid_shape, gates=gate_positions, capacity=gate_capacity):
+    """Bukit Jalil-style bowl: perimeter wall with gates, a pitch in the middle, stands around it
+    and an open plaza along the south side."""
+    h, w = shape
+    walkable = np.zeros(shape, dtype=bool)
+    walkable[1:h - 1, 1:w - 1] = True
+    pitch = np.zeros(shape, dtype=bool)
+    pitch[h * 22 // 60:h * 38 // 60, w * 12 // 40:w * 28 // 40] = True
+    walkable &= ~pitch
+    gate_cells = np.array([r * w + c for r, c in gates], dtype=np.int64)
+    walkable.flat[gate_cells] = True
+
+    stands = np.zeros(shape, dtype=bool)
+    stands[h // 6:h * 50 // 60, w // 8:w * 35 // 40] = True
+    stands &= walkable
+    plaza = np.zeros(shape, dtype=bool)
+    plaza[h * 50 // 60:h - 1, 1:w - 1] = True
+    return VenueLayout(walkable, gate_cells, np.full(len(gates), capacity, dtype=np.int64),
+                       np.flatnonzero(stands), np.flatnonzero(plaza & walkable))
+
+
+def flow_field(layout, open_gates=None):
+    """(distance, next cell, nearest gate) per flat cell for the open gates; -1 where unreachable.
+
+    A gate cell's next cell is -1: agents there leave through it.
+    """
+    h, w = layout.shape
+    n_gates = len(layout.gate_cells)
+    open_gates = np.ones(n_gates, dtype=bool) if open_gates is None else np.asarray(open_gates, dtype=bool)
+    walk = layout.walkable.ravel().copy()
+    walk[layout.gate_cells[~open_gates]] = False  # a closed gate is wall
+
+    dist = np.full(layout.n_cells, -1, dtype=np.int64)
+    nxt = np.full(layout.n_cells, -1, dtype=np.int64)
+    gate_of = np.full(layout.n_cells, -1, dtype=np.int64)
+    frontier = layout.gate_cells[open_gates]
+    dist[frontier] = 0
+    gate_of[frontier] = np.flatnonzero(open_gates)
+    while frontier.size:
+        r, c = np.divmod(frontier, w)
+        nbs, srcs = [], []
+        for dr, dc in ((-1, 0), (1, 0), (0, -1), (0, 1)):
+            rr, cc = r + dr, c + dc
+            inside = (rr >= 0) & (rr < h) & (cc >= 0) & (cc < w)
+            nb = rr[inside] * w + cc[inside]
+            fresh = walk[nb] & (dist[nb] < 0)
+            nbs.append(nb[fresh])
+            srcs.append(frontier[inside][fresh])
+        nb, first = np.unique(np.concatenate(nbs), return_index=True)
+        src = np.concatenate(srcs)[first]
+        dist[nb] = dist[src] + 1
+        nxt[nb] = src
+        gate_of[nb] = gate_of[src]
+        frontier = nb
+    return dist, nxt, gate_of
+
+
+def _ranks(keys):
+    """Position of each entry among the entries with the same key (stable by index)."""
+    order = np.argsort(keys, kind="stable")
+    sorted_keys = keys[order]
+    starts = np.flatnonzero(np.r_[True, sorted_keys[1:] != sorted_keys[:-1]])
+    sizes = np.diff(np.r_[starts, len(keys)])
+    rank = np.empty(len(keys), dtype=np.int64)
+    rank[order] = np.arange(len(keys)) - np.repeat(starts, sizes)
+    return rank
+
+
+def simulate(layout, agents=n_agents, spawn="seats", release_steps=1, open_gates=None, capacity=None,
+             move_prob=1.0, flow=cell_flow, steps=max_steps, seed=0, field=None):
+    """Run one scenario. Returns counts, the per-cell peak grid and timing.
+
+    ``capacity`` overrides the layout's per-gate capacity; ``move_prob`` is the
+    chance a walking agent moves in a step (weather); ``field`` reuses a flow
+    field computed for the same ``open_gates``.
+    """
+    rng = np.random.default_rng(seed)
+    n_gates = len(layout.gate_cells)
+    open_gates = np.ones(n_gates, dtype=bool) if open_gates is None else np.asarray(open_gates, dtype=bool)
+    capacity = layout.gate_capacity if capacity is None else np.asarray(capacity, dtype=np.int64)
+    _, nxt, gate_of = field if field is not None else flow_field(layout, open_gates)
+    n_cells = layout.n_cells
+
+    # Agents sorted by release step, so the released ones are always a prefix
+    region = layout.seats if spawn == "seats" else layout.plaza
+    release = np.sort(rng.integers(0, max(1, release_steps), size=agents))
+    pos = rng.choice(region, size=agents)
+    exit_step = np.full(agents, -1, dtype=np.int64)
+    natural = gate_of[pos]
+    demand = np.bincount(natural[natural >= 0], minlength=n_gates)  # agents per nearest gate at the start
+
+    exit_cap = np.zeros(n_cells, dtype=np.int64)
+    exit_cap[layout.gate_cells[open_gates]] = capacity[open_gates]
+    # Destination keys: cell c for entering c, n_cells + c for leaving through gate cell c
+    key_dtype = np.uint16 if 2 * n_cells < 2 ** 16 else np.int64  # small ints sort as radix
+    limits = np.concatenate([np.full(n_cells, flow, dtype=np.int64), exit_cap])
+
+    peak = np.zeros(n_cells, dtype=np.int64)
+    alive = np.empty(0, dtype=np.int64)
+    released = 0
+    agent_steps = 0
+    step = 0
+    t0 = time.perf_counter()
+    for step in range(steps):
+        newly = int(np.searchsorted(release, step, side="right"))
+        if newly > released:
+            alive = np.concatenate([alive, np.arange(released, newly)])
+            released = newly
+        if not alive.size:
+            if released == agents:
+                break
+            continue
+        agent_steps += alive.size
+
+        p = pos[alive]
+        target = nxt[p]
+        leaving = exit_cap[p] > 0
+        wants = leaving | (target >= 0)
+        if move_prob < 1.0:
+            wants &= rng.random(alive.size) < move_prob
+        idx = np.flatnonzero(wants)
+        keys = np.where(leaving[idx], p[idx] + n_cells, target[idx]).astype(key_dtype)
+        go = idx[_ranks(keys) < limits[keys]]
+
+        out = go[leaving[go]]
+        move = go[~leaving[go]]
+        pos[alive[move]] = target[move]
+        if out.size:
+            exit_step[alive[out]] = step
+            keep = np.ones(alive.size, dtype=bool)
+            keep[out] = False
+            alive = alive[keep]
+        np.maximum(peak, np.bincount(pos[alive], minlength=n_cells), out=peak)
+    elapsed = time.perf_counter() - t0
+
+    done = exit_step >= 0
+    return {
+        "agents": agents,
+        "evacuated": int(done.sum()),
+        "steps": step + 1,
+        "mean_exit_step": float(exit_step[done].mean()) if done.any() else None,
+        "last_exit_step": int(exit_step.max()) if done.any() else None,
+        "peak": peak.reshape(layout.shape),
+        "agent_steps": int(agent_steps),
+        "elapsed_s": elapsed,
+        "gate_demand": demand,
+    }
+
+
+def hotspots(layout, result, field, top=hotspots_reported):
+    """The ``top`` cells by peak occupancy with their nearest open gate."""
+    _, _, gate_of = field
+    peak = result["peak"].ravel()
+    cells = np.argsort(-peak, kind="stable")[:top]
+    return [{"cell": layout.cell(c), "peak": int(peak[c]), "nearest_gate": int(gate_of[c])}
+            for c in cells if peak[c] > 0]
+
+
+def gate_redirects(layout, demand, capacity, open_gates, min_share=0.05):
+    """Share of each gate's agents to send elsewhere so every open gate clears at the same time.
+
+    With the whole crowd known up front, the min-max plan gives each open
+    gate demand in proportion to its capacity (the single-bucket case of the
+    app's water-filling gate balancer). Each overloaded gate's surplus goes
+    to the nearest gates with room first. Returns {gate: (share, {to_gate:
+    share})} for gates sending at least ``min_share`` of their agents.
+    """
+    demand = np.asarray(demand, dtype=np.float64)
+    cap = np.where(open_gates, capacity, 0).astype(np.float64)
+    if not cap.sum() or not demand.sum():
+        return {}
+    target = demand.sum() * cap / cap.sum()
+    surplus = np.maximum(0.0, demand - target)
+    room = np.maximum(0.0, target - demand)
+    r, c = np.divmod(layout.gate_cells, layout.shape[1])
+    plan = {}
+    for g in np.argsort(-surplus, kind="stable"):
+        if surplus[g] <= 0:
+            break
+        left, to = surplus[g], {}
+        for h in np.argsort(np.abs(r - r[g]) + np.abs(c - c[g]), kind="stable"):
+            if left <= 0:
+                break
+            moved = min(left, room[h])
+            if moved > 0:
+                to[int(h)] = float(moved / demand[g])
+                room[h] -= moved
+                left -= moved
+        if surplus[g] / demand[g] >= min_share:
+            plan[int(g)] = (float(surplus[g] / demand[g]), to)
+    return plan
+
+
+def run_scenario(layout, name, agents=n_agents, seed=0, **overrides):
+    """Simulate one named scenario from SCENARIOS; ``overrides`` replace its settings."""
+    spec = {**SCENARIOS[name], **overrides}
+    n_gates = len(layout.gate_cells)
+    open_gates = np.ones(n_gates, dtype=bool)
+    open_gates[list(spec.get("closed_gates", ()))] = False
+    capacity = np.maximum(1, np.round(layout.gate_capacity * spec.get("gate_capacity_scale", 1.0))).astype(np.int64)
+    field = flow_field(layout, open_gates)
+    result = simulate(layout, agents, spec["spawn"], spec["release_steps"], open_gates, capacity,
+                      spec.get("move_prob", 1.0), spec.get("cell_flow", cell_flow), spec.get("max_steps", max_steps),
+                      seed, field)
+    result["hotspots"] = hotspots(layout, result, field)
+    result["redirects"] = gate_redirects(layout, result["gate_demand"], capacity, open_gates)
+    return result
+
+
+def summary_lines(name, result):
+    lines = [f"=== {name} ===", f"Evacuated: {result['evacuated']}/{result['agents']}", "Recommendations:"]
+    for h in result["hotspots"]:
+        gate = h["nearest_gate"]
+        if gate in result.get("redirects", {}):
+            share, to = result["redirects"][gate]
+            where = ", ".join(f"gate {g} ({s:.0%})" for g, s in to.items() if s >= 0.005)
+            advice = f"redirect {share:.0%} of incoming flow to {where}."
+        else:
+            advice = f"gate {gate} is within its share of the crowd; open an adjacent gate or add staff at the bottleneck."
+        lines.append(f" - Hotspot at cell {h['cell']} with peak {h['peak']} people. Nearest gate: {gate}. "
+                     f"Recommendation: {advice}")
+    return lines
+
+
+def _attendee_count(path):
+    import pandas as pd
+
+    n = len(pd.read_excel(path, usecols=[0]))
+    if not n:
+        raise SystemExit(f"{path} has no attendee rows")
+    return n
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the grid crowd/evacuation scenarios.")
+    parser.add_argument("--agents", type=int, nargs="+", default=[n_agents], help="Agent counts to simulate")
+    parser.add_argument("--attendees", default=None, help="Attendee workbook; one agent per row")
+    parser.add_argument("--scenarios", nargs="+", choices=sorted(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--summary-out", default=None, help="Write the summary text here")
+    parser.add_argument("--benchmark", action="store_true", help="Print steps/sec and agent-steps/sec per run")
+    args = parser.parse_args()
+
+    counts = [_attendee_count(args.attendees)] if args.attendees else args.agents
+    layout = default_layout()
+    lines = [f"Run at: {datetime.utcnow().isoformat()}Z",
+             f"Dataset: {args.attendees or 'synthetic agents'}"]
+    for agents in counts:
+        for name in args.scenarios:
+            result = run_scenario(layout, name, agents, args.seed)
+            lines += [""] + summary_lines(name, result)
+            if args.benchmark or len(counts) > 1:
+                rate = result["steps"] / result["elapsed_s"]
+                print(f"{name:<22} {agents:>7,} agents: {result['steps']:>5} steps in {result['elapsed_s']:.2f}s "
+                      f"({rate:,.0f} steps/s, {result['agent_steps'] / result['elapsed_s']:,.0f} agent-steps/s), "
+                      f"evacuated {result['evacuated']:,}")
+    text = "\n".join(lines) + "\n"
+    if args.summary_out:
+        with open(args.summary_out, "w", encoding="utf-8") as f:
+            f.write(text)
+        print(f"✅ Summary written to {args.summary_out}")
+    if not args.benchmark:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+# Streaming sinks for the crowd dataset generator.
+#
+# Each sink accepts DataFrame chunks via write() and flushes them as they
+# arrive (a Parquet row group / CSV append), so memory stays bounded by the
+# chunk size. Excel is only kept for small outputs: it has to be built in
+# memory and a sheet is capped at 1,048,576 rows.
+import pandas as pd
+
+EXCEL_MAX_ROWS = 1048576 - 1  # one row is the header
+
+
+class CsvSink:
+    def __init__(self, path):
+        self.path = path
+        self._f = open(path, "w", encoding="utf-8", newline="")
+        self._header = True
+
+    def write(self, df):
+        df.to_csv(self._f, index=False, header=self._header)
+        self._header = False
+
+    def close(self):
+        self._f.close()
+
+
+class ParquetSink:
+    def __init__(self, path):
+        import pyarrow  # noqa: F401  (optional dependency, only needed for parquet)
+
+        self.path = path
+        self._writer = None
+
+    def write(self, df):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        if self._writer is None:
+            self._writer = pq.ParquetWriter(self.path, table.schema, compression="snappy")
+        self._writer.write_table(table)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+
+
+class ExcelSink:
+    def __init__(self, path, sheet_name="Crowd_Simulation"):
+        self.path = path
+        self.sheet_name = sheet_name
+        self._frames = []
+        self._rows = 0
+
+    def write(self, df):
+        self._rows += len(df)
+        if self._rows > EXCEL_MAX_ROWS:
+            raise ValueError(
+                f"{self.path}: {self._rows} rows exceed the Excel sheet limit ({EXCEL_MAX_ROWS}); "
+                "use --format parquet or csv, or more shards"
+            )
+        self._frames.append(df)
+
+    def close(self):
+        df = pd.concat(self._frames, ignore_index=True) if self._frames else pd.DataFrame()
+        df.to_excel(self.path, sheet_name=self.sheet_name, index=False)
+        self._frames = []
+
+
+_SINKS = {"csv": CsvSink, "parquet": ParquetSink, "xlsx": ExcelSink}
+
+
+class open_sink:
+    """Context manager: ``with open_sink(path, "parquet") as sink: sink.write(df)``."""
+
+    def __init__(self, path, fmt):
+        if fmt not in _SINKS:
+            raise ValueError(f"Unsupported format: {fmt} (expected one of {sorted(_SINKS)})")
+        self.sink = _SINKS[fmt](path)
+
+    def __enter__(self):
+        return self.sink
+
+    def __exit__(self, *exc):
+        self.sink.close()
+        return False
@@ -0,0 +1,319 @@
+# Online hotspot-risk model, updated one micro-batch at a time from replayed
+# or live crowd rows (README: incremental updates without a full retrain).
+#
+# Each batch is scored before it is learned (progressive validation), so the
+# running and rolling accuracy/macro-F1 are honest out-of-sample numbers. An
+# ADWIN detector watches the per-row error. When it reports that the error
+# rate went up (e.g. a new venue), a fresh candidate model is trained
+# alongside the current one for --window rows and replaces it if it scored
+# better over those rows; otherwise it is dropped. Outside those trials each
+# row costs one predict and one learn on a single Hoeffding tree. The model is
+# pickled to --snapshot-dir every --snapshot-rows rows / --snapshot-seconds,
+# and --resume continues from the newest snapshot.
+#
+# Learning and prediction share a lock that is held for one micro-batch at a
+# time, so a serving thread waits at most one batch (--batch-rows x the
+# per-row cost printed at the end).
+#
+#   python incremental_update.py --data crowd_simulation_shards --limit 200000
+#   python incremental_update.py --data crowd_simulation_shards "../teset dataset/crowd_47000.xlsx"
+#   python incremental_update.py --input - --snapshot-dir snapshots --resume < live_rows.jsonl
+import argparse
+import glob
+import json
+import os
+import pickle
+import sys
+import threading
+import time
+from collections import deque
+
+import numpy as np
+import pandas as pd
+from river import compose, drift, linear_model, metrics, multiclass, optim, preprocessing, tree
+
+from crowd_replay import source_levels
+from traincrowd import CATEGORICAL, NUMERIC, load_frame
+
+FEATURES = CATEGORICAL + NUMERIC + ["Queue_Per_Capacity"]
+SNAPSHOT_PREFIX = "online-risk-"
+
+
+def make_model(kind="tree"):
+    """``tree``: Hoeffding tree (categoricals split natively); ``linear``: one-vs-rest SGD logistic regression."""
+    if kind == "tree":
+        return tree.HoeffdingTreeClassifier(grace_period=200, nominal_attributes=CATEGORICAL)
+    if kind == "linear":
+        numeric = compose.Select(*NUMERIC, "Queue_Per_Capacity") | preprocessing.StandardScaler()
+        categorical = compose.Select(*CATEGORICAL) | preprocessing.OneHotEncoder()
+        return (numeric + categorical) | multiclass.OneVsRestClassifier(linear_model.LogisticRegression(optim.SGD(0.05)))
+    raise ValueError(f"Unknown model kind '{kind}'")
+
+
+def frame_rows(df):
+    """Feature dicts and hotspot levels (None when unlabeled) for a batch, converted column-wise."""
+    batch = pd.DataFrame({c: df[c].astype(str) if c in CATEGORICAL else df[c] for c in CATEGORICAL + NUMERIC})
+    batch["Queue_Per_Capacity"] = batch["Queue_Length"] / batch["Gate_Capacity"].clip(lower=1)
+    labels = None
+    if "Hotspot_Label" in df.columns:
+        if pd.api.types.is_numeric_dtype(df["Hotspot_Label"]):
+            labels = df["Hotspot_Label"].fillna(0).to_numpy(dtype=np.int64)
+        else:
+            labels = source_levels(df["Hotspot_Label"].to_numpy())
+    return batch[FEATURES].to_dict("records"), labels
+
+
+class OnlineRiskModel:
+    def __init__(self, kind="tree", window=1000, snapshot_dir=None, snapshot_rows=50000, snapshot_seconds=300.0,
+                 keep=3):
+        self.kind = kind
+        self.model = make_model(kind)
+        self.accuracy = metrics.Accuracy()
+        self.macro_f1 = metrics.MacroF1()
+        self._recent = deque(maxlen=window)  # hit/miss of the latest rows
+        self._recent_hits = 0
+        self.detector = drift.ADWIN()
+        self.drifts = []
+        self.window = window
+        # Challenger trained after a drift: [model, rows seen, its hits, current model's hits]
+        self.candidate = None
+        self.replacements = 0
+        self.rows = 0
+        self.batches = 0
+        self.update_seconds = 0.0
+        self.predict_seconds = 0.0
+        self.predicted = 0
+        self.snapshot_dir = snapshot_dir
+        self.snapshot_rows = snapshot_rows
+        self.snapshot_seconds = snapshot_seconds
+        self.keep = keep
+        self.snapshots = 0
+        self._last_snapshot = (0, time.monotonic())
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+        self._last_snapshot = (self.rows, time.monotonic())
+
+    def predict(self, df):
+        """Hotspot level for every row of ``df`` with the current model."""
+        rows, _ = frame_rows(df)
+        with self._lock:
+            t0 = time.perf_counter()
+            out = [self.model.predict_one(x) for x in rows]
+            self.predict_seconds += time.perf_counter() - t0
+            self.predicted += len(rows)
+        return [0 if p is None else int(p) for p in out]
+
+    def update(self, df):
+        """Score, then learn, one labeled micro-batch. Returns the batch summary."""
+        rows, labels = frame_rows(df)
+        if labels is None:
+            raise ValueError("Rows need a Hotspot_Label to learn from")
+        correct = 0
+        drifted = False
+        with self._lock:
+            t0 = time.perf_counter()
+            detector = self.detector
+            recent = self._recent
+            predict_seconds = 0.0
+            for x, y in zip(rows, labels.tolist()):
+                model = self.model
+                t1 = time.perf_counter()
+                p = model.predict_one(x)
+                predict_seconds += time.perf_counter() - t1
+                if p is None:
+                    p = 0  # nothing learned yet
+                hit = p == y
+                correct += hit
+                self.accuracy.update(y, p)
+                self.macro_f1.update(y, p)
+                if len(recent) == recent.maxlen:
+                    self._recent_hits -= recent[0]
+                recent.append(hit)
+                self._recent_hits += hit
+                before = detector.estimation
+                detector.update(0 if hit else 1)
+                # ADWIN also fires when the error drops; only a rise starts a challenger
+                if detector.drift_detected and detector.estimation > before:
+                    drifted = True
+                    self.drifts.append({"row": self.rows, "rolling_accuracy": round(self.rolling_accuracy(), 4),
+                                        "error_rate": round(detector.estimation, 4)})
+                    if self.candidate is None:
+                        self.candidate = [make_model(self.kind), 0, 0, 0]
+                model.learn_one(x, y)
+                if self.candidate is not None:
+                    self._trial(x, y, hit)
+                self.rows += 1
+            elapsed = time.perf_counter() - t0
+            self.update_seconds += elapsed
+            self.predict_seconds += predict_seconds
+            self.predicted += len(rows)
+            self.batches += 1
+        snapshot = self.maybe_snapshot()
+        return {"rows": len(rows), "batch_accuracy": correct / len(rows) if rows else None,
+                "us_per_row": elapsed / len(rows) * 1e6 if rows else None, "drift": drifted, "snapshot": snapshot}
+
+    def _trial(self, x, y, current_hit):
+        candidate = self.candidate
+        challenger = candidate[0]
+        candidate[1] += 1
+        candidate[2] += challenger.predict_one(x) == y
+        candidate[3] += current_hit
+        challenger.learn_one(x, y)
+        if candidate[1] >= self.window:
+            if candidate[2] > candidate[3]:
+                self.model = challenger
+                self.replacements += 1
+                self.drifts[-1]["replaced_at"] = self.rows
+            self.candidate = None
+
+    def rolling_accuracy(self):
+        return self._recent_hits / len(self._recent) if self._recent else 0.0
+
+    def maybe_snapshot(self):
+        if self.snapshot_dir is None:
+            return None
+        rows, at = self._last_snapshot
+        if self.rows - rows < self.snapshot_rows and time.monotonic() - at < self.snapshot_seconds:
+            return None
+        return self.snapshot()
+
+    def snapshot(self):
+        """Pickle the model and its metrics to snapshot_dir (atomic rename); keeps the newest ``keep``."""
+        os.makedirs(self.snapshot_dir, exist_ok=True)
+        path = os.path.join(self.snapshot_dir, f"{SNAPSHOT_PREFIX}{self.rows:012d}.pkl")
+        with self._lock:
+            data = pickle.dumps(self, protocol=pickle.HIGHEST_PROTOCOL)
+        with open(path + ".tmp", "wb") as f:
+            f.write(data)
+        os.replace(path + ".tmp", path)
+        self.snapshots += 1
+        self._last_snapshot = (self.rows, time.monotonic())
+        for old in sorted(glob.glob(os.path.join(self.snapshot_dir, SNAPSHOT_PREFIX + "*.pkl")))[:-self.keep]:
+            os.remove(old)
+        return path
+
+    @classmethod
+    def latest(cls, snapshot_dir):
+        """The newest snapshot in ``snapshot_dir``, or None."""
+        paths = sorted(glob.glob(os.path.join(snapshot_dir, SNAPSHOT_PREFIX + "*.pkl")))
+        if not paths:
+            return None
+        with open(paths[-1], "rb") as f:
+            return pickle.load(f)
+
+    def stats(self):
+        return {
+            "model": self.kind,
+            "rows": self.rows,
+            "batches": self.batches,
+            "accuracy": round(self.accuracy.get(), 4),
+            "macro_f1": round(self.macro_f1.get(), 4),
+            "rolling_accuracy": round(self.rolling_accuracy(), 4),
+            "drifts": self.drifts[-10:],
+            "drift_count": len(self.drifts),
+            "replacements": self.replacements,
+            "update_us_per_row": round(self.update_seconds / self.rows * 1e6, 1) if self.rows else None,
+            "predict_us_per_row": round(self.predict_seconds / self.predicted * 1e6, 1) if self.predicted else None,
+            "snapshots": self.snapshots,
+        }
+
+
+def file_batches(paths, batch_rows, limit=None):
+    """Micro-batches of each file in time order, one file after another (e.g. one venue, then the next)."""
+    sent = 0
+    for path in paths:
+        df = load_frame(path)
+        df = df.assign(_t=pd.to_datetime(df["Time"].astype(str))).sort_values("_t", kind="stable", ignore_index=True)
+        print(f"Replaying {len(df):,} rows from {path}")
+        for i in range(0, len(df), batch_rows):
+            if limit is not None and sent >= limit:
+                return
+            batch = df.iloc[i:i + min(batch_rows, limit - sent if limit is not None else batch_rows)]
+            sent += len(batch)
+            yield batch
+
+
+def stdin_batches(batch_rows, limit=None):
+    """Micro-batches of JSON-line rows from stdin (live feed)."""
+    buffer, sent = [], 0
+    for line in sys.stdin:
+        line = line.strip()
+        if not line:
+            continue
+        buffer.append(json.loads(line))
+        if len(buffer) == batch_rows:
+            yield pd.DataFrame(buffer)
+            sent += len(buffer)
+            buffer = []
+            if limit is not None and sent >= limit:
+                return
+    if buffer:
+        yield pd.DataFrame(buffer)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Update the hotspot-risk model online from streaming crowd rows.")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--data", nargs="+", help="Workbooks, CSV/Parquet files or shard directories, replayed in order")
+    source.add_argument("--input", choices=["-"], help="Read JSON-line rows from stdin")
+    parser.add_argument("--model", choices=["tree", "linear"], default="tree")
+    parser.add_argument("--batch-rows", type=int, default=256, help="Rows learned per micro-batch")
+    parser.add_argument("--limit", type=int, default=None, help="Stop after N rows")
+    parser.add_argument("--window", type=int, default=1000, help="Rows in the rolling accuracy")
+    parser.add_argument("--snapshot-dir", default=None, help="Write periodic model snapshots here")
+    parser.add_argument("--snapshot-rows", type=int, default=50000)
+    parser.add_argument("--snapshot-seconds", type=float, default=300.0)
+    parser.add_argument("--resume", action="store_true", help="Continue from the newest snapshot in --snapshot-dir")
+    parser.add_argument("--report-every", type=int, default=50000, help="Print progress every N rows")
+    args = parser.parse_args()
+
+    learner = None
+    if args.resume:
+        if not args.snapshot_dir:
+            parser.error("--resume needs --snapshot-dir")
+        learner = OnlineRiskModel.latest(args.snapshot_dir)
+        if learner is not None:
+            print(f"✅ Resumed from snapshot at row {learner.rows:,}")
+    if learner is None:
+        learner = OnlineRiskModel(args.model, args.window, args.snapshot_dir, args.snapshot_rows,
+                                  args.snapshot_seconds)
+    learner.snapshot_dir = args.snapshot_dir
+
+    batches = file_batches(args.data, args.batch_rows, args.limit) if args.data else stdin_batches(args.batch_rows,
+                                                                                                   args.limit)
+    batch_us = []
+    next_report = learner.rows + args.report_every
+    t0 = time.perf_counter()
+    for batch in batches:
+        summary = learner.update(batch)
+        batch_us.append(summary["us_per_row"])
+        if summary["drift"]:
+            print(f"⚠️ Drift detected at row {learner.drifts[-1]['row']:,} "
+                  f"(rolling accuracy {learner.drifts[-1]['rolling_accuracy']:.3f})")
+        if learner.rows >= next_report:
+            s = learner.stats()
+            print(f"{s['rows']:>10,} rows  accuracy {s['accuracy']:.4f}  rolling {s['rolling_accuracy']:.4f}  "
+                  f"{s['update_us_per_row']:.1f} us/row")
+            next_report += args.report_every
+    elapsed = time.perf_counter() - t0
+    if args.snapshot_dir:
+        learner.snapshot()
+
+    report = learner.stats()
+    report["wall_s"] = round(elapsed, 2)
+    if batch_us:
+        report["batch_us_per_row"] = {"p50": round(float(np.percentile(batch_us, 50)), 1),
+                                      "p99": round(float(np.percentile(batch_us, 99)), 1)}
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
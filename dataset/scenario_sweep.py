@@ -0,0 +1,293 @@
+# What-if sweep over crowd_simulator scenarios.
+#
+# A parameter grid (scenario x closed gates x gate capacity x arrival surge x
+# weather x seed) is expanded into cells and run across a process pool. The
+# venue layout is built once and copied into one shared-memory block; workers
+# map it as read-only arrays instead of receiving a pickled copy per task, and
+# keep a flow field per set of open gates. Results stream back as they finish
+# and are flushed every --flush-rows rows as a part file (part-*.parquet) in
+# --out, so the directory is the columnar summary table. Each row carries its
+# cell id (a hash of the cell's parameters and the layout); a rerun reads the
+# ids already written and only runs the rest, so an interrupted sweep resumes
+# where it stopped.
+#
+#   python scenario_sweep.py --out sweep_results
+#   python scenario_sweep.py --grid my_grid.json --out sweep_results --workers 8
+#   python scenario_sweep.py --out sweep_results --top 10   (resume / report only)
+import argparse
+import glob
+import hashlib
+import itertools
+import json
+import os
+import signal
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from crowd_simulator import SCENARIOS, VenueLayout, default_layout, flow_field, hotspots, simulate
+from crowd_sinks import open_sink
+
+# Movement slowdown per Weather value in the datasets
+WEATHER_MOVE_PROB = {"Clear": 1.0, "Rain": 0.8, "Storm": 0.6}
+
+DEFAULT_GRID = {
+    "scenario": ["entry_rush", "emergency_evacuation"],
+    "closed_gates": [[], [8], [7, 8], [0, 1, 2]],
+    "gate_capacity_scale": [1.0, 1.5],
+    "surge": [1.0, 1.5],
+    "weather": ["Clear", "Rain", "Storm"],
+    "seed": [0],
+}
+base_agents = 2000
+
+_LAYOUT_FIELDS = ("walkable", "gate_cells", "gate_capacity", "seats", "plaza")
+
+
+def expand_grid(grid, agents=base_agents):
+    """One dict per combination of the grid's values, each with its derived settings."""
+    keys = list(DEFAULT_GRID)
+    values = [grid.get(k, DEFAULT_GRID[k]) for k in keys]
+    cells = []
+    for combo in itertools.product(*values):
+        cell = dict(zip(keys, combo))
+        if cell["scenario"] not in SCENARIOS:
+            raise ValueError(f"Unknown scenario '{cell['scenario']}'")
+        if cell["weather"] not in WEATHER_MOVE_PROB:
+            raise ValueError(f"Unknown weather '{cell['weather']}'")
+        cell["closed_gates"] = sorted(cell["closed_gates"])
+        cell["agents"] = int(round(agents * cell["surge"]))
+        cells.append(cell)
+    return cells
+
+
+def layout_signature(layout):
+    h = hashlib.sha1()
+    for name in _LAYOUT_FIELDS:
+        h.update(np.ascontiguousarray(getattr(layout, name)).tobytes())
+    return h.hexdigest()[:12]
+
+
+def cell_id(cell, signature):
+    return hashlib.sha1(json.dumps([cell, signature], sort_keys=True).encode()).hexdigest()[:16]
+
+
+# --- Shared layout ---
+
+def share_layout(layout):
+    """Copy the layout arrays into one shared-memory block; returns (block, spec for attach_layout)."""
+    arrays = [np.ascontiguousarray(getattr(layout, name)) for name in _LAYOUT_FIELDS]
+    spec, offset = [], 0
+    for name, a in zip(_LAYOUT_FIELDS, arrays):
+        offset = (offset + 7) // 8 * 8
+        spec.append((name, a.dtype.str, a.shape, offset))
+        offset += a.nbytes
+    block = shared_memory.SharedMemory(create=True, size=max(offset, 1))
+    for (_, _, _, start), a in zip(spec, arrays):
+        np.ndarray(a.shape, a.dtype, buffer=block.buf, offset=start)[...] = a
+    return block, spec
+
+
+def attach_layout(name, spec):
+    """(block, VenueLayout) viewing the shared arrays, marked read-only."""
+    try:
+        block = shared_memory.SharedMemory(name=name, track=False)  # Python 3.13+
+    except TypeError:
+        # Pool workers share the parent's resource tracker, which dedupes the name;
+        # the parent's unlink() clears it
+        block = shared_memory.SharedMemory(name=name)
+    views = {}
+    for field, dtype, shape, offset in spec:
+        a = np.ndarray(shape, np.dtype(dtype), buffer=block.buf, offset=offset)
+        a.flags.writeable = False
+        views[field] = a
+    return block, VenueLayout(**views)
+
+
+_worker = {}
+
+
+def _init_worker(name, spec):
+    # Ctrl-C is handled by the parent, which lets in-flight cells finish and keeps their rows
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    _worker["block"], _worker["layout"] = attach_layout(name, spec)
+    _worker["fields"] = {}
+
+
+def run_cell(cell, layout=None, fields=None):
+    """Simulate one grid cell; returns a flat summary row."""
+    layout = layout if layout is not None else _worker["layout"]
+    fields = fields if fields is not None else _worker["fields"]
+    spec = SCENARIOS[cell["scenario"]]
+    n_gates = len(layout.gate_cells)
+    open_gates = np.ones(n_gates, dtype=bool)
+    open_gates[list(spec.get("closed_gates", ())) + list(cell["closed_gates"])] = False
+    key = open_gates.tobytes()
+    if key not in fields:
+        fields[key] = flow_field(layout, open_gates)
+    field = fields[key]
+    scale = spec.get("gate_capacity_scale", 1.0) * cell["gate_capacity_scale"]
+    capacity = np.maximum(1, np.round(layout.gate_capacity * scale)).astype(np.int64)
+
+    result = simulate(layout, cell["agents"], spec["spawn"], spec["release_steps"], open_gates, capacity,
+                      WEATHER_MOVE_PROB[cell["weather"]], seed=cell["seed"], field=field)
+    top = hotspots(layout, result, field, top=1)
+    return {
+        "scenario": cell["scenario"],
+        "closed_gates": ",".join(map(str, cell["closed_gates"])),
+        "open_gate_count": int(open_gates.sum()),
+        "gate_capacity_scale": float(cell["gate_capacity_scale"]),
+        "surge": float(cell["surge"]),
+        "weather": cell["weather"],
+        "seed": int(cell["seed"]),
+        "agents": result["agents"],
+        "evacuated": result["evacuated"],
+        "evacuated_frac": result["evacuated"] / result["agents"] if result["agents"] else 1.0,
+        "steps": result["steps"],
+        "mean_exit_step": result["mean_exit_step"],
+        "last_exit_step": result["last_exit_step"],
+        "max_peak": top[0]["peak"] if top else 0,
+        "peak_cell": str(top[0]["cell"]) if top else None,
+        "peak_gate": top[0]["nearest_gate"] if top else None,
+        "elapsed_s": round(result["elapsed_s"], 4),
+    }
+
+
+# --- Results table ---
+
+def part_files(out_dir):
+    """Finished part files in ``out_dir`` (a half-written ``.tmp`` is ignored)."""
+    return sorted(glob.glob(os.path.join(out_dir, "part-*.parquet")) + glob.glob(os.path.join(out_dir, "part-*.csv")))
+
+
+def _read_part(path, columns=None):
+    return pd.read_parquet(path, columns=columns) if path.endswith(".parquet") else pd.read_csv(path, usecols=columns)
+
+
+def completed_ids(out_dir):
+    """Cell ids already written to part files in ``out_dir``."""
+    ids = set()
+    for path in part_files(out_dir):
+        ids.update(_read_part(path, ["cell_id"])["cell_id"])
+    return ids
+
+
+def load_results(out_dir):
+    frames = [_read_part(p) for p in part_files(out_dir)]
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+
+class PartWriter:
+    """Buffers result rows and writes each batch as the next part file, atomically."""
+
+    def __init__(self, out_dir, fmt="parquet", flush_rows=50):
+        self.out_dir = out_dir
+        self.fmt = fmt
+        self.flush_rows = flush_rows
+        self.rows = []
+        os.makedirs(out_dir, exist_ok=True)
+        existing = [os.path.basename(p) for p in part_files(out_dir)]
+        self.next_part = max((int(p[5:10]) for p in existing), default=-1) + 1
+
+    def add(self, row):
+        self.rows.append(row)
+        if len(self.rows) >= self.flush_rows:
+            self.flush()
+
+    def flush(self):
+        if not self.rows:
+            return
+        path = os.path.join(self.out_dir, f"part-{self.next_part:05d}.{self.fmt}")
+        with open_sink(path + ".tmp", self.fmt) as sink:
+            sink.write(pd.DataFrame(self.rows))
+        os.replace(path + ".tmp", path)  # a part file is either complete or absent
+        self.next_part += 1
+        self.rows = []
+
+
+def run_sweep(cells, out_dir, workers=None, fmt="parquet", flush_rows=50, layout=None):
+    """Run every cell not already in ``out_dir``; returns (ran, skipped, seconds)."""
+    layout = layout or default_layout()
+    signature = layout_signature(layout)
+    done = completed_ids(out_dir)
+    todo = [(cell_id(c, signature), c) for c in cells]
+    todo = [(cid, c) for cid, c in todo if cid not in done]
+    skipped = len(cells) - len(todo)
+    writer = PartWriter(out_dir, fmt, flush_rows)
+    workers = workers or os.cpu_count() or 1
+    t0 = time.perf_counter()
+    if not todo:
+        return 0, skipped, 0.0
+
+    block, spec = share_layout(layout)
+    pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(block.name, spec))
+    ran = 0
+    pending = {}
+    try:
+        # Keep a bounded number of cells in flight, so an interrupt loses little work
+        queue = iter(todo)
+        for cid, cell in itertools.islice(queue, workers * 4):
+            pending[pool.submit(run_cell, cell)] = cid
+        while pending:
+            finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                cid = pending.pop(future)
+                writer.add({"cell_id": cid, **future.result()})
+                ran += 1
+                for next_cid, cell in itertools.islice(queue, 1):
+                    pending[pool.submit(run_cell, cell)] = next_cid
+            if ran % max(1, len(todo) // 10) < len(finished):
+                print(f"  {ran}/{len(todo)} cells ({time.perf_counter() - t0:.1f}s)")
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+        # After an interrupt, keep the cells that were already running when it came
+        for future, cid in pending.items():
+            if future.done() and not future.cancelled() and future.exception() is None:
+                writer.add({"cell_id": cid, **future.result()})
+                ran += 1
+        writer.flush()
+        block.close()
+        block.unlink()
+    return ran, skipped, time.perf_counter() - t0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a what-if grid of crowd scenarios across a process pool.")
+    parser.add_argument("--grid", default=None, help="JSON file of parameter lists (keys as in DEFAULT_GRID)")
+    parser.add_argument("--agents", type=int, default=base_agents, help="Agents before the surge multiplier")
+    parser.add_argument("--out", default="sweep_results", help="Directory of result part files")
+    parser.add_argument("--format", choices=["parquet", "csv"], default="parquet")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--flush-rows", type=int, default=50, help="Results per part file")
+    parser.add_argument("--top", type=int, default=5, help="Print the N cells with the lowest evacuated share")
+    args = parser.parse_args()
+
+    grid = DEFAULT_GRID
+    if args.grid:
+        with open(args.grid, encoding="utf-8") as f:
+            grid = json.load(f)
+    cells = expand_grid(grid, args.agents)
+    print(f"{len(cells)} cells in the grid")
+    try:
+        ran, skipped, seconds = run_sweep(cells, args.out, args.workers, args.format, args.flush_rows)
+    except KeyboardInterrupt:
+        print(f"⚠️ Interrupted; finished cells are saved in {args.out}, rerun to resume")
+        return
+    if ran:
+        print(f"✅ Ran {ran} cells in {seconds:.1f}s ({ran / seconds:.1f} cells/s), {skipped} already done")
+    else:
+        print(f"✅ All {skipped} cells already done")
+
+    results = load_results(args.out)
+    if args.top and len(results):
+        worst = results.sort_values(["evacuated_frac", "last_exit_step"], ascending=[True, False]).head(args.top)
+        cols = ["scenario", "closed_gates", "gate_capacity_scale", "surge", "weather", "evacuated", "agents",
+                "last_exit_step", "max_peak", "peak_gate"]
+        print(worst[cols].to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
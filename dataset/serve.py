@@ -0,0 +1,446 @@
+# Low-latency CPU inference for best_model.pth (README: /infer_stream, 200ms target).
+#
+# The checkpoint holds a two-head MLP: a shared trunk over `input_dim` features,
+# a classifier over `n_gates` gate classes and a single regression output. The
+# module is rebuilt from the checkpoint's dimensions, loaded once, put in eval
+# mode with a fixed intra-op thread count and warmed up at every power-of-two
+# batch size the batcher can produce, so no request pays for first-call setup.
+#
+# /infer_stream requests are collected into micro-batches: the batcher takes
+# everything already queued, and only waits (at most --max-wait-ms after the
+# oldest request) while the batch is smaller than the last one and requests
+# are arriving faster than that, so a lone request is never held back and a
+# burst is answered in a few model calls.
+#
+# --export writes a frozen TorchScript graph with the metadata embedded; point
+# --traced (or INFER_TRACED) at it to start without rebuilding from the state dict.
+#
+#   python serve.py --export best_model.ts
+#   python serve.py --benchmark --traced best_model.ts
+#   python serve.py --port 8000 --traced best_model.ts
+#   INFER_THREADS=2 uvicorn serve:app --port 8000
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+import warnings
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import List
+
+import numpy as np
+import torch
+from torch import nn
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# --- Serving parameters (environment, so `uvicorn serve:app` can be tuned) ---
+MODEL_PATH = os.environ.get("INFER_MODEL", os.path.join(HERE, "best_model.pth"))
+TRACED_PATH = os.environ.get("INFER_TRACED") or None
+INFER_THREADS = int(os.environ.get("INFER_THREADS", min(4, os.cpu_count() or 1)))
+MAX_BATCH = int(os.environ.get("INFER_MAX_BATCH", 64))
+MAX_WAIT_MS = float(os.environ.get("INFER_MAX_WAIT_MS", 2.0))
+# Optional comma-separated names for the class indices, in training order
+GATE_LABELS = [s.strip() for s in os.environ.get("INFER_GATE_LABELS", "").split(",") if s.strip()] or None
+
+
+class CrowdNet(nn.Module):
+    """Layout of the saved state dict: shared.{0,3}, class_head.1, reg_head.1."""
+
+    def __init__(self, input_dim, n_gates, hidden=(256, 128), dropout=0.2):
+        super().__init__()
+        self.shared = nn.Sequential(
+            nn.Linear(input_dim, hidden[0]), nn.ReLU(), nn.Dropout(dropout),
+            nn.Linear(hidden[0], hidden[1]), nn.ReLU(),
+        )
+        self.class_head = nn.Sequential(nn.Dropout(dropout), nn.Linear(hidden[1], n_gates))
+        self.reg_head = nn.Sequential(nn.Dropout(dropout), nn.Linear(hidden[1], 1))
+
+    def forward(self, x):
+        h = self.shared(x)
+        # Softmax lives in the graph so a traced export returns the same outputs
+        return torch.softmax(self.class_head(h), dim=1), self.reg_head(h).squeeze(1)
+
+
+def set_threads(threads):
+    """Intra-op threads for the matmuls; one inter-op thread (the graph is a straight line)."""
+    torch.set_num_threads(max(1, threads))
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        pass  # already set once in this process
+
+
+def load_model(path=MODEL_PATH, traced=None):
+    """(model, meta) from a TorchScript export when ``traced`` exists, else from the checkpoint."""
+    if traced and os.path.exists(traced):
+        extra = {"meta.json": ""}
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", FutureWarning)  # TorchScript is deprecated but still the fastest load here
+            model = torch.jit.load(traced, map_location="cpu", _extra_files=extra)
+        meta = json.loads(extra["meta.json"])
+        meta["source"] = traced
+        return model.eval(), meta
+
+    ckpt = torch.load(path, map_location="cpu", weights_only=True)
+    meta = {
+        "input_dim": int(ckpt["input_dim"]),
+        "n_gates": int(ckpt["n_gates"]),
+        "epoch": ckpt.get("epoch"),
+        "val_acc": ckpt.get("val_acc"),
+        "val_mse": ckpt.get("val_mse"),
+    }
+    model = CrowdNet(meta["input_dim"], meta["n_gates"])
+    model.load_state_dict(ckpt["model_state"])
+    meta["source"] = path
+    return model.eval(), meta
+
+
+def export_traced(model, meta, path):
+    """Trace, freeze and save ``model`` with ``meta`` embedded; returns the saved path."""
+    example = torch.zeros(2, meta["input_dim"])
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", FutureWarning)
+        with torch.no_grad():
+            traced = torch.jit.freeze(torch.jit.trace(model.eval(), example))
+        traced = torch.jit.optimize_for_inference(traced)
+        saved = {k: v for k, v in meta.items() if k != "source"}
+        torch.jit.save(traced, path, _extra_files={"meta.json": json.dumps(saved)})
+    return path
+
+
+def batch_sizes(max_batch):
+    sizes, n = [], 1
+    while n < max_batch:
+        sizes.append(n)
+        n *= 2
+    return sizes + [max_batch]
+
+
+def warm_up(model, input_dim, max_batch=MAX_BATCH, rounds=3):
+    """Run every power-of-two batch size up to ``max_batch`` so allocations and kernels are primed."""
+    with torch.inference_mode():
+        for n in batch_sizes(max_batch):
+            x = torch.zeros(n, input_dim)
+            for _ in range(rounds):
+                model(x)
+
+
+def predict(model, x):
+    """Class probabilities and regression output for a float32 (n, input_dim) array."""
+    with torch.inference_mode():
+        probs, score = model(torch.from_numpy(x))
+    return probs.numpy(), score.numpy()
+
+
+def _results(probs, score, labels=None):
+    best = probs.argmax(axis=1)
+    out = []
+    for i, k in enumerate(best.tolist()):
+        row = {"gate_index": k, "confidence": round(float(probs[i, k]), 6), "score": round(float(score[i]), 6)}
+        if labels is not None and k < len(labels):
+            row["gate"] = labels[k]
+        out.append(row)
+    return out
+
+
+def _percentiles(values):
+    if not values:
+        return {"count": 0, "p50_ms": None, "p99_ms": None, "max_ms": None}
+    ms = np.asarray(values) * 1000
+    return {"count": len(ms), "p50_ms": round(float(np.percentile(ms, 50)), 3),
+            "p99_ms": round(float(np.percentile(ms, 99)), 3), "max_ms": round(float(ms.max()), 3)}
+
+
+class MicroBatcher:
+    """Collects concurrent single-row requests into model calls on one inference thread.
+
+    A batch starts with the oldest queued request and takes everything else
+    already queued, up to ``max_batch``. It then waits for more only while it
+    is smaller than the previous batch, the recent gap between arrivals is
+    shorter than ``max_wait_ms`` and the oldest request's deadline has not
+    passed; otherwise it runs immediately. Batch size therefore follows the
+    load: a lone caller is never held back, and a burst that outgrows one
+    call is gathered into full batches.
+    """
+
+    def __init__(self, model, input_dim, max_batch=MAX_BATCH, max_wait_ms=MAX_WAIT_MS):
+        self.model = model
+        self.input_dim = input_dim
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self._queue = None
+        self._task = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="infer")
+        self._last_arrival = None
+        self._gap = None  # moving average of seconds between arrivals
+        self._last_size = 1
+        self._latencies = deque(maxlen=4096)
+        self._sizes = {}
+        self.requests = 0
+        self.batches = 0
+
+    async def start(self):
+        self._queue = asyncio.Queue()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._executor.shutdown(wait=True)
+
+    async def submit(self, features):
+        """Result dict for one row of ``input_dim`` features."""
+        row = np.asarray(features, dtype=np.float32)
+        if row.shape != (self.input_dim,):
+            raise ValueError(f"expected {self.input_dim} features, got {row.size}")
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        if self._last_arrival is not None:
+            gap = now - self._last_arrival
+            self._gap = gap if self._gap is None else 0.8 * self._gap + 0.2 * gap
+        self._last_arrival = now
+        future = loop.create_future()
+        self._queue.put_nowait((row, future, now))
+        return await future
+
+    def run_batch(self, x):
+        """Run a ready (n, input_dim) array on the inference thread; for callers that batch themselves."""
+        return asyncio.get_running_loop().run_in_executor(self._executor, predict, self.model, x)
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        queue = self._queue
+        while True:
+            batch = [await queue.get()]
+            deadline = batch[0][2] + self.max_wait
+            while len(batch) < self.max_batch:
+                if not queue.empty():
+                    batch.append(queue.get_nowait())
+                    continue
+                # Worth waiting only if the last batch was bigger and arrivals are frequent enough
+                if len(batch) >= self._last_size or self._gap is None or self._gap >= self.max_wait \
+                        or loop.time() >= deadline:
+                    break
+                try:
+                    async with asyncio.timeout_at(deadline):
+                        batch.append(await queue.get())
+                except TimeoutError:
+                    break
+            # Callers that went away (client disconnect) are not computed
+            batch = [item for item in batch if not item[1].done()]
+            if not batch:
+                continue
+            x = np.stack([item[0] for item in batch])
+            try:
+                probs, score = await self.run_batch(x)
+            except Exception as e:
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            results = _results(probs, score, GATE_LABELS)
+            done = loop.time()
+            for (_, future, queued), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+                self._latencies.append(done - queued)
+            self._last_size = len(batch)
+            self.requests += len(batch)
+            self.batches += 1
+            self._sizes[len(batch)] = self._sizes.get(len(batch), 0) + 1
+
+    def stats(self):
+        return {
+            "requests": self.requests,
+            "batches": self.batches,
+            "mean_batch": round(self.requests / self.batches, 2) if self.batches else None,
+            "max_batch_seen": max(self._sizes, default=0),
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "latency": _percentiles(list(self._latencies)),
+            "max_batch": self.max_batch,
+            "max_wait_ms": self.max_wait * 1000,
+        }
+
+
+def create_app(model_path=MODEL_PATH, traced=TRACED_PATH, threads=INFER_THREADS,
+               max_batch=MAX_BATCH, max_wait_ms=MAX_WAIT_MS):
+    from fastapi import FastAPI, HTTPException
+    from pydantic import BaseModel
+
+    class InferRow(BaseModel):
+        features: List[float]
+
+    class InferRows(BaseModel):
+        rows: List[List[float]]
+
+    state = {}
+
+    @asynccontextmanager
+    async def lifespan(app):
+        t0 = time.perf_counter()
+        set_threads(threads)
+        model, meta = load_model(model_path, traced)
+        warm_up(model, meta["input_dim"], max_batch)
+        batcher = MicroBatcher(model, meta["input_dim"], max_batch, max_wait_ms)
+        await batcher.start()
+        state.update(model=model, meta=meta, batcher=batcher, startup_s=round(time.perf_counter() - t0, 3))
+        print(f"✅ Model ready from {meta['source']} in {state['startup_s']}s "
+              f"({threads} threads, max batch {max_batch}, max wait {max_wait_ms}ms)")
+        yield
+        await batcher.stop()
+
+    app = FastAPI(title="Crowd model inference", lifespan=lifespan)
+
+    @app.post("/infer_stream")
+    async def infer_stream(body: InferRow):
+        try:
+            return await state["batcher"].submit(body.features)
+        except ValueError as e:
+            raise HTTPException(status_code=422, detail=str(e))
+
+    @app.post("/infer")
+    async def infer(body: InferRows):
+        """A caller-built batch: run directly in chunks of max_batch, skipping the collection wait."""
+        x = np.asarray(body.rows, dtype=np.float32)
+        if x.ndim != 2 or x.shape[1] != state["meta"]["input_dim"]:
+            raise HTTPException(status_code=422, detail=f"expected rows of {state['meta']['input_dim']} features")
+        results = []
+        for i in range(0, len(x), max_batch):
+            probs, score = await state["batcher"].run_batch(x[i:i + max_batch])
+            results.extend(_results(probs, score, GATE_LABELS))
+        return {"results": results}
+
+    @app.get("/stats")
+    async def stats():
+        return {**state["batcher"].stats(), "model": state["meta"], "threads": torch.get_num_threads(),
+                "startup_s": state["startup_s"]}
+
+    return app
+
+
+def __getattr__(name):
+    # `uvicorn serve:app` builds the app on first access, so --export/--benchmark never import fastapi
+    if name == "app":
+        globals()["app"] = create_app()
+        return globals()["app"]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def _time_calls(model, x, seconds=0.5, min_calls=20):
+    latencies = []
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end or len(latencies) < min_calls:
+        t0 = time.perf_counter()
+        predict(model, x)
+        latencies.append(time.perf_counter() - t0)
+    return latencies
+
+
+async def _drive_batcher(batcher, input_dim, clients, seconds):
+    """``clients`` callers each sending one row at a time for ``seconds``; per-request latencies."""
+    rng = np.random.default_rng(0)
+    rows = rng.normal(size=(256, input_dim)).astype(np.float32)
+    latencies = []
+    end = time.perf_counter() + seconds
+
+    async def client(i):
+        n = i
+        while time.perf_counter() < end:
+            t0 = time.perf_counter()
+            await batcher.submit(rows[n % len(rows)])
+            latencies.append(time.perf_counter() - t0)
+            n += clients
+
+    await asyncio.gather(*(client(i) for i in range(clients)))
+    return latencies
+
+
+def benchmark(args):
+    set_threads(args.threads)
+    t0 = time.perf_counter()
+    model, meta = load_model(args.model)
+    eager_load = time.perf_counter() - t0
+    models = {"eager": model}
+    print(f"Model: {meta['input_dim']} features -> {meta['n_gates']} classes + 1 output "
+          f"(epoch {meta['epoch']}, val_acc {meta['val_acc']:.3f}); {torch.get_num_threads()} intra-op threads")
+    print(f"Load from checkpoint: {eager_load * 1000:.1f} ms")
+
+    traced = args.traced or os.path.join(tempfile.mkdtemp(), "best_model.ts")
+    if not os.path.exists(traced):
+        export_traced(model, meta, traced)
+    t0 = time.perf_counter()
+    models["traced"], _ = load_model(args.model, traced)
+    print(f"Load from traced graph: {(time.perf_counter() - t0) * 1000:.1f} ms")
+
+    rng = np.random.default_rng(0)
+    probe = rng.normal(size=(8, meta["input_dim"])).astype(np.float32)
+    same = np.allclose(predict(models["eager"], probe)[0], predict(models["traced"], probe)[0], atol=1e-5)
+    print(f"{'✅' if same else '⚠️'} Traced outputs {'match' if same else 'differ from'} the eager model")
+
+    for m in models.values():
+        warm_up(m, meta["input_dim"], 256)
+
+    print(f"\n{'batch':>5}  {'graph':<6} {'p50 ms':>8} {'p99 ms':>8} {'rows/s':>12}")
+    for n in batch_sizes(256):
+        x = rng.normal(size=(n, meta["input_dim"])).astype(np.float32)
+        for name, m in models.items():
+            lat = _time_calls(m, x, args.seconds)
+            p = _percentiles(lat)
+            print(f"{n:>5}  {name:<6} {p['p50_ms']:>8.3f} {p['p99_ms']:>8.3f} {n * len(lat) / sum(lat):>12,.0f}")
+
+    print(f"\n/infer_stream path (micro-batcher, max batch {args.max_batch}, max wait {args.max_wait_ms}ms)")
+    print(f"{'clients':>7} {'p50 ms':>8} {'p99 ms':>8} {'req/s':>10} {'mean batch':>11}")
+    for clients in (1, 8, 64, 256):
+        async def run():
+            batcher = MicroBatcher(models["traced"], meta["input_dim"], args.max_batch, args.max_wait_ms)
+            await batcher.start()
+            try:
+                lat = await _drive_batcher(batcher, meta["input_dim"], clients, args.seconds * 2)
+                return lat, batcher.stats()
+            finally:
+                await batcher.stop()
+
+        lat, stats = asyncio.run(run())
+        p = _percentiles(lat)
+        print(f"{clients:>7} {p['p50_ms']:>8.3f} {p['p99_ms']:>8.3f} {len(lat) / (args.seconds * 2):>10,.0f} "
+              f"{stats['mean_batch']:>11}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve best_model.pth on CPU with micro-batching.")
+    parser.add_argument("--model", default=MODEL_PATH, help="Checkpoint (.pth)")
+    parser.add_argument("--traced", default=TRACED_PATH, help="TorchScript export to load instead of the checkpoint")
+    parser.add_argument("--threads", type=int, default=INFER_THREADS, help="Intra-op threads")
+    parser.add_argument("--max-batch", type=int, default=MAX_BATCH, help="Most rows per model call")
+    parser.add_argument("--max-wait-ms", type=float, default=MAX_WAIT_MS,
+                        help="Longest a request waits for others to join its batch")
+    parser.add_argument("--export", metavar="PATH", help="Write a frozen TorchScript graph and exit")
+    parser.add_argument("--benchmark", action="store_true", help="Report latency/throughput at batch sizes 1-256")
+    parser.add_argument("--seconds", type=float, default=0.5, help="Benchmark time per measurement")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    args = parser.parse_args()
+
+    if args.export:
+        model, meta = load_model(args.model)
+        export_traced(model, meta, args.export)
+        print(f"✅ Exported {args.export} ({meta['input_dim']} features, {meta['n_gates']} classes)")
+    elif args.benchmark:
+        benchmark(args)
+    else:
+        import uvicorn
+
+        uvicorn.run(create_app(args.model, args.traced, args.threads, args.max_batch, args.max_wait_ms),
+                    host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,329 @@
+# LightGBM training for the crowd dataset (README: arrival and risk models,
+# early stopping after 100 rounds, split by Event_ID to avoid leakage).
+#
+# Featurization is columnar: categoricals become integer codes that LightGBM
+# splits on natively, and the 1/5/15-minute lag features are per zone window
+# sums read off a cumulative (zone x minute) grid, so no per-row or per-group
+# Python runs. Each model's featurized training set is saved as a LightGBM
+# binary (bins already computed) next to its validation arrays, keyed by the
+# source files and feature settings; a rerun on the same data skips reading
+# and featurizing the workbook entirely.
+#
+#   python traincrowd.py --data crowd_simulation_shards
+#   python traincrowd.py --data "../teset dataset/crowd_47000.xlsx" --models risk
+#   python traincrowd.py --data crowd_simulation_shards --no-cache --threads 8
+import argparse
+import glob
+import hashlib
+import json
+import os
+import time
+
+import lightgbm as lgb
+import numpy as np
+import pandas as pd
+
+from crowd_replay import source_levels
+
+# --- Parameters ---
+CATEGORICAL = ["Scenario_Type", "Gate/Zone_ID", "Seat_Zone", "Transport_Mode", "Weather"]
+NUMERIC = ["Gate_Capacity", "Expected_Arrivals", "Actual_Arrivals", "Queue_Length", "Density"]
+LAG_MINUTES = (1, 5, 15)  # README buckets
+FEATURE_VERSION = 2  # bump when featurize() or group_split() changes, so cached datasets are rebuilt
+
+# Target column and the columns each model must not see. The arrival model
+# only gets what is known before people arrive; Hotspot_Label is derived from
+# density/queue, which the risk model is given by design.
+MODELS = {
+    "risk": {"target": "Hotspot_Label", "exclude": []},
+    "arrival": {"target": "Actual_Arrivals",
+                "exclude": ["Actual_Arrivals", "Queue_Length", "Density", "Queue_Per_Capacity"]},
+}
+
+early_stopping_rounds = 100
+num_boost_round = 1000
+valid_fraction = 0.2
+group_minutes = 15  # split unit when the data has no Event_ID
+
+
+def _source_files(path):
+    if os.path.isdir(path):
+        parts = sorted(glob.glob(os.path.join(path, "part-*.*")))
+        if not parts:
+            raise ValueError(f"{path}: no part-* files")
+        return parts
+    return [path]
+
+
+def _wanted(column):
+    return column in CATEGORICAL or column in NUMERIC or column in ("Time", "Hotspot_Label", "Event_ID")
+
+
+def _read_parquet(paths):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pq.read_schema(paths[0])
+    names = [c for c in schema.names if _wanted(c)]
+    # Dictionary-encoded strings arrive as pandas categoricals, not one object per cell
+    # (Time has one value per minute, so it is read the same way when stored as text)
+    dictionary = [c for c in names if c in CATEGORICAL or (c == "Time" and schema.field(c).type == "string")]
+    # One conversion for all parts, releasing Arrow buffers as columns are converted
+    table = pa.concat_tables([pq.read_table(p, columns=names, read_dictionary=dictionary) for p in paths])
+    return table.to_pandas(split_blocks=True, self_destruct=True)
+
+
+def _read_file(path, sheet_name=0):
+    if path.endswith(".csv"):
+        return pd.read_csv(path, usecols=_wanted, dtype={c: "category" for c in CATEGORICAL + ["Time"]})
+    return pd.read_excel(path, sheet_name=sheet_name, usecols=_wanted)
+
+
+def load_frame(path, sheet_name=0):
+    """Training columns of a workbook, CSV, Parquet file or sharded output directory."""
+    files = _source_files(path)
+    if all(f.endswith(".parquet") for f in files):
+        df = _read_parquet(files)
+    else:
+        frames = [_read_file(f, sheet_name) for f in files]
+        df = frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True)
+    for c in CATEGORICAL:
+        if c not in df.columns:
+            raise ValueError(f"{path}: missing column {c}")
+        df[c] = df[c].astype("category")  # unifies per-part dictionaries
+    return df
+
+
+def featurize(df, categories=None):
+    """Feature frame, category lists and split groups for ``df``.
+
+    ``categories`` pins the code of every category (pass the training lists
+    when featurizing new data); unseen values get code -1 (missing).
+    """
+    categories = categories or {c: sorted(map(str, df[c].cat.categories)) for c in CATEGORICAL}
+    X = pd.DataFrame(index=df.index)
+    codes = {}
+    for c in CATEGORICAL:
+        # Map the column's own category codes onto the pinned lists, one lookup per category
+        col = df[c].astype("category")
+        position = {name: i for i, name in enumerate(categories[c])}
+        lookup = np.array([position.get(str(v), -1) for v in col.cat.categories] + [-1], dtype=np.int32)
+        codes[c] = lookup[col.cat.codes.to_numpy()]  # code -1 (missing value) indexes the trailing -1
+        X[c] = codes[c].astype(np.float32)  # all-float32 frame: LightGBM bins it without a float64 copy
+    for c in NUMERIC:
+        X[c] = df[c].to_numpy(dtype=np.float32)
+    X["Queue_Per_Capacity"] = (X["Queue_Length"] / X["Gate_Capacity"].clip(lower=1)).astype(np.float32)
+
+    if isinstance(df["Time"].dtype, pd.CategoricalDtype):
+        # Parse each distinct timestamp once
+        stamps = pd.to_datetime(df["Time"].cat.categories).to_numpy(dtype="datetime64[m]").astype(np.int64)
+        t = stamps[df["Time"].cat.codes.to_numpy()]
+    else:
+        t = pd.to_datetime(df["Time"]).to_numpy(dtype="datetime64[m]").astype(np.int64)
+    minute = (t - t.min()).astype(np.int64)
+    X["Minute"] = minute.astype(np.float32)
+
+    # Zone history: per (scenario, zone) sums over the k minutes before each row's minute
+    zone_key = codes["Scenario_Type"].astype(np.int64) * (len(categories["Gate/Zone_ID"]) + 1) + codes["Gate/Zone_ID"]
+    zones, zone = np.unique(zone_key, return_inverse=True)
+    width = int(minute.max()) + 1
+    cell = zone * width + minute
+    size = len(zones) * width
+
+    def window_sums(weights):
+        grid = np.bincount(cell, weights=weights, minlength=size).reshape(len(zones), width)
+        # cum[:, m] = total over minutes < m
+        cum = np.zeros((len(zones), width + 1))
+        np.cumsum(grid, axis=1, out=cum[:, 1:])
+        return {k: cum[zone, minute] - cum[zone, np.maximum(minute - k, 0)] for k in LAG_MINUTES}
+
+    rows = window_sums(None)
+    for k in LAG_MINUTES:
+        X[f"Zone_Rows_{k}m"] = rows[k].astype(np.float32)
+    for name, column in (("Arrivals", "Actual_Arrivals"), ("Queue", "Queue_Length")):
+        sums = window_sums(df[column].to_numpy(dtype=float))
+        with np.errstate(invalid="ignore", divide="ignore"):
+            for k in LAG_MINUTES:
+                X[f"Zone_{name}_{k}m"] = (sums[k] / rows[k]).astype(np.float32)  # NaN when no history
+        del sums
+
+    if "Event_ID" in df.columns:
+        groups = pd.factorize(df["Event_ID"])[0]
+    else:
+        windows = width // group_minutes + 1
+        groups = pd.factorize(codes["Scenario_Type"].astype(np.int64) * windows + minute // group_minutes)[0]
+    return X, categories, groups
+
+
+def group_split(groups, fraction=valid_fraction, seed=42):
+    """Boolean validation mask holding out whole groups (events, or time windows per scenario).
+
+    A shuffled round(n * fraction) of the groups, at least one, is held out and at
+    least one is kept for training.
+    """
+    n_groups = int(groups.max()) + 1
+    if n_groups < 2:
+        raise ValueError("Need at least 2 groups (events, or time windows per scenario) to hold one out "
+                         "for validation; the data has 1")
+    n_held = min(n_groups - 1, max(1, round(n_groups * fraction)))
+    held = np.zeros(n_groups, dtype=bool)
+    held[np.random.default_rng(seed).permutation(n_groups)[:n_held]] = True
+    return held[groups]
+
+
+def _target(df, column):
+    if column == "Hotspot_Label" and not pd.api.types.is_numeric_dtype(df[column]):
+        # Workbooks label hotspots as None/Mild/Severe text
+        levels = source_levels(df[column])
+        if levels is None:
+            raise ValueError(f"Unrecognised {column} values: {sorted(map(str, df[column].dropna().unique()))[:10]}")
+        return levels.astype(np.float32)
+    return df[column].to_numpy(dtype=np.float32)
+
+
+def _cache_key(args, name):
+    files = _source_files(args.data)
+    stamp = [(os.path.abspath(f), os.path.getsize(f), os.stat(f).st_mtime_ns) for f in files]
+    spec = {"files": stamp, "sheet": args.sheet, "model": name, "features": FEATURE_VERSION,
+            "lags": LAG_MINUTES, "valid": valid_fraction, "seed": args.seed, "max_bin": args.max_bin,
+            "exclude": MODELS[name]["exclude"]}
+    return hashlib.sha1(json.dumps(spec, sort_keys=True).encode()).hexdigest()[:16]
+
+
+def _lgb_params(args):
+    return {"max_bin": args.max_bin, "num_threads": args.threads, "verbose": -1, "seed": args.seed}
+
+
+def build_datasets(args, names):
+    """{model: (train Dataset, valid X, valid y, meta)}, from the binary cache where possible."""
+    paths = {name: os.path.join(args.cache_dir, f"{name}-{_cache_key(args, name)}") for name in names}
+    out, timings = {}, {}
+    todo = [name for name in names if args.no_cache or not os.path.exists(paths[name] + ".bin")]
+
+    if todo:
+        t0 = time.perf_counter()
+        df = load_frame(args.data, args.sheet)
+        timings["load_s"] = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        X, categories, groups = featurize(df)
+        valid = group_split(groups, seed=args.seed)
+        timings["featurize_s"] = time.perf_counter() - t0
+        print(f"Loaded {len(df):,} rows in {timings['load_s']:.1f}s, featurized in {timings['featurize_s']:.1f}s "
+              f"({valid.mean():.0%} held out in {int(groups.max()) + 1} groups)")
+        os.makedirs(args.cache_dir, exist_ok=True)
+        t0 = time.perf_counter()
+        for name in todo:
+            spec = MODELS[name]
+            features = [c for c in X.columns if c not in spec["exclude"]]
+            y = _target(df, spec["target"])
+            train = lgb.Dataset(X.loc[~valid, features], y[~valid], categorical_feature=CATEGORICAL,
+                                params=_lgb_params(args), free_raw_data=True).construct()
+            meta = {"features": features, "categorical": CATEGORICAL, "categories": categories,
+                    "target": spec["target"], "train_rows": int((~valid).sum()), "valid_rows": int(valid.sum())}
+            X_valid = X.loc[valid, features].to_numpy(np.float32)
+            if not args.no_cache:
+                train.save_binary(paths[name] + ".bin")
+                np.savez(paths[name] + ".valid.npz", X=X_valid, y=y[valid])
+                with open(paths[name] + ".json", "w", encoding="utf-8") as f:
+                    json.dump(meta, f)
+            out[name] = (train, X_valid, y[valid], meta)
+        timings["construct_s"] = time.perf_counter() - t0
+        del df, X
+
+    t0 = time.perf_counter()
+    for name in names:
+        if name in out:
+            continue
+        with open(paths[name] + ".json", encoding="utf-8") as f:
+            meta = json.load(f)
+        train = lgb.Dataset(paths[name] + ".bin", params=_lgb_params(args)).construct()
+        arrays = np.load(paths[name] + ".valid.npz")
+        out[name] = (train, arrays["X"], arrays["y"], meta)
+        print(f"✅ {name}: cached dataset {paths[name]}.bin ({meta['train_rows']:,} train rows)")
+    if len(out) > len(todo):
+        timings["cache_load_s"] = time.perf_counter() - t0
+    return out, timings
+
+
+def _classification_metrics(y, pred, n_classes):
+    y = y.astype(np.int64)
+    cm = np.bincount(y * n_classes + pred, minlength=n_classes * n_classes).reshape(n_classes, n_classes)
+    tp = np.diag(cm).astype(float)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        precision = tp / cm.sum(axis=0)
+        recall = tp / cm.sum(axis=1)
+        f1 = np.nan_to_num(2 * precision * recall / (precision + recall))
+    return {"accuracy": float(tp.sum() / cm.sum()), "macro_f1": float(f1.mean()), "confusion_matrix": cm.tolist()}
+
+
+def train_model(name, train, X_valid, y_valid, meta, args):
+    if name == "risk":
+        n_classes = int(max(train.get_label().max(), y_valid.max())) + 1
+        objective = {"objective": "multiclass", "num_class": n_classes, "metric": "multi_logloss"}
+    else:
+        objective = {"objective": "regression", "metric": ["l1", "l2"]}
+    params = {**_lgb_params(args), **objective, "learning_rate": args.learning_rate,
+              "num_leaves": args.num_leaves, "force_col_wise": True}
+    valid = lgb.Dataset(X_valid, y_valid, reference=train, feature_name=meta["features"],
+                        categorical_feature=meta["categorical"])
+    label = f"[{name.capitalize()} Model]"
+    print(f"{label} Training for up to {args.rounds} rounds with early stopping({early_stopping_rounds})...", end=" ",
+          flush=True)
+    t0 = time.perf_counter()
+    booster = lgb.train(params, train, num_boost_round=args.rounds, valid_sets=[valid], valid_names=["valid"],
+                        callbacks=[lgb.early_stopping(early_stopping_rounds, verbose=False)])
+    train_s = time.perf_counter() - t0
+    print(f"Best iteration: {booster.best_iteration} ({train_s:.1f}s)")
+
+    pred = booster.predict(X_valid, num_iteration=booster.best_iteration, num_threads=args.threads)
+    if name == "risk":
+        metrics = _classification_metrics(y_valid, pred.argmax(axis=1), n_classes)
+        print(f"{label} Accuracy={metrics['accuracy']:.3f}, F1={metrics['macro_f1']:.3f}")
+    else:
+        err = pred - y_valid
+        metrics = {"mae": float(np.abs(err).mean()), "rmse": float(np.sqrt((err ** 2).mean()))}
+        print(f"{label} Validation MAE={metrics['mae']:.1f}, RMSE={metrics['rmse']:.1f}")
+
+    os.makedirs(args.out, exist_ok=True)
+    booster.save_model(os.path.join(args.out, f"{name}_model.txt"), num_iteration=booster.best_iteration)
+    report = {**metrics, "best_iteration": booster.best_iteration, "train_s": round(train_s, 2), **meta}
+    with open(os.path.join(args.out, f"{name}_metrics.json"), "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the arrival and risk LightGBM models.")
+    parser.add_argument("--data", required=True, help="Workbook, CSV, Parquet file or sharded output directory")
+    parser.add_argument("--sheet", default=0, help="Sheet name or index for workbooks")
+    parser.add_argument("--models", nargs="+", choices=sorted(MODELS), default=["arrival", "risk"])
+    parser.add_argument("--out", default="models", help="Directory for models and metrics")
+    parser.add_argument("--cache-dir", default=os.path.join("models", "cache"),
+                        help="Directory for cached binary datasets")
+    parser.add_argument("--no-cache", action="store_true", help="Always rebuild the training datasets")
+    parser.add_argument("--threads", type=int, default=os.cpu_count() or 1, help="LightGBM threads (default: all cores)")
+    parser.add_argument("--rounds", type=int, default=num_boost_round)
+    parser.add_argument("--learning-rate", type=float, default=0.1)
+    parser.add_argument("--num-leaves", type=int, default=63)
+    parser.add_argument("--max-bin", type=int, default=255)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    args.sheet = int(args.sheet) if str(args.sheet).isdigit() else args.sheet
+
+    t0 = time.perf_counter()
+    datasets, timings = build_datasets(args, args.models)
+    for name in args.models:
+        timings[f"{name}_train_s"] = train_model(name, *datasets[name], args)["train_s"]
+    timings["total_s"] = time.perf_counter() - t0
+    report = {**{k: round(v, 2) for k, v in timings.items()}, "threads": args.threads}
+    try:
+        import resource
+
+        report["peak_rss_mb"] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024)  # KiB on Linux
+    except ImportError:
+        pass  # Windows
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()